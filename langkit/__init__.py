@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
-from typing import Dict, List
-from .extract import extract
+from typing import Dict, List, Optional
+from .extract import extract, extract_stream
+from .instrumentation import stats
 import importlib.resources as resources
 
 
@@ -43,12 +44,31 @@ class LangKitConfig:
     injections_base_url = (
         "https://whylabs-public.s3.us-west-2.amazonaws.com/langkit/data/injections/"
     )
+    # the model the injections metric embeds with, and the version of its harm embeddings
+    injections_transformer_name: str = "all-MiniLM-L6-v2"
+    injections_version: str = "v2"
     data_folder: str = "langkit_data"
     rouge_type: str = "rouge1"
     sentiment_lexicon: str = "vader_lexicon"
     topic_model_path: str = "MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7"
     topic_classifier: str = "zero-shot-classification"
     toxicity_model_path: str = "martin-ha/toxic-comment-model"
+    regex_engine: str = "re"
+    # seconds of pattern search per text after which the remaining expressions are skipped
+    regex_time_budget: Optional[float] = None
+    pii_spacy_model: str = "en_core_web_lg"
+    pii_batch_size: int = 32
+    pii_n_process: int = 1
+    pii_prefilter: bool = False
+    pii_output: str = "json"
+    pii_output_spans: bool = False
+    pii_prefilter_file_path: str = field(
+        default_factory=lambda: _resource_filename("pii_prefilter.json")
+    )
+    # fraction of rows each metric is computed on, by metric or module name, see sampling.
+    # Rows are sampled by their prompt and response, so at equal rates a row's prompt and
+    # response metrics are computed together
+    metric_sample_rates: Dict[str, float] = field(default_factory=dict)
 
 
 prompt_column: str = "prompt"
@@ -56,6 +76,21 @@ response_column: str = "response"
 lang_config = LangKitConfig()
 
 
+def warmup() -> None:
+    """
+    Loads the models, lexicons and reference data of every imported metric module. Modules
+    only load those on first use, so calling this after init keeps the loading time out of
+    the first request.
+    """
+    import sys
+
+    for name, module in list(sys.modules.items()):
+        if name.startswith(f"{__package__}.") and callable(
+            getattr(module, "warmup", None)
+        ):
+            module.warmup()
+
+
 def package_version(package: str = __package__) -> str:
     """Calculate version number based on pyproject.toml"""
     try:
@@ -70,4 +105,4 @@ def package_version(package: str = __package__) -> str:
 
 __version__ = package_version()
 
-__ALL__ = [__version__, LangKitConfig, extract]
+__ALL__ = [__version__, LangKitConfig, extract, extract_stream, stats, warmup]
@@ -5,6 +5,7 @@ from whylogs.core.schema import DeclarativeSchema
 from langkit.metadata import attach_schema_metadata
 
 from langkit import LangKitConfig
+from langkit import sampling
 from langkit import injections
 from langkit import topics
 from langkit import regexes
@@ -16,6 +17,7 @@ from langkit import input_output
 
 
 def init(config: Optional[LangKitConfig] = None) -> DeclarativeSchema:
+    sampling.init(config=config)
     injections.init(config=config)
     topics.init(config=config)
     regexes.init(config=config)
@@ -26,3 +28,13 @@ def init(config: Optional[LangKitConfig] = None) -> DeclarativeSchema:
     input_output.init(config=config)
     text_schema = attach_schema_metadata(udf_schema(), "all_metrics")
     return text_schema
+
+
+def warmup() -> None:
+    """Loads the models and lexicons of the included metrics."""
+    injections.warmup()
+    topics.warmup()
+    sentiment.warmup()
+    themes.warmup()
+    toxicity.warmup()
+    input_output.warmup()
@@ -0,0 +1,300 @@
+"""
+Local copies of everything the metric modules download: Hugging Face models, NLTK data,
+the injections reference embeddings and the spaCy model used for PII.
+
+prefetch() fetches them into one directory and records their files' sha256 in a manifest,
+verify() checks a directory against its manifest, and use() serves the modules from it with
+no network access: models load from the local directories through the model registry, NLTK
+reads the local data, and LANGKIT_OFFLINE, HF_HUB_OFFLINE and TRANSFORMERS_OFFLINE are set.
+
+    python -m langkit.artifacts prefetch /opt/langkit-artifacts
+    python -m langkit.artifacts verify /opt/langkit-artifacts
+
+and in the serving process, before importing the metric modules:
+
+    from langkit import artifacts
+    artifacts.use("/opt/langkit-artifacts")
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from copy import deepcopy
+from logging import getLogger
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from langkit import LangKitConfig, lang_config, models
+
+diagnostic_logger = getLogger(__name__)
+
+MANIFEST = "artifacts.json"
+
+KINDS = ["hf", "nltk", "url", "spacy"]
+
+
+class Artifact(NamedTuple):
+    name: str
+    kind: str
+    source: str
+    # for models served through the registry: the backend and id the modules load them with
+    backend: Optional[str] = None
+    model_id: Optional[str] = None
+
+
+def artifacts(config: Optional[LangKitConfig] = None) -> List[Artifact]:
+    """The artifacts the metric modules need with the given config (lang_config by default)."""
+    config = config or lang_config
+    found: Dict[str, Artifact] = {}
+
+    def add(artifact: Artifact) -> None:
+        found.setdefault(artifact.name, artifact)
+
+    for transformer in [config.transformer_name, config.injections_transformer_name]:
+        model_id = models.sentence_transformer_id(transformer)
+        add(Artifact(model_id, "hf", model_id, "sentence_transformers", model_id))
+    if not config.toxicity_model_path.startswith("detoxify/"):
+        add(
+            Artifact(
+                config.toxicity_model_path,
+                "hf",
+                config.toxicity_model_path,
+                "transformers.pipeline:text-classification",
+                config.toxicity_model_path,
+            )
+        )
+    add(
+        Artifact(
+            config.topic_model_path,
+            "hf",
+            config.topic_model_path,
+            f"transformers.pipeline:{config.topic_classifier}",
+            config.topic_model_path,
+        )
+    )
+    for package in [config.sentiment_lexicon, "punkt"]:
+        add(Artifact(package, "nltk", package))
+    injections = (
+        f"embeddings_{config.injections_transformer_name}_harm_"
+        f"{config.injections_version}.parquet"
+    )
+    add(
+        Artifact(
+            injections,
+            "url",
+            config.injections_base_url + injections,
+            "numpy",
+            injections,
+        )
+    )
+    add(Artifact(config.pii_spacy_model, "spacy", config.pii_spacy_model))
+    return list(found.values())
+
+
+def _local_name(artifact: Artifact) -> str:
+    return os.path.join(artifact.kind, re.sub(r"[^A-Za-z0-9_.-]+", "_", artifact.name))
+
+
+def _fetch(artifact: Artifact, target: str) -> None:
+    if artifact.kind == "hf":
+        if os.path.isdir(artifact.source):
+            shutil.copytree(artifact.source, target, dirs_exist_ok=True)
+        else:
+            from huggingface_hub import snapshot_download
+
+            snapshot_download(repo_id=artifact.source, local_dir=target)
+    elif artifact.kind == "nltk":
+        import nltk
+
+        if not nltk.download(artifact.source, download_dir=target, quiet=True):
+            raise ValueError(f"Could not download NLTK package {artifact.source}")
+    elif artifact.kind == "url":
+        from urllib.request import urlretrieve
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        urlretrieve(artifact.source, target)
+    elif artifact.kind == "spacy":
+        import spacy
+
+        try:
+            nlp = spacy.load(artifact.source)
+        except OSError:
+            from spacy.cli import download
+
+            download(artifact.source)
+            nlp = spacy.load(artifact.source)
+        nlp.to_disk(target)
+    else:
+        raise ValueError(
+            f"Unknown artifact kind {artifact.kind}, expected one of {KINDS}"
+        )
+
+
+def _files(path: str) -> List[str]:
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _checksums(directory: str, local: str) -> Dict[str, str]:
+    return {
+        os.path.relpath(path, directory): _sha256(path)
+        for path in _files(os.path.join(directory, local))
+    }
+
+
+def _read_manifest(directory: str) -> Dict[str, Dict[str, Any]]:
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+
+def prefetch(
+    directory: str,
+    config: Optional[LangKitConfig] = None,
+    kinds: Optional[Sequence[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Downloads the artifacts of the given kinds (all of KINDS by default) into directory and
+    writes their checksums to its manifest. Artifacts already listed in the manifest are
+    fetched again, so this also refreshes a directory. Returns the manifest.
+    """
+    os.makedirs(directory, exist_ok=True)
+    try:
+        manifest = _read_manifest(directory)
+    except FileNotFoundError:
+        manifest = {}
+    for artifact in artifacts(config):
+        if kinds is not None and artifact.kind not in kinds:
+            continue
+        # nltk packages share one data dir, so their checksums cover all of it
+        local = "nltk" if artifact.kind == "nltk" else _local_name(artifact)
+        diagnostic_logger.info(f"Fetching {artifact.kind} artifact {artifact.source}")
+        _fetch(artifact, os.path.join(directory, local))
+        files = _checksums(directory, local)
+        manifest[artifact.name] = {
+            **artifact._asdict(),
+            "path": local,
+            "size_bytes": sum(
+                os.path.getsize(os.path.join(directory, path)) for path in files
+            ),
+            "files": files,
+        }
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify(directory: str) -> List[str]:
+    """Checks every file in the manifest; returns the problems found, none if all match."""
+    problems = []
+    for name, entry in _read_manifest(directory).items():
+        for path, checksum in entry["files"].items():
+            full_path = os.path.join(directory, path)
+            if not os.path.exists(full_path):
+                problems.append(f"{name}: {path} is missing")
+            elif _sha256(full_path) != checksum:
+                problems.append(f"{name}: {path} does not match its checksum")
+    return problems
+
+
+def report(directory: str) -> List[Dict[str, Any]]:
+    """One entry per artifact in the directory: name, kind, source and size in bytes."""
+    return [
+        {
+            "name": name,
+            "kind": entry["kind"],
+            "source": entry["source"],
+            "size_bytes": entry["size_bytes"],
+        }
+        for name, entry in _read_manifest(directory).items()
+    ]
+
+
+def _parquet_loader(path: str):
+    def load(key: models.ModelKey) -> Any:
+        from langkit.injections import _load_embeddings
+
+        return _load_embeddings(path, path)
+
+    return load
+
+
+def use(
+    directory: str, config: Optional[LangKitConfig] = None, check: bool = False
+) -> LangKitConfig:
+    """
+    Serves the metric modules from directory and turns off their downloads. Updates config,
+    lang_config by default, in place to point at the local copies and returns it; call this
+    before importing the metric modules, or init them again with the returned config. With
+    check set, raises ValueError if verify() finds problems.
+    """
+    from langkit.snapshot import _loader
+
+    if check:
+        problems = verify(directory)
+        if problems:
+            raise ValueError(
+                f"Artifacts in {directory} failed verification: {problems}"
+            )
+    config = config if config is not None else lang_config
+    manifest = _read_manifest(directory)
+    for entry in manifest.values():
+        path = os.path.join(directory, entry["path"])
+        if entry["backend"] == "numpy":
+            models.override(entry["model_id"], "numpy", _parquet_loader(path))
+        elif entry["backend"] is not None:
+            models.override(
+                entry["model_id"], entry["backend"], _loader(entry["backend"], path)
+            )
+        elif entry["kind"] == "spacy":
+            config.pii_spacy_model = path
+        elif entry["kind"] == "nltk":
+            os.environ["NLTK_DATA"] = path
+            nltk = sys.modules.get("nltk")
+            if nltk is not None and path not in nltk.data.path:
+                nltk.data.path.insert(0, path)
+    for variable in ["LANGKIT_OFFLINE", "HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE"]:
+        os.environ[variable] = "1"
+    return config
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="LangKit artifact manager")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prefetch_command = commands.add_parser("prefetch", help="download the artifacts")
+    prefetch_command.add_argument("directory")
+    prefetch_command.add_argument("--kinds", nargs="+", choices=KINDS, default=None)
+    verify_command = commands.add_parser("verify", help="check the checksums")
+    verify_command.add_argument("directory")
+    report_command = commands.add_parser("report", help="list the artifacts and sizes")
+    report_command.add_argument("directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "prefetch":
+        prefetch(args.directory, deepcopy(lang_config), args.kinds)
+    if args.command == "verify":
+        problems = verify(args.directory)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        return 1 if problems else 0
+    for entry in report(args.directory):
+        print(
+            f"{entry['size_bytes'] / 1e6:10.1f} MB  {entry['kind']:5}  {entry['name']}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
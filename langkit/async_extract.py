@@ -0,0 +1,138 @@
+import asyncio
+from collections import defaultdict
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+import pandas as pd
+from whylogs.experimental.core.udf_schema import UdfSchema
+
+from langkit.extract import extract
+
+diagnostic_logger = getLogger(__name__)
+
+_Request = Tuple[Dict[str, Any], "asyncio.Future[Dict[str, Any]]"]
+
+
+class AsyncExtractor:
+    """
+    Coalesces concurrent single-row extract calls into batched ones.
+
+    Rows submitted with `await extractor.extract(row)` are queued; a background task waits up to
+    max_wait seconds after the first queued row (or until max_batch_size rows are queued), runs
+    the UDFs once over the whole batch in a worker thread, and resolves every caller with its own
+    enhanced row. The event loop is never blocked by metric computation.
+    """
+
+    def __init__(
+        self,
+        schema: Optional[UdfSchema] = None,
+        max_wait: float = 0.005,
+        max_batch_size: int = 64,
+        max_workers: Optional[int] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be positive, got {max_batch_size}")
+        self.schema = schema
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def extract(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(row, dict):
+            raise ValueError(
+                f"AsyncExtractor: data of type {type(row)} is invalid: supported input type is dictionary"
+            )
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((row, future))  # type: ignore
+        return await future
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _next_batch(self) -> List[_Request]:
+        queue = self._queue
+        assert queue is not None
+        batch = [await queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                results = await loop.run_in_executor(
+                    None, self._extract_batch, [row for row, _ in batch]
+                )
+            except Exception as e:
+                diagnostic_logger.exception(
+                    f"Batched extract of {len(batch)} rows failed"
+                )
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _extract_batch(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # rows with different columns trigger different UDFs, so each column set is its own frame
+        groups: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+        for index, row in enumerate(rows):
+            groups[tuple(row.keys())].append(index)
+        results: List[Dict[str, Any]] = [{} for _ in rows]
+        for indexes in groups.values():
+            df = pd.DataFrame([rows[index] for index in indexes])
+            enhanced = extract(df, schema=self.schema, max_workers=self.max_workers)
+            for index, record in zip(indexes, _records(enhanced)):
+                results[index] = record
+        return results
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # the rows as extract(row) would return them: python scalars, and None where a UDF
+    # failed or returned nothing rather than NaN
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+_default_extractors: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, AsyncExtractor]]" = (
+    WeakKeyDictionary()
+)
+
+
+async def aextract(
+    data: Dict[str, Any],
+    schema: Optional[UdfSchema] = None,
+) -> Dict[str, Any]:
+    """
+    Awaitable counterpart of extract for single rows. Calls made on the same event loop with
+    the same schema share an AsyncExtractor, so concurrent requests are batched together.
+    """
+    extractors = _default_extractors.setdefault(asyncio.get_running_loop(), {})
+    extractor = extractors.get(id(schema))
+    if extractor is None or extractor.schema is not schema:
+        extractor = AsyncExtractor(schema=schema)
+        extractors[id(schema)] = extractor
+    return await extractor.extract(data)
@@ -0,0 +1,348 @@
+"""
+Throughput and latency benchmarks for the metric modules.
+
+Every module is measured in a fresh subprocess, so that its import and init time and its
+peak memory are not affected by modules measured before it. Results are JSON; passing a
+baseline file reports the metrics that regressed beyond a tolerance.
+
+    python -m langkit.benchmark --modules textstat regexes --rows 2000 --output bench.json
+    python -m langkit.benchmark --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import importlib
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+diagnostic_logger = getLogger(__name__)
+
+MODULES = [
+    "light_metrics",
+    "llm_metrics",
+    "all_metrics",
+    "themes",
+    "injections",
+    "toxicity",
+    "topics",
+    "pii",
+    "textstat",
+    "regexes",
+]
+
+WORKLOADS = ["chat", "rag", "code", "pii"]
+
+# (metric, True if higher is better)
+_COMPARED = [
+    ("rows_per_sec", True),
+    ("p99_row_seconds", False),
+    ("scorer_p99_row_seconds", False),
+    ("init_seconds", False),
+    ("peak_rss_mb", False),
+]
+
+_WORDS = (
+    "the model answer question data user account service request system report policy "
+    "customer order payment result value table query response context document summary "
+    "please could would should explain describe compare list show update check thanks "
+    "quickly carefully important latest support issue error version release feature"
+).split()
+_NAMES = ["Alice Smith", "Bob Jones", "Carol White", "Dan Brown", "Eve Miller"]
+_CODE = [
+    "def {name}(items):\n    return [x * 2 for x in items if x > {n}]",
+    "for i in range({n}):\n    print(i, {name}(i))",
+    "SELECT id, name FROM {name} WHERE value > {n} ORDER BY id;",
+    "const {name} = (a, b) => a + b * {n};",
+]
+
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(low, high))]
+    return " ".join(words).capitalize() + rng.choice([".", "?", "!"])
+
+
+def _pii_text(rng: random.Random) -> str:
+    return (
+        f"{rng.choice(_NAMES)} can be reached at {rng.randint(200, 999)}-555-"
+        f"{rng.randint(1000, 9999)} or user{rng.randint(1, 999)}@example.com. "
+        f"Card {rng.randint(4000, 4999)} {rng.randint(1000, 9999)} {rng.randint(1000, 9999)} "
+        f"{rng.randint(1000, 9999)}, SSN {rng.randint(100, 665)}-{rng.randint(10, 99)}-"
+        f"{rng.randint(1000, 9999)}, server 10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.1."
+    )
+
+
+def generate(workload: str, n: int, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    Deterministic synthetic prompt/response pairs: "chat" (short turns), "rag" (long
+    multi-paragraph answers), "code" (snippets) or "pii" (dense personal data).
+    """
+    return _generate(workload, n, random.Random(f"{workload}:{seed}"))
+
+
+def generate_latency_rows(
+    workloads: Sequence[str], n: int, seed: int = 0
+) -> List[Dict[str, str]]:
+    """
+    The rows scored one at a time for the latency percentiles: n rows alternating between
+    the workloads, drawn from their own random streams so that none of them is a batch row
+    whose results are already cached.
+    """
+    per_workload = [
+        _generate(
+            workload,
+            -(-n // len(workloads)),
+            random.Random(f"latency:{workload}:{seed}"),
+        )
+        for workload in workloads
+    ]
+    interleaved = [row for rows in zip(*per_workload) for row in rows]
+    return interleaved[:n]
+
+
+def _generate(workload: str, n: int, rng: random.Random) -> List[Dict[str, str]]:
+    if workload not in WORKLOADS:
+        raise ValueError(f"Unknown workload {workload}, expected one of {WORKLOADS}")
+    rows = []
+    for _ in range(n):
+        if workload == "chat":
+            prompt = _sentence(rng, 4, 12)
+            response = " ".join(_sentence(rng, 5, 15) for _ in range(rng.randint(1, 3)))
+        elif workload == "rag":
+            prompt = _sentence(rng, 8, 20)
+            response = "\n\n".join(
+                " ".join(_sentence(rng, 8, 25) for _ in range(rng.randint(4, 8)))
+                for _ in range(rng.randint(2, 5))
+            )
+        elif workload == "code":
+            prompt = "Write code to " + _sentence(rng, 3, 8).lower()
+            response = "\n".join(
+                rng.choice(_CODE).format(name=rng.choice(_WORDS), n=rng.randint(0, 100))
+                for _ in range(rng.randint(1, 4))
+            )
+        else:
+            prompt = _pii_text(rng) + " " + _sentence(rng, 3, 8)
+            response = _pii_text(rng)
+        rows.append({"prompt": prompt, "response": response})
+    return rows
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(
+    module: str, rows: int, workloads: Sequence[str], seed: int, latency_rows: int
+) -> Dict[str, Any]:
+    """Runs in the benchmark subprocess."""
+    import pandas as pd
+    from whylogs.experimental.core.udf_schema import udf_schema
+
+    from langkit import extract, warmup
+
+    # modules initialize at import and load their models on first use, so init time
+    # covers the import and the warmup too
+    start = time.perf_counter()
+    schema = importlib.import_module(f"langkit.{module}").init()
+    warmup()
+    init_seconds = time.perf_counter() - start
+    if schema is None:
+        schema = udf_schema()
+
+    data: List[Dict[str, str]] = []
+    for workload in workloads:
+        data.extend(generate(workload, max(1, rows // len(workloads)), seed))
+    df = pd.DataFrame(data)
+
+    start = time.perf_counter()
+    extract(df, schema=schema)
+    batch_seconds = time.perf_counter() - start
+
+    from langkit.scorer import RowScorer
+
+    # extract and the scorer get rows of their own, so neither is served from the other's
+    # cached results
+    single_rows = generate_latency_rows(workloads, 2 * latency_rows, seed)
+    latencies = _row_latencies(
+        lambda row: extract(row, schema=schema), single_rows[:latency_rows]
+    )
+    scorer_latencies = _row_latencies(RowScorer(schema), single_rows[latency_rows:])
+    return {
+        "rows": len(df),
+        "init_seconds": init_seconds,
+        "rows_per_sec": len(df) / batch_seconds,
+        "p50_row_seconds": _percentile(latencies, 0.5),
+        "p99_row_seconds": _percentile(latencies, 0.99),
+        "scorer_p50_row_seconds": _percentile(scorer_latencies, 0.5),
+        "scorer_p99_row_seconds": _percentile(scorer_latencies, 0.99),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _row_latencies(score: Callable[[Dict[str, str]], Any], rows) -> List[float]:
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        score(row)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def benchmark_module(
+    module: str,
+    rows: int = 1000,
+    workloads: Sequence[str] = WORKLOADS,
+    seed: int = 0,
+    latency_rows: int = 100,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Benchmarks one module in a fresh interpreter; failures are reported under "error"."""
+    command = [
+        sys.executable,
+        "-m",
+        "langkit.benchmark",
+        "--worker",
+        module,
+        "--rows",
+        str(rows),
+        "--seed",
+        str(seed),
+        "--latency-rows",
+        str(latency_rows),
+        "--workloads",
+        *workloads,
+    ]
+    try:
+        completed = subprocess.run(
+            command, capture_output=True, text=True, timeout=timeout, check=False
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout}s"}
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(
+    modules: Sequence[str] = MODULES,
+    rows: int = 1000,
+    workloads: Sequence[str] = WORKLOADS,
+    seed: int = 0,
+    latency_rows: int = 100,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    from langkit import __version__
+
+    results = {}
+    for module in modules:
+        diagnostic_logger.info(f"Benchmarking {module}")
+        results[module] = benchmark_module(
+            module, rows, workloads, seed, latency_rows, timeout
+        )
+    return {
+        "langkit_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rows": rows,
+        "workloads": list(workloads),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.1
+) -> List[Dict[str, Any]]:
+    """
+    Returns the regressions of current against baseline: every compared metric of a module
+    present in both runs that got worse by more than tolerance (a fraction of the baseline).
+    """
+    regressions = []
+    for module, result in current["results"].items():
+        base = baseline.get("results", {}).get(module)
+        if not base or "error" in base or "error" in result:
+            continue
+        for metric, higher_is_better in _COMPARED:
+            new, old = result.get(metric), base.get(metric)
+            if new is None or not old:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    {
+                        "module": module,
+                        "metric": metric,
+                        "baseline": old,
+                        "current": new,
+                        "change": change,
+                    }
+                )
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="LangKit metric benchmarks")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--workloads", nargs="+", default=WORKLOADS)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--latency-rows", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = _measure(
+            args.worker, args.rows, args.workloads, args.seed, args.latency_rows
+        )
+        print(json.dumps(result))
+        return 0
+
+    results = run(
+        args.modules,
+        args.rows,
+        args.workloads,
+        args.seed,
+        args.latency_rows,
+        args.timeout,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['module']} {regression['metric']}: "
+                f"{regression['baseline']:.4g} -> {regression['current']:.4g} "
+                f"({regression['change']:+.1%})",
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,8 @@
 from copy import deepcopy
 from logging import getLogger
 
-from langkit.pattern_loader import PatternLoader
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.pattern_loader import PatternLoader, search_groups
+from langkit.instrumentation import register_multioutput_udf, timed_init
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
 from whylogs.core.stubs import pd
 from typing import Dict, List, Optional, Set, Union
@@ -22,13 +22,44 @@ def count_patterns(group, text: str) -> int:
     return count
 
 
-def wrapper(pattern_group, column):
-    def wrappee(text: Union[pd.DataFrame, Dict[str, List]]) -> Union[pd.Series, List]:
-        return [count_patterns(pattern_group, input) for input in text[column]]
-
+def count_all_patterns(
+    regex_groups, text: str, time_budget: Optional[float] = None
+) -> Dict[str, int]:
+    counts = {f"{group['name']}_count": 0 for group in regex_groups}
+    for name, matched in search_groups(regex_groups, text, time_budget):
+        counts[f"{name}_count"] += matched
+    return counts
+
+
+def wrapper(column):
+    def wrappee(
+        text: Union[pd.DataFrame, Dict[str, List]]
+    ) -> Union[pd.DataFrame, Dict[str, List]]:
+        regex_groups = pattern_loader.get_regex_groups() or []
+        to_return: Dict[str, List[int]] = {
+            f"{group['name']}_count": [] for group in regex_groups
+        }
+        # single pass over the column: every group is evaluated per text
+        for input in text[column]:
+            counts = count_all_patterns(
+                regex_groups, input, pattern_loader.config.regex_time_budget
+            )
+            for name, count in counts.items():
+                to_return[name].append(count)
+        if isinstance(text, pd.DataFrame):
+            return pd.DataFrame(to_return)
+        return to_return
+
+    wrappee.outputs = _outputs  # type: ignore
     return wrappee
 
 
+def _outputs() -> List[str]:
+    return [
+        f"{group['name']}_count" for group in pattern_loader.get_regex_groups() or []
+    ]
+
+
 _registered: Set[str] = set()
 
 
@@ -39,9 +70,7 @@ def _unregister():
 
     global _multicolumn_udfs, _registered
     _multicolumn_udfs[""] = [
-        u
-        for u in _multicolumn_udfs[""]
-        if list(u.udfs.keys()) and list(u.udfs.keys())[0] not in _registered
+        u for u in _multicolumn_udfs[""] if u.udf is None or u.name not in _registered
     ]
     _registered = set()
 
@@ -52,15 +81,16 @@ def _register_udfs():
     regex_groups = pattern_loader.get_regex_groups()
     if regex_groups is not None:
         for column in [prompt_column, response_column]:
-            for group in regex_groups:
-                udf_name = f"{column}.{group['name']}_count"
-                register_dataset_udf(
-                    [column],
-                    udf_name=udf_name,
-                )(wrapper(group, column))
-                _registered.add(udf_name)
+            udf_name = f"{column}.pattern_counts"
+            register_multioutput_udf(
+                [column],
+                udf_name=udf_name,
+                prefix=column,
+            )(wrapper(column))
+            _registered.add(udf_name)
 
 
+@timed_init
 def init(
     pattern_file_path: Optional[str] = None, config: Optional[LangKitConfig] = None
 ):
@@ -1,20 +1,223 @@
+import os
 import pandas as pd
-from typing import Any, Dict, Optional, Union
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from whylogs.core import DatasetProfile
 from whylogs.experimental.core.udf_schema import udf_schema, UdfSchema
+from langkit import intermediates, sampling
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+
+def _is_arrow(data: Any) -> bool:
+    # checked by module name so that pyarrow is only imported when arrow data is passed in
+    return type(data).__module__.startswith("pyarrow") and hasattr(data, "schema")
+
+
+def _udf_input_columns(schema: UdfSchema, available: List[str]) -> List[str]:
+    """The columns among available that at least one of the schema's UDFs reads."""
+    if any(schema.type_udfs.values()):
+        return list(available)
+    needed = set()
+    for spec in schema.multicolumn_udfs:
+        if spec.column_names and set(spec.column_names).issubset(available):
+            needed.update(spec.column_names)
+    return [column for column in available if column in needed]
+
+
+def _extract_arrow(
+    data: Any, schema: UdfSchema, max_workers: Optional[int], dedupe: bool = False
+) -> Tuple[Any, pd.DataFrame]:
+    """
+    Converts only the UDF input columns to pandas (backed by arrow memory where pandas
+    supports it), and appends the metric columns to the original table or record batch.
+    Returns the arrow result and the enhanced DataFrame it was built from.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_batches([data]) if isinstance(data, pa.RecordBatch) else data
+    columns = _udf_input_columns(schema, table.column_names)
+    arrow_dtype = getattr(pd, "ArrowDtype", None)
+    selected = table.select(columns)
+    df = (
+        selected.to_pandas(types_mapper=arrow_dtype)
+        if arrow_dtype
+        else selected.to_pandas()
+    )
+    enhanced = extract(df, schema=schema, max_workers=max_workers, dedupe=dedupe)
+    metrics = enhanced[[c for c in enhanced.columns if c not in table.column_names]]
+    for name, array in zip(
+        metrics.columns,
+        pa.Table.from_pandas(metrics, preserve_index=False).columns,
+    ):
+        table = table.append_column(name, array)
+    if isinstance(data, pa.RecordBatch):
+        return table.combine_chunks().to_batches()[0], enhanced
+    return table, enhanced
 
 
 def extract(
-    data: Union[pd.DataFrame, Dict[str, Any]],
+    data: Union[pd.DataFrame, Dict[str, Any], "pa.Table", "pa.RecordBatch"],
     schema: Optional[UdfSchema] = None,
+    max_workers: Optional[int] = None,
+    dedupe: bool = False,
 ):
+    """
+    Runs the schema's UDFs over data and returns it enhanced with the metric columns.
+    With max_workers > 1 the UDFs are evaluated concurrently on a thread pool, which helps
+    when the registered metrics release the GIL (model inference, regex, numpy).
+
+    With dedupe, each UDF only runs on the distinct values of the columns it reads (the
+    distinct tuples for UDFs reading several columns, such as relevance_to_prompt) and the
+    results are copied to the duplicate rows.
+
+    A pyarrow Table or RecordBatch is returned as the same type with the metric columns
+    appended. Only the columns read by some UDF are converted for the UDFs; the others are
+    passed through untouched.
+    """
     if schema is None:
         schema = udf_schema()
+    if _is_arrow(data):
+        return _extract_arrow(data, schema, max_workers, dedupe)[0]
+    with intermediates.batch_scope(), sampling.keyed(data):
+        return _extract(data, schema, max_workers, dedupe)
+
+
+def _extract(
+    data: Union[pd.DataFrame, Dict[str, Any]],
+    schema: UdfSchema,
+    max_workers: Optional[int],
+    dedupe: bool = False,
+):
+    if (max_workers is not None and max_workers > 1) or dedupe:
+        from langkit.parallel import apply_udfs
+
+        def apply(**kwargs):
+            return apply_udfs(
+                schema, max_workers=max_workers or 1, dedupe=dedupe, **kwargs
+            )
+
+    else:
+        apply = schema.apply_udfs
     if isinstance(data, pd.DataFrame):
-        df_enhanced, _ = schema.apply_udfs(pandas=data)
+        df_enhanced, _ = apply(pandas=data)
         return df_enhanced
     elif isinstance(data, dict):
-        _, row_enhanced = schema.apply_udfs(row=data)
+        _, row_enhanced = apply(row=data)
         return row_enhanced
     raise ValueError(
-        f"Extract: data of type {type(data)} is invalid: supported input types are pandas dataframe or dictionary"
+        f"Extract: data of type {type(data)} is invalid: supported input types are pandas dataframe, dictionary or pyarrow table"
     )
+
+
+def _read_file_chunks(
+    path: str, chunk_size: int, schema: UdfSchema, arrow: bool
+) -> Iterator[Any]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        with pd.read_json(path, lines=True, chunksize=chunk_size) as reader:
+            yield from reader
+    elif extension == ".csv":
+        with pd.read_csv(path, chunksize=chunk_size) as reader:
+            yield from reader
+    elif extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        columns = None
+        if arrow:
+            columns = _udf_input_columns(schema, parquet.schema_arrow.names)
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch if arrow else batch.to_pandas()
+    else:
+        raise ValueError(
+            f"Extract: file {path} is invalid: supported file types are .jsonl, .csv and .parquet"
+        )
+
+
+def _chunks(
+    data: Union[str, Iterable[Dict[str, Any]], Iterable[pd.DataFrame], pd.DataFrame],
+    chunk_size: int,
+    schema: UdfSchema,
+    arrow: bool,
+) -> Iterator[Any]:
+    if isinstance(data, (str, os.PathLike)):
+        yield from _read_file_chunks(os.fspath(data), chunk_size, schema, arrow)
+        return
+    if isinstance(data, pd.DataFrame) or _is_arrow(data):
+        data = [data]
+    items = iter(data)
+    while True:
+        first = next(items, None)
+        if first is None:
+            return
+        if isinstance(first, pd.DataFrame):
+            for start in range(0, len(first), chunk_size):
+                yield first.iloc[start : start + chunk_size]
+        elif _is_arrow(first):
+            for start in range(0, first.num_rows, chunk_size):
+                yield first.slice(start, chunk_size)
+        elif isinstance(first, dict):
+            rows = [first, *islice(items, chunk_size - 1)]
+            if not all(isinstance(row, dict) for row in rows):
+                raise ValueError(
+                    "Extract: stream items must be all dictionaries or all pandas dataframes"
+                )
+            yield pd.DataFrame(rows)
+        else:
+            raise ValueError(
+                f"Extract: stream item of type {type(first)} is invalid: supported item types are pandas dataframe, dictionary or pyarrow table"
+            )
+
+
+def extract_stream(
+    data: Union[str, Iterable[Dict[str, Any]], Iterable[pd.DataFrame], pd.DataFrame],
+    schema: Optional[UdfSchema] = None,
+    chunk_size: int = 1000,
+    max_workers: Optional[int] = None,
+    profile: Optional[DatasetProfile] = None,
+    arrow: bool = False,
+    dedupe: bool = False,
+) -> Iterator[Any]:
+    """
+    Lazily extracts metrics from data in chunks of at most chunk_size rows, yielding one
+    enhanced DataFrame per chunk. data can be an iterable of dictionaries, an iterable of
+    DataFrames (large frames are sliced), a single DataFrame, or the path of a .jsonl, .csv or
+    .parquet file, which is read chunk by chunk. Only the current chunk is held in memory.
+
+    pyarrow Tables and RecordBatches (or iterables of them) are processed per record batch and
+    yielded as arrow, as described in extract. With arrow=True, a .parquet file is read as
+    arrow too, and only the columns some UDF reads are loaded from it.
+
+    dedupe removes duplicate texts within each chunk, as described in extract.
+
+    If profile is given, every enhanced chunk is also tracked into it as it is produced, so
+    the profile is complete once the generator is exhausted.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Extract: chunk_size must be positive, got {chunk_size}")
+    if schema is None:
+        schema = udf_schema()
+    for chunk in _chunks(data, chunk_size, schema, arrow):
+        if _is_arrow(chunk):
+            result, enhanced = _extract_arrow(chunk, schema, max_workers, dedupe)
+        else:
+            # UDF outputs are built with a default index, so chunks must start at 0 to line up
+            chunk = chunk.reset_index(drop=True)
+            result = enhanced = extract(
+                chunk, schema=schema, max_workers=max_workers, dedupe=dedupe
+            )
+        if profile is not None:
+            profile.track(pandas=enhanced, execute_udfs=False)
+        yield result
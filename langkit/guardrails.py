@@ -0,0 +1,185 @@
+"""
+Blocking decisions from metric thresholds, computing as few metrics as possible.
+
+A guardrail only needs to know whether any policy fires, so instead of computing every metric
+and then checking thresholds, Guardrail evaluates the metrics its policies name one at a time,
+cheapest first (regexes, then textstat and lexicons, then embeddings, then transformer models,
+then LLM calls), and stops at the first policy that fires:
+
+    guardrail = Guardrail(
+        [
+            Policy("prompt.has_patterns"),
+            Policy("prompt.jailbreak_similarity", above=0.5),
+            Policy("prompt.toxicity", above=0.8),
+        ],
+        llm_metrics.init(),
+    )
+    verdict = guardrail({"prompt": prompt})
+    if verdict.blocked:
+        ...
+
+The verdict holds the policy that fired and the metrics that were computed on the way;
+metrics no policy names are never computed.
+"""
+import inspect
+from logging import getLogger
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from whylogs.experimental.core.udf_schema import UdfSchema
+
+from langkit import intermediates, sampling
+from langkit.scorer import RowScorer, _output_names, _run, _Shape, _Step
+
+diagnostic_logger = getLogger(__name__)
+
+# cost tiers, cheapest first
+REGEX = 0
+TEXTSTAT = 1
+EMBEDDINGS = 2
+TRANSFORMERS = 3
+LLM = 4
+
+# the cost tier of the UDFs each langkit module registers
+COSTS: Dict[str, int] = {
+    "regexes": REGEX,
+    "count_regexes": REGEX,
+    "textstat": TEXTSTAT,
+    "sentiment": TEXTSTAT,
+    "vader_sentiment": TEXTSTAT,
+    "nlp_scores": TEXTSTAT,
+    "themes": EMBEDDINGS,
+    "input_output": EMBEDDINGS,
+    "injections": EMBEDDINGS,
+    "toxicity": TRANSFORMERS,
+    "topics": TRANSFORMERS,
+    "pii": TRANSFORMERS,
+    "response_hallucination": LLM,
+    "proactive_injection_detection": LLM,
+}
+
+# UDFs from outside langkit may run a model, so they go after the embeddings by default
+_UNKNOWN_COST = TRANSFORMERS
+
+
+class Policy(NamedTuple):
+    """
+    Fires when metric is above `above` or below `below`. With neither set, it fires when the
+    metric is truthy, e.g. when has_patterns found a pattern. A metric that is None, because
+    its UDF failed, never fires.
+    """
+
+    metric: str
+    above: Optional[float] = None
+    below: Optional[float] = None
+
+    def fires(self, value: Any) -> bool:
+        if value is None:
+            return False
+        if self.above is None and self.below is None:
+            return bool(value)
+        return (self.above is not None and value > self.above) or (
+            self.below is not None and value < self.below
+        )
+
+
+class Verdict(NamedTuple):
+    blocked: bool
+    # the policy that blocked the row, None if it passed
+    fired: Optional[Policy]
+    metrics: Dict[str, Any]
+
+
+# a step with its cost and the policies on its outputs
+_Check = Tuple[int, _Step, List[Policy]]
+
+
+class Guardrail:
+    """
+    Evaluates policies on single rows. costs maps metric names to cost tiers, for UDFs outside
+    langkit or to move a metric ahead of others in its tier.
+    """
+
+    def __init__(
+        self,
+        policies: Sequence[Policy],
+        schema: Optional[UdfSchema] = None,
+        costs: Optional[Mapping[str, int]] = None,
+    ):
+        self.policies = list(policies)
+        self._scorer = RowScorer(schema)
+        self._costs = dict(costs or {})
+        self._plans: Dict[_Shape, List[_Check]] = {}
+
+    def _cost(self, step: _Step) -> int:
+        new_col, _, udf, prefix = step
+        name = new_col if new_col is not None else prefix
+        if name in self._costs:
+            return self._costs[name]
+        module = getattr(inspect.unwrap(udf), "__module__", "") or ""
+        package, _, module_name = module.rpartition(".")
+        if package != "langkit":
+            return _UNKNOWN_COST
+        return COSTS.get(module_name, _UNKNOWN_COST)
+
+    def _plan(self, row: Mapping[str, Any]) -> List[_Check]:
+        steps = self._scorer.steps(row)
+        checks: List[_Check] = []
+        covered = set()
+        unnamed: List[_Step] = []
+        for step in steps:
+            names = _output_names(step)
+            if names is None:
+                unnamed.append(step)
+                continue
+            policies = [p for p in self.policies if p.metric in names]
+            if policies:
+                checks.append((self._cost(step), step, policies))
+                covered.update(p.metric for p in policies)
+        # multi-output UDFs that don't list their outputs are matched by prefix, the longest
+        # matching one, against the metrics left; a UDF without a prefix matches nothing
+        matched: Dict[int, List[Policy]] = {}
+        for policy in self.policies:
+            if policy.metric in covered:
+                continue
+            candidates = [
+                (len(step[3]), i)
+                for i, step in enumerate(unnamed)
+                if step[3] and policy.metric.startswith(f"{step[3]}.")
+            ]
+            if candidates:
+                matched.setdefault(max(candidates)[1], []).append(policy)
+        for i, policies in sorted(matched.items()):
+            checks.append((self._cost(unnamed[i]), unnamed[i], policies))
+        missing = [
+            p.metric
+            for p in self.policies
+            if not any(p in policies for _, _, policies in checks)
+        ]
+        if missing:
+            diagnostic_logger.warning(
+                f"Guardrail: no UDF in the schema computes {missing} for rows with columns {list(row)}"
+            )
+        # sorted is stable, so steps of one tier keep their order
+        return sorted(checks, key=lambda check: check[0])
+
+    def evaluate(self, row: Mapping[str, Any]) -> Verdict:
+        """
+        Computes the row's metrics cheapest first and stops at the first policy that fires.
+        Returns whether the row is blocked, the policy that fired and the computed metrics.
+        """
+        shape = tuple((column, type(value)) for column, value in row.items())
+        plan = self._plans.get(shape)
+        if plan is None:
+            plan = self._plans[shape] = self._plan(row)
+        metrics: Dict[str, Any] = {}
+        with intermediates.batch_scope(), sampling.bypassed():
+            for _, step, policies in plan:
+                _run(step, row, metrics)
+                for policy in policies:
+                    if policy.metric in metrics and policy.fires(
+                        metrics[policy.metric]
+                    ):
+                        return Verdict(True, policy, metrics)
+        return Verdict(False, None, metrics)
+
+    __call__ = evaluate
@@ -1,44 +1,95 @@
 from copy import deepcopy
+from threading import Lock
 from typing import Dict, List, Optional, Union
-from whylogs.experimental.core.udf_schema import register_dataset_udf
-from langkit import LangKitConfig, lang_config, prompt_column
-from sentence_transformers import SentenceTransformer
+from langkit.instrumentation import register_dataset_udf, timed_init
+from langkit import LangKitConfig, lang_config, prompt_column, intermediates, models
 import numpy as np
-from langkit.utils import _get_data_home
+from langkit.utils import _get_data_home, _offline, _require, _use_cuda
 import os
-import torch
 import pandas as pd
 
+_require(__name__, "torch", "sentence_transformers")
+
 _prompt = prompt_column
 _transformer_model = None
+_transformer_name: Optional[str] = None
+_model_key: Optional[models.ModelKey] = None
 _embeddings_norm = None
+# the harm embeddings are a registry entry too, read on first use
+_embeddings_key: Optional[models.ModelKey] = None
+_load_lock = Lock()
+
+
+def _artifact() -> str:
+    # SentenceTransformer.encode returns numpy arrays here, unlike Encoder's tensors
+    return f"embedding:{_transformer_name}:numpy"
+
+
+def _load_sentence_transformer(transformer_name: str):
+    def load():
+        from sentence_transformers import SentenceTransformer
 
-_USE_CUDA = torch.cuda.is_available() and not bool(
-    os.environ.get("LANGKIT_NO_CUDA", False)
-)
-_device = "cuda" if _USE_CUDA else "cpu"
+        return SentenceTransformer(
+            transformer_name, device="cuda" if _use_cuda() else "cpu"
+        )
+
+    return load
 
 
+@timed_init
 def init(
     transformer_name: Optional[str] = None,
-    version: Optional[str] = "v2",
+    version: Optional[str] = None,
     config: Optional[LangKitConfig] = None,
 ):
+    """
+    The transformer model and the harm embeddings are loaded on the first call to the
+    metric, or by warmup().
+    """
     config = config or deepcopy(lang_config)
 
     global _transformer_model
+    global _transformer_name
+    global _model_key
     global _embeddings_norm
+    global _embeddings_key
     if not transformer_name:
-        transformer_name = "all-MiniLM-L6-v2"
-    _transformer_model = SentenceTransformer(transformer_name, device=_device)
+        transformer_name = config.injections_transformer_name
+    if not version:
+        version = config.injections_version
+    model_id = models.sentence_transformer_id(transformer_name)
+    models.release(_model_key)
+    _model_key = models.acquire(
+        model_id,
+        "sentence_transformers",
+        models.DEFAULT_DEVICE,
+        _load_sentence_transformer(transformer_name),
+    )
+    _transformer_model = None
+    _transformer_name = model_id
+    intermediates.declare(f"{_prompt}.injection", _artifact())
     path = f"embeddings_{transformer_name}_harm_{version}.parquet"
     embeddings_url = config.injections_base_url + path
     embeddings_path = os.path.join(_get_data_home(), path)
+    models.release(_embeddings_key)
+    _embeddings_key = models.acquire(
+        path,
+        "numpy",
+        "cpu",
+        lambda: _load_embeddings(embeddings_path, embeddings_url),
+    )
+    _embeddings_norm = None
+
 
+def _load_embeddings(embeddings_path: str, embeddings_url: str) -> np.ndarray:
     try:
         harm_embeddings = pd.read_parquet(embeddings_path)
         save_embeddings = False
     except FileNotFoundError:
+        if _offline():
+            raise ValueError(
+                f"Injections - {embeddings_path} not found and LANGKIT_OFFLINE is set"
+            )
         try:
             harm_embeddings = pd.read_parquet(embeddings_url)
 
@@ -56,7 +107,7 @@ def init(
         array_list = [np.array(x) for x in harm_embeddings["sentence_embedding"].values]
         np_embeddings = np.stack(array_list).astype(np.float32)
 
-        _embeddings_norm = np_embeddings / np.linalg.norm(
+        embeddings_norm = np_embeddings / np.linalg.norm(
             np_embeddings, axis=1, keepdims=True
         )
 
@@ -71,18 +122,36 @@ def init(
         raise ValueError(
             f"Injections - unable to deserialize index to {embeddings_path}. Error: {deserialization_error}"
         )
+    return embeddings_norm
 
 
-@register_dataset_udf([_prompt], f"{_prompt}.injection")
-def injection(prompt: Union[Dict[str, List], pd.DataFrame]) -> List:
+def warmup() -> None:
+    """Loads the transformer model and the harm embeddings if they aren't loaded yet."""
     global _transformer_model
     global _embeddings_norm
 
-    if _transformer_model is None:
+    if _model_key is None:
         raise ValueError("Injections - transformer model not initialized")
-    if _embeddings_norm is None:
+    if _embeddings_key is None:
         raise ValueError("Injections - embeddings not initialized")
-    target_embeddings = _transformer_model.encode(prompt[_prompt])
+    with _load_lock:
+        if _transformer_model is None:
+            _transformer_model = models.load_key(_model_key)
+        if _embeddings_norm is None:
+            _embeddings_norm = models.load_key(_embeddings_key)
+
+
+@register_dataset_udf([_prompt], f"{_prompt}.injection")
+def injection(prompt: Union[Dict[str, List], pd.DataFrame]) -> List:
+    if _transformer_model is None or _embeddings_norm is None:
+        warmup()
+    target_embeddings = np.stack(
+        intermediates.get_many(
+            _artifact(),
+            list(prompt[_prompt]),
+            lambda texts: list(_transformer_model.encode(texts)),
+        )
+    )
     target_norms = target_embeddings / np.linalg.norm(
         target_embeddings, axis=1, keepdims=True
     )
@@ -2,9 +2,9 @@ from copy import deepcopy
 from logging import getLogger
 from typing import Callable, Optional
 
-from sentence_transformers import util
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
+from langkit import intermediates
 from langkit.transformer import Encoder
 
 _prompt = prompt_column
@@ -16,6 +16,7 @@ _transformer_model = None
 diagnostic_logger = getLogger(__name__)
 
 
+@timed_init
 def init(
     transformer_name: Optional[str] = None,
     custom_encoder: Optional[Callable] = None,
@@ -25,7 +26,18 @@ def init(
     global _transformer_model
     if transformer_name is None and custom_encoder is None:
         transformer_name = config.transformer_name
+    if _transformer_model is not None:
+        _transformer_model.release()
     _transformer_model = Encoder(transformer_name, custom_encoder)
+    intermediates.declare(
+        f"{_response}.relevance_to_{_prompt}", _transformer_model.artifact
+    )
+
+
+def warmup() -> None:
+    """Loads the transformer model now rather than on the first scored row."""
+    if _transformer_model is not None:
+        _transformer_model.warmup()
 
 
 init()
@@ -33,6 +45,8 @@ init()
 
 @register_dataset_udf([_prompt, _response], f"{_response}.relevance_to_{_prompt}")
 def prompt_response_similarity(text):
+    from sentence_transformers import util
+
     global _transformer_model
 
     if _transformer_model is None:
@@ -40,8 +54,24 @@ def prompt_response_similarity(text):
             "response.relevance_to_prompt must have a transformer model initialized before use."
         )
 
+    prompts, responses = list(text[_prompt]), list(text[_response])
+    if all(isinstance(t, str) for t in prompts + responses):
+        try:
+            # one encoder call for the whole batch, shared with the other embedding metrics
+            embeddings = _transformer_model.encode_each(prompts + responses)
+            return [
+                util.pytorch_cos_sim(embedding_1, embedding_2).item()
+                for embedding_1, embedding_2 in zip(
+                    embeddings[: len(prompts)], embeddings[len(prompts) :]
+                )
+            ]
+        except Exception as e:
+            diagnostic_logger.warning(
+                f"prompt_response_similarity batch encoding failed with error {e}, scoring rows one by one"
+            )
+
     series_result = []
-    for x, y in zip(text["prompt"], text["response"]):
+    for x, y in zip(prompts, responses):
         try:
             embedding_1 = _transformer_model.encode([x] if isinstance(x, str) else x)
             embedding_2 = _transformer_model.encode([y] if isinstance(y, str) else y)
@@ -0,0 +1,275 @@
+"""
+Timing of every UDF registered by the langkit modules and of their init functions.
+
+The modules register their UDFs through register_dataset_udf/register_multioutput_udf from
+here instead of whylogs; the registered function is wrapped so each batch call records its
+wall time and row count, which stats() summarizes. Recording is two perf_counter calls and a
+deque append per batch, and can be turned off with enable(False) or LANGKIT_NO_STATS=1.
+"""
+import os
+from collections import deque
+from functools import wraps
+from logging import getLogger
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import pandas as pd
+from whylogs.experimental.core.udf_schema import (
+    register_dataset_udf as _register_dataset_udf,
+    register_multioutput_udf as _register_multioutput_udf,
+)
+
+from langkit import result_cache, sampling
+
+diagnostic_logger = getLogger(__name__)
+
+
+# per-batch latencies kept for percentiles, per UDF
+_WINDOW = 1024
+
+_enabled = not bool(os.environ.get("LANGKIT_NO_STATS", False))
+_lock = Lock()
+
+
+class _UdfStats:
+    __slots__ = ["calls", "rows", "seconds", "batch_seconds"]
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.batch_seconds: Deque[float] = deque(maxlen=_WINDOW)
+
+
+_udf_stats: Dict[str, _UdfStats] = {}
+_init_stats: Dict[str, Dict[str, float]] = {}
+_caches: Dict[str, Callable[[], Any]] = {}
+
+
+def enable(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def _rows(data: Any) -> int:
+    if isinstance(data, pd.DataFrame):
+        return len(data)
+    if isinstance(data, dict) and data:
+        return len(next(iter(data.values())))
+    return 1
+
+
+def _record(name: str, rows: int, seconds: float) -> None:
+    with _lock:
+        stats = _udf_stats.get(name)
+        if stats is None:
+            stats = _udf_stats[name] = _UdfStats()
+        stats.calls += 1
+        stats.rows += rows
+        stats.seconds += seconds
+        stats.batch_seconds.append(seconds)
+
+
+def timed_udf(name: str, func: Callable) -> Callable:
+    @wraps(func)
+    def timed(data):
+        if not _enabled:
+            return func(data)
+        start = perf_counter()
+        try:
+            return func(data)
+        finally:
+            _record(name, _rows(data), perf_counter() - start)
+
+    return timed
+
+
+def _udf_name(func: Callable, udf_name: Optional[str], namespace: Optional[str]) -> str:
+    name = udf_name or func.__name__
+    return f"{namespace}.{name}" if namespace else name
+
+
+def register_dataset_udf(
+    col_names: List[str],
+    udf_name: Optional[str] = None,
+    *args,
+    namespace: Optional[str] = None,
+    **kwargs,
+) -> Callable[[Any], Any]:
+    """
+    whylogs' register_dataset_udf, with the registered UDF timed under its output name, its
+    results cached while result_cache is enabled and its rows sampled at its sample rate.
+    """
+
+    def decorator(func):
+        name = _udf_name(func, udf_name, namespace)
+        _register_dataset_udf(col_names, name, *args, **kwargs)(
+            timed_udf(
+                name,
+                sampling.sampled_udf(
+                    name, col_names, result_cache.cached_udf(name, col_names, func)
+                ),
+            )
+        )
+        return func
+
+    return decorator
+
+
+def register_multioutput_udf(
+    col_names: List[str],
+    udf_name: Optional[str] = None,
+    *args,
+    namespace: Optional[str] = None,
+    **kwargs,
+) -> Callable[[Any], Any]:
+    """
+    whylogs' register_multioutput_udf, with the registered UDF timed under its name, its
+    results cached while result_cache is enabled and its rows sampled at its sample rate.
+    The name defaults to the output prefix, so UDFs registered per column from one function
+    are told apart.
+    """
+    prefix = kwargs.get("prefix", args[0] if args else None)
+
+    def decorator(func):
+        name = _udf_name(func, udf_name or prefix, namespace)
+        _register_multioutput_udf(col_names, name, *args, **kwargs)(
+            timed_udf(
+                name,
+                sampling.sampled_udf(
+                    name,
+                    col_names,
+                    result_cache.cached_udf(name, col_names, func, multioutput=True),
+                    multioutput=True,
+                ),
+            )
+        )
+        return func
+
+    return decorator
+
+
+def timed_init(func: Callable) -> Callable:
+    """
+    Records the duration of a module's init calls under the module name, and the init
+    arguments that the result cache keys the module's results by.
+    """
+    module = func.__module__
+
+    @wraps(func)
+    def timed(*args, **kwargs):
+        result_cache.fingerprint(module, args, kwargs)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = perf_counter() - start
+            with _lock:
+                stats = _init_stats.setdefault(
+                    module, {"calls": 0, "seconds": 0.0, "last_seconds": 0.0}
+                )
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+                stats["last_seconds"] = seconds
+
+    return timed
+
+
+def register_cache(name: str, info: Callable[[], Any]) -> None:
+    """
+    Reports a cache's hit rate in stats(). info returns (hits, misses, current size), or is
+    the cache_info of a functools.lru_cache.
+    """
+    _caches[name] = info
+
+
+register_cache("results", result_cache.cache_info)
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stats() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Returns the collected statistics:
+        udfs: per UDF name, the batch calls, rows, total seconds, rows/sec and the p50/p95/p99
+            seconds per batch (over the last batches),
+        init: per module, the init calls, total seconds and the duration of the last call,
+        caches: per cache, the hits, misses, hit rate and size,
+        models: per model in the registry ("model_id (backend, device)"), whether it is
+            loaded and how long loading it took. Models load on first use, not in init.
+    """
+    with _lock:
+        udfs = {}
+        for name, s in _udf_stats.items():
+            ordered = sorted(s.batch_seconds)
+            udfs[name] = {
+                "calls": s.calls,
+                "rows": s.rows,
+                "seconds": s.seconds,
+                "rows_per_sec": s.rows / s.seconds if s.seconds else None,
+                "p50": _percentile(ordered, 0.5),
+                "p95": _percentile(ordered, 0.95),
+                "p99": _percentile(ordered, 0.99),
+            }
+        inits = {module: dict(s) for module, s in _init_stats.items()}
+    caches = {}
+    for name, info in _caches.items():
+        current = info()
+        if hasattr(current, "currsize"):
+            hits, misses, size = current.hits, current.misses, current.currsize
+        else:
+            hits, misses, size = current
+        total = hits + misses
+        caches[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else None,
+            "size": size,
+        }
+    from langkit import models
+
+    loaded = {
+        f"{entry['model_id']} ({entry['backend']}, {entry['device']})": {
+            "loaded": entry["loaded"],
+            "load_seconds": entry["load_seconds"],
+        }
+        for entry in models.report()
+    }
+    return {"udfs": udfs, "init": inits, "caches": caches, "models": loaded}
+
+
+def reset_stats() -> None:
+    """Clears the UDF statistics. init timings are kept, since most inits run at import."""
+    with _lock:
+        _udf_stats.clear()
+
+
+def stats_dataframe() -> pd.DataFrame:
+    """The UDF statistics as a DataFrame with one row per UDF."""
+    udfs = stats()["udfs"]
+    return pd.DataFrame(
+        [{"udf": name, **values} for name, values in udfs.items()],
+        columns=[
+            "udf",
+            "calls",
+            "rows",
+            "seconds",
+            "rows_per_sec",
+            "p50",
+            "p95",
+            "p99",
+        ],
+    )
+
+
+def log_stats():
+    """
+    Logs the UDF statistics with whylogs, so they can be written next to the data profile,
+    e.g. why.log(df, schema=schema).writer(...) and log_stats().writer(...).
+    """
+    import whylogs as why
+
+    return why.log(stats_dataframe())
@@ -0,0 +1,149 @@
+"""
+Intermediates shared by UDFs within one batch.
+
+Several metrics start from the same derived data (sentence splits, embeddings of the same
+text, ...). UDFs fetch those through get/get_many with the artifact kind they need; while a
+batch scope is open, each (kind, text) is computed once and served to every UDF that asks for
+it, and everything is released when the outermost scope closes. Outside a scope artifacts are
+computed on every call, exactly as if the UDF computed them itself.
+
+extract opens a scope around each call, so all metrics of one extract share artifacts. Each
+outermost scope has its own store, held in a context variable: concurrent extract calls
+don't see each other's artifacts, and a store is freed as soon as its scope exits. The UDF
+thread pools run their tasks in a copy of the caller's context, so they share its store.
+"""
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging import getLogger
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+from langkit.instrumentation import register_cache
+
+diagnostic_logger = getLogger(__name__)
+
+
+_producers: Dict[str, Callable[[List[Any]], List[Any]]] = {}
+_consumers: Dict[str, Set[str]] = defaultdict(set)
+
+_MISSING = object()
+_stats_lock = Lock()
+_hits = 0
+_misses = 0
+
+
+class _Batch:
+    """The artifacts of one outermost scope."""
+
+    def __init__(self):
+        self.store: Dict[Tuple[str, Hashable], Any] = {}
+        self.lock = Lock()
+
+
+_current: ContextVar[Optional[_Batch]] = ContextVar(
+    "langkit_intermediates_batch", default=None
+)
+# open batches, for reporting how many artifacts are held
+_batches: "weakref.WeakSet[_Batch]" = weakref.WeakSet()
+
+
+def register_artifact(kind: str, producer: Callable[[List[Any]], List[Any]]) -> None:
+    """Registers the batch producer of an artifact kind: it maps a list of texts to a list of artifacts."""
+    _producers[kind] = producer
+
+
+def declare(udf_name: str, *kinds: str) -> None:
+    """Records the artifact kinds consumed by the UDF named udf_name, replacing earlier ones."""
+    _consumers[udf_name] = set(kinds)
+
+
+def consumers() -> Dict[str, List[str]]:
+    """The artifact kinds each registered metric consumes, by UDF name."""
+    return {udf: sorted(kinds) for udf, kinds in sorted(_consumers.items()) if kinds}
+
+
+@contextmanager
+def batch_scope():
+    """
+    Keeps computed artifacts for reuse until the outermost scope of the current context
+    exits. Scopes opened inside it share its store.
+    """
+    if _current.get() is not None:
+        yield
+        return
+    batch = _Batch()
+    _batches.add(batch)
+    token = _current.set(batch)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        _batches.discard(batch)
+
+
+def get_many(
+    kind: str,
+    texts: Sequence[Any],
+    producer: Optional[Callable[[List[Any]], List[Any]]] = None,
+) -> List[Any]:
+    """
+    Returns the artifact of the given kind for every text, computing the ones not yet in
+    the open batch scope with a single producer call. producer defaults to the one
+    registered for kind.
+    """
+    producer = producer or _producers.get(kind)
+    if producer is None:
+        raise ValueError(f"No producer registered for artifact {kind}")
+    try:
+        unique = list(dict.fromkeys(texts))
+    except TypeError:
+        # unhashable inputs (e.g. pre-tokenized lists) can't be shared
+        return list(producer(list(texts)))
+
+    global _hits, _misses
+    batch = _current.get()
+    artifacts: Dict[Any, Any] = {}
+    if batch is not None:
+        with batch.lock:
+            for text in unique:
+                artifact = batch.store.get((kind, text), _MISSING)
+                if artifact is not _MISSING:
+                    artifacts[text] = artifact
+    missing = [text for text in unique if text not in artifacts]
+    with _stats_lock:
+        _hits += len(texts) - len(missing)
+        _misses += len(missing)
+    if missing:
+        computed = list(zip(missing, producer(missing)))
+        artifacts.update(computed)
+        if batch is not None:
+            with batch.lock:
+                batch.store.update(
+                    ((kind, text), artifact) for text, artifact in computed
+                )
+    return [artifacts[text] for text in texts]
+
+
+def get(
+    kind: str, text: Any, producer: Optional[Callable[[List[Any]], List[Any]]] = None
+) -> Any:
+    return get_many(kind, [text], producer)[0]
+
+
+def _sentences(texts: List[str]) -> List[List[str]]:
+    from nltk.tokenize import sent_tokenize
+
+    return [sent_tokenize(text) for text in texts]
+
+
+register_artifact("sentences", _sentences)
+
+
+def cache_info() -> Tuple[int, int, int]:
+    """Artifacts served from the batch stores, computed, and currently held by open scopes."""
+    return _hits, _misses, sum(len(batch.store) for batch in list(_batches))
+
+
+register_cache("intermediates", cache_info)
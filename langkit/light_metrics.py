@@ -3,12 +3,14 @@ from whylogs.experimental.core.udf_schema import udf_schema
 from whylogs.core.schema import DeclarativeSchema
 
 from langkit import LangKitConfig
+from langkit import sampling
 from langkit.metadata import attach_schema_metadata
 from langkit import regexes
 from langkit import textstat
 
 
 def init(config: Optional[LangKitConfig] = None) -> DeclarativeSchema:
+    sampling.init(config=config)
     regexes.init(config=config)
     textstat.init(config=config)
 
@@ -1,5 +1,6 @@
 from langkit.metadata import attach_schema_metadata
 from langkit import LangKitConfig
+from langkit import sampling
 from logging import getLogger
 from typing import Optional
 from whylogs.experimental.core.udf_schema import udf_schema
@@ -21,6 +22,7 @@ except ImportError:
 
 
 def init(config: Optional[LangKitConfig] = None) -> DeclarativeSchema:
+    sampling.init(config=config)
     regexes.init(config=config)
     sentiment.init(config=config)
     textstat.init(config=config)
@@ -30,3 +32,11 @@ def init(config: Optional[LangKitConfig] = None) -> DeclarativeSchema:
 
     text_schema = attach_schema_metadata(udf_schema(), "llm_metrics")
     return text_schema
+
+
+def warmup() -> None:
+    """Loads the models and lexicons of the included metrics."""
+    sentiment.warmup()
+    themes.warmup()
+    toxicity.warmup()
+    input_output.warmup()
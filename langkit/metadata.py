@@ -1,4 +1,6 @@
-from langkit import __version__
+import json
+
+from langkit import __version__, sampling
 from logging import getLogger
 
 from typing import Any, Dict, Optional
@@ -6,6 +8,7 @@ from typing import Any, Dict, Optional
 
 _LANGKIT_VERSION_METADATA_KEY = "langkit.version"
 _LANGKIT_METRIC_COLLECTION_KEY = "langkit.metric_collection"
+_LANGKIT_SAMPLE_RATES_KEY = "langkit.sample_rates"
 diagnostic_logger = getLogger(__name__)
 
 
@@ -26,6 +29,9 @@ def _add_langkit_version_metadata(
         metadata[_LANGKIT_VERSION_METADATA_KEY] = __version__
         if metric_collection_name:
             metadata[_LANGKIT_METRIC_COLLECTION_KEY] = metric_collection_name
+        rates = sampling.sample_rates()
+        if rates:
+            metadata[_LANGKIT_SAMPLE_RATES_KEY] = json.dumps(rates, sort_keys=True)
     return metadata
 
 
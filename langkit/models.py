@@ -0,0 +1,207 @@
+"""
+Process-wide registry of loaded models.
+
+Modules resolve their models through load() with a (model id, backend, device) key, so two
+modules asking for the same weights share one instance. Modules that hold on to a model call
+acquire() when they start using it and release() when they stop (e.g. when re-initialized with
+another model); evict() frees models nobody holds, and report() lists what is loaded.
+"""
+import gc
+import os
+import sys
+import time
+from logging import getLogger
+from threading import RLock
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from langkit import result_cache
+from langkit.instrumentation import register_cache
+
+diagnostic_logger = getLogger(__name__)
+
+
+# the device a model loads on when the caller doesn't force one: the GPU if torch sees one.
+# Keys use this name instead of the resolved device so that acquiring a model doesn't
+# have to import torch.
+DEFAULT_DEVICE = "default"
+
+
+class ModelKey(NamedTuple):
+    model_id: str
+    backend: str
+    device: str
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.model: Any = None
+        self.loaded = False
+        self.refcount = 0
+        self.load_seconds: Optional[float] = None
+
+
+_entries: Dict[ModelKey, _Entry] = {}
+# loaders that replace the modules' own, by (model id, backend), e.g. to read a snapshot
+_overrides: Dict[Tuple[str, str], Callable[[ModelKey], Any]] = {}
+_lock = RLock()
+_hits = 0
+_misses = 0
+
+
+def _key(model_id: str, backend: str, device: Any) -> ModelKey:
+    return ModelKey(str(model_id), backend, str(device))
+
+
+def acquire(
+    model_id: str, backend: str, device: Any, loader: Callable[[], Any]
+) -> ModelKey:
+    """
+    Registers one more holder of the model and returns its key. Nothing is loaded until
+    load() is first called for it.
+    """
+    key = _key(model_id, backend, device)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = _entries[key] = _Entry(loader)
+        entry.refcount += 1
+    return key
+
+
+def release(key: Optional[ModelKey]) -> None:
+    """Drops one holder of the model. The model stays loaded until evict() is called."""
+    if key is None:
+        return
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.refcount > 0:
+            entry.refcount -= 1
+
+
+def load(model_id: str, backend: str, device: Any, loader: Callable[[], Any]) -> Any:
+    """Returns the shared instance of the model, calling loader only if it isn't loaded yet."""
+    global _hits, _misses
+    key = _key(model_id, backend, device)
+    entry = _entries.get(key)
+    if entry is not None and entry.loaded:
+        _hits += 1
+        return entry.model
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = _entries[key] = _Entry(loader)
+        if not entry.loaded:
+            _misses += 1
+            start = time.perf_counter()
+            override = _overrides.get((key.model_id, key.backend))
+            entry.model = override(key) if override is not None else loader()
+            entry.load_seconds = time.perf_counter() - start
+            entry.loaded = True
+            diagnostic_logger.info(
+                f"Loaded {key.model_id} ({key.backend}, {key.device}) in {entry.load_seconds:.2f}s"
+            )
+        else:
+            _hits += 1
+        return entry.model
+
+
+def load_key(key: ModelKey) -> Any:
+    """load() for a key returned by acquire()."""
+    with _lock:
+        entry = _entries[key]
+    return load(key.model_id, key.backend, key.device, entry.loader)
+
+
+def override(
+    model_id: str, backend: str, loader: Optional[Callable[[ModelKey], Any]]
+) -> None:
+    """
+    Loads the model with loader(key) instead of the loader given by the module using it,
+    from the next time it is loaded. None removes the override.
+    """
+    with _lock:
+        if loader is None:
+            _overrides.pop((str(model_id), backend), None)
+        else:
+            _overrides[(str(model_id), backend)] = loader
+    result_cache.invalidate()
+
+
+def loaded() -> Dict[ModelKey, Any]:
+    """The currently loaded models by key."""
+    with _lock:
+        return {key: entry.model for key, entry in _entries.items() if entry.loaded}
+
+
+def evict(key: Optional[ModelKey] = None, force: bool = False) -> int:
+    """
+    Unloads the given model, or every model if key is None, skipping models that are still
+    held unless force is set. Returns the number of models unloaded.
+    """
+    evicted = 0
+    with _lock:
+        for k in [key] if key is not None else list(_entries):
+            entry = _entries.get(k)
+            if entry is None or not entry.loaded:
+                continue
+            if entry.refcount > 0 and not force:
+                continue
+            entry.model = None
+            entry.loaded = False
+            evicted += 1
+            if entry.refcount == 0:
+                del _entries[k]
+    if evicted:
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    return evicted
+
+
+def _memory_bytes(model: Any) -> Optional[int]:
+    # pipelines wrap the torch module in .model
+    module = getattr(model, "model", model)
+    parameters = getattr(module, "parameters", None)
+    if not callable(parameters):
+        return None
+    try:
+        total = sum(p.numel() * p.element_size() for p in module.parameters())
+        total += sum(b.numel() * b.element_size() for b in module.buffers())
+        return total
+    except Exception:  # noqa
+        return None
+
+
+def report() -> List[Dict[str, Any]]:
+    """One entry per known model: key, holders, whether it is loaded, load time and size."""
+    with _lock:
+        items = list(_entries.items())
+    return [
+        {
+            "model_id": key.model_id,
+            "backend": key.backend,
+            "device": key.device,
+            "refcount": entry.refcount,
+            "loaded": entry.loaded,
+            "load_seconds": entry.load_seconds,
+            "memory_bytes": _memory_bytes(entry.model) if entry.loaded else None,
+        }
+        for key, entry in items
+    ]
+
+
+def sentence_transformer_id(model_name: str) -> str:
+    """
+    The id sentence_transformers resolves a name to, so "all-MiniLM-L6-v2" and
+    "sentence-transformers/all-MiniLM-L6-v2" share one instance.
+    """
+    if "/" not in model_name and not os.path.exists(model_name):
+        return f"sentence-transformers/{model_name}"
+    return model_name
+
+
+register_cache(
+    "models", lambda: (_hits, _misses, sum(e.loaded for e in _entries.values()))
+)
@@ -1,6 +1,6 @@
 from copy import deepcopy
 from typing import List, Optional, Set
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 import evaluate
 from langkit import LangKitConfig, lang_config, response_column
 from logging import getLogger
@@ -86,6 +86,7 @@ def _register_score_udfs():
         )
 
 
+@timed_init
 def init(
     corpus: Optional[str] = None,
     scores: Set[str] = set(),
@@ -0,0 +1,414 @@
+import atexit
+import contextvars
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from logging import getLogger
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from whylogs.core.stubs import pd
+from whylogs.experimental.core.udf_schema import UdfSchema
+
+from langkit import intermediates, sampling
+
+diagnostic_logger = getLogger(__name__)
+
+_torch_threads_lock = Lock()
+_active_pools = 0
+_saved_torch_threads: Optional[int] = None
+
+
+# set while a pool worker runs a task, so UDFs that extract again run their UDFs inline
+# instead of waiting on workers of the pool they occupy
+_worker = threading.local()
+
+
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = Lock()
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = _executors[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="langkit-udf"
+            )
+        return executor
+
+
+def shutdown(wait: bool = True) -> None:
+    """Shuts the thread pools down; later calls start new ones. Runs at interpreter exit."""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+atexit.register(shutdown)
+
+
+def _in_worker(task: Callable) -> Callable:
+    def run():
+        _worker.active = True
+        try:
+            return task()
+        finally:
+            _worker.active = False
+
+    return run
+
+
+@contextmanager
+def _coordinated_torch_threads(max_workers: int):
+    """
+    Splits torch's intra-op threads between the pool workers while UDFs run concurrently,
+    so that max_workers torch calls do not each try to use every core.
+    """
+    global _active_pools, _saved_torch_threads
+    torch = sys.modules.get("torch")
+    if torch is None:
+        yield
+        return
+    with _torch_threads_lock:
+        if _active_pools == 0:
+            _saved_torch_threads = torch.get_num_threads()
+            torch.set_num_threads(max(1, (os.cpu_count() or 1) // max_workers))
+        _active_pools += 1
+    try:
+        yield
+    finally:
+        with _torch_threads_lock:
+            _active_pools -= 1
+            if _active_pools == 0 and _saved_torch_threads is not None:
+                torch.set_num_threads(_saved_torch_threads)
+
+
+def _unique_rows(frame: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[Any]]:
+    """
+    The distinct rows of frame, in order of first appearance, and for every row of frame
+    the position of its value among them. The inverse is None when all rows are distinct
+    or their values can't be hashed, and frame is then returned unchanged.
+    """
+    if len(frame.columns) == 1:
+        keys = frame.iloc[:, 0]
+    else:
+        keys = pd.Series(list(zip(*(frame[column] for column in frame.columns))))
+    try:
+        codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    except TypeError:
+        return frame, None
+    if len(uniques) == len(frame):
+        return frame, None
+    # codes are numbered in order of first appearance
+    _, first = np.unique(codes, return_index=True)
+    return frame.iloc[first].reset_index(drop=True), codes
+
+
+def _expand(new_df: pd.DataFrame, inverse: Optional[Any], size: int) -> pd.DataFrame:
+    """Scatters the results computed on the distinct rows back to every row."""
+    if inverse is None:
+        return new_df
+    return pd.DataFrame(
+        {
+            # a failed UDF yields a single None rather than one value per row
+            column: new_df[column]
+            .reindex(range(size))
+            .iloc[inverse]
+            .reset_index(drop=True)
+            for column in new_df.keys()
+        }
+    )
+
+
+# The UDF application helpers below produce what UdfSchema.apply_udfs does in whylogs 1.5;
+# they are kept here rather than imported from whylogs' private helpers, which can change
+# in any release.
+
+
+def _apply_udfs_on_dataframe(
+    inputs: Union[pd.DataFrame, pd.Series],
+    udfs: Dict[str, Callable],
+    new_df: pd.DataFrame,
+    input_cols: Collection[str],
+) -> None:
+    """One output column per UDF; inputs is a Series for type UDFs."""
+    for new_col, udf in udfs.items():
+        if new_col in input_cols:
+            continue
+        try:
+            new_df[new_col] = pd.Series(udf(inputs))
+        except Exception as e:  # noqa
+            new_df[new_col] = pd.Series([None])
+            diagnostic_logger.exception(
+                f"Evaluating UDF {new_col} failed with error {e}"
+            )
+
+
+def _apply_udf_on_dataframe(
+    name: str,
+    prefix: Optional[str],
+    frame: pd.DataFrame,
+    udf: Callable,
+    new_df: pd.DataFrame,
+) -> None:
+    """A multi-output UDF, its outputs named after its result keys."""
+    try:
+        output = pd.DataFrame(udf(frame))
+        for column in output.keys():
+            new_df[f"{prefix}.{column}" if prefix else column] = output[column]
+    except Exception as e:  # noqa
+        diagnostic_logger.exception(f"Evaluating UDF {name} failed with error {e}")
+
+
+def _apply_udfs_on_row(
+    values: Union[List, Dict[str, List]],
+    udfs: Dict[str, Callable],
+    new_columns: Dict[str, Any],
+    input_cols: Collection[str],
+) -> None:
+    for new_col, udf in udfs.items():
+        if new_col in input_cols:
+            continue
+        try:
+            new_columns[new_col] = udf(values)[0]
+        except Exception:  # noqa
+            new_columns[new_col] = None
+            diagnostic_logger.exception(f"Evaluating UDF {new_col} failed")
+
+
+def _apply_udf_on_row(
+    name: str,
+    prefix: Optional[str],
+    values: Dict[str, List],
+    udf: Callable,
+    new_columns: Dict[str, Any],
+) -> None:
+    try:
+        for new_col, value in udf(values).items():
+            new_columns[f"{prefix}.{new_col}" if prefix else new_col] = value[0]
+    except Exception as e:  # noqa
+        diagnostic_logger.exception(f"Evaluating UDF {name} failed with error {e}")
+
+
+def _dataframe_tasks(
+    schema: UdfSchema, pandas: pd.DataFrame, dedupe: bool = False
+) -> List[Callable[[], pd.DataFrame]]:
+    """
+    One task per UDF, each writing to its own DataFrame so tasks share no state. With
+    dedupe, every UDF runs on the distinct values of its input columns (distinct tuples
+    for UDFs reading several columns) and its results are scattered back to all rows.
+    """
+    input_cols = pandas.keys()
+    tasks: List[Callable[[], pd.DataFrame]] = []
+    inputs: Dict[Tuple[str, ...], Tuple[pd.DataFrame, Optional[Any]]] = {}
+
+    def unique(columns: List[str]) -> Tuple[pd.DataFrame, Optional[Any]]:
+        # computed while building the tasks, so that concurrent tasks only read it
+        key = tuple(columns)
+        if key not in inputs:
+            frame = pandas[list(columns)]
+            inputs[key] = _unique_rows(frame) if dedupe else (frame, None)
+        return inputs[key]
+
+    def single(columns: List[str], new_col: str, udf: Callable):
+        frame, inverse = unique(columns)
+
+        def task() -> pd.DataFrame:
+            new_df = pd.DataFrame()
+            _apply_udfs_on_dataframe(frame, {new_col: udf}, new_df, input_cols)
+            return _expand(new_df, inverse, len(frame))
+
+        return task
+
+    def multi(spec):
+        frame, inverse = unique(spec.column_names)
+
+        def task() -> pd.DataFrame:
+            new_df = pd.DataFrame()
+            _apply_udf_on_dataframe(spec.name, spec.prefix, frame, spec.udf, new_df)
+            return _expand(new_df, inverse, len(frame))
+
+        return task
+
+    def typed(column: str, udfs: Dict[str, Callable]):
+        frame, inverse = unique([column])
+
+        def task() -> pd.DataFrame:
+            new_df = pd.DataFrame()
+            _apply_udfs_on_dataframe(frame[column], udfs, new_df, input_cols)
+            return _expand(new_df, inverse, len(frame))
+
+        return task
+
+    for spec in schema.multicolumn_udfs:
+        if spec.column_names and set(spec.column_names).issubset(set(input_cols)):
+            if spec.udf is not None:
+                tasks.append(multi(spec))
+            else:
+                for new_col, udf in spec.udfs.items():
+                    tasks.append(single(spec.column_names, new_col, udf))
+
+    for column, dtype in pandas.dtypes.items():
+        why_type = type(schema.type_mapper(dtype))
+        for spec in schema.type_udfs[why_type]:
+            udfs = {f"{column}.{key}": spec.udfs[key] for key in spec.udfs.keys()}
+            tasks.append(typed(column, udfs))
+    return tasks
+
+
+def _row_tasks(
+    schema: UdfSchema, row: Mapping[str, Any]
+) -> List[Callable[[], Dict[str, Any]]]:
+    input_cols: Collection[str] = row.keys()
+    tasks: List[Callable[[], Dict[str, Any]]] = []
+
+    def single(values: Union[List, Dict[str, List]], udfs: Dict[str, Callable]):
+        def task() -> Dict[str, Any]:
+            new_columns: Dict[str, Any] = {}
+            _apply_udfs_on_row(values, udfs, new_columns, input_cols)
+            return new_columns
+
+        return task
+
+    def multi(spec, inputs: Dict[str, List]):
+        def task() -> Dict[str, Any]:
+            new_columns: Dict[str, Any] = {}
+            _apply_udf_on_row(spec.name, spec.prefix, inputs, spec.udf, new_columns)
+            return new_columns
+
+        return task
+
+    for spec in schema.multicolumn_udfs:
+        if spec.column_names and set(spec.column_names).issubset(set(input_cols)):
+            inputs = {col: [row[col]] for col in spec.column_names}
+            if spec.udf is not None:
+                tasks.append(multi(spec, inputs))
+            else:
+                for new_col, udf in spec.udfs.items():
+                    tasks.append(single(inputs, {new_col: udf}))
+
+    for column, value in row.items():
+        why_type = type(schema.type_mapper(type(value)))
+        for spec in schema.type_udfs[why_type]:
+            udfs = {f"{column}.{key}": spec.udfs[key] for key in spec.udfs.keys()}
+            tasks.append(single([value], udfs))
+    return tasks
+
+
+def _run(tasks: List[Callable], max_workers: int) -> List[Any]:
+    if max_workers <= 1 or len(tasks) <= 1 or getattr(_worker, "active", False):
+        return [task() for task in tasks]
+    with _coordinated_torch_threads(max_workers):
+        executor = _get_executor(max_workers)
+        # each task runs in a copy of this context, to share the caller's intermediates
+        futures = [
+            executor.submit(contextvars.copy_context().run, _in_worker(task))
+            for task in tasks
+        ]
+        # results are collected in submission order, so the output is deterministic
+        return [future.result() for future in futures]
+
+
+def apply_udfs(
+    schema: UdfSchema,
+    pandas: Optional[pd.DataFrame] = None,
+    row: Optional[Dict[str, Any]] = None,
+    max_workers: Optional[int] = None,
+    dedupe: bool = False,
+) -> Tuple[Optional[pd.DataFrame], Optional[Mapping[str, Any]]]:
+    """
+    Same contract as UdfSchema.apply_udfs, but runs the schema's UDFs concurrently on a
+    thread pool of max_workers threads (os.cpu_count() by default). Every UDF sees only the
+    input columns, as in the sequential path, and output columns are assembled in
+    registration order regardless of completion order. With dedupe, each UDF of a
+    DataFrame only runs on the distinct values of its input columns.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    new_columns = None
+    new_df = None
+    if row is not None:
+        new_columns = dict(row)
+        for columns in _run(_row_tasks(schema, row), max_workers):
+            new_columns.update(columns)
+        for col in set(row.keys()).intersection(schema.drop_columns):
+            new_columns.pop(col)
+
+    if pandas is not None:
+        new_df = pd.DataFrame()
+        for task_df in _run(_dataframe_tasks(schema, pandas, dedupe), max_workers):
+            for new_col in task_df.keys():
+                new_df[new_col] = task_df[new_col]
+        new_df = pd.concat([pandas, new_df], axis=1)
+        if schema.drop_columns:
+            new_df = new_df.drop(
+                columns=list(set(new_df.keys()).intersection(schema.drop_columns))
+            )
+
+    return new_df, new_columns
+
+
+class ParallelUdfSchema(UdfSchema):
+    """
+    A UdfSchema that runs its UDFs on a thread pool when used for logging, e.g.
+    why.log(df, schema=ParallelUdfSchema(udf_schema(), max_workers=4)). With dedupe, the
+    UDFs only run on the distinct values of their input columns; max_workers=1 keeps them
+    sequential.
+    """
+
+    def __init__(
+        self,
+        schema: UdfSchema,
+        max_workers: Optional[int] = None,
+        dedupe: bool = False,
+    ):
+        # the one whylogs internal this relies on: the hook apply_udfs and logging go through
+        if not callable(getattr(UdfSchema, "_run_udfs", None)):
+            import whylogs
+
+            raise NotImplementedError(
+                f"ParallelUdfSchema needs UdfSchema._run_udfs, which whylogs {whylogs.__version__} doesn't have"
+            )
+        self.__dict__.update(schema.__dict__)
+        self.max_workers = max_workers
+        self.dedupe = dedupe
+
+    def copy(self) -> "ParallelUdfSchema":
+        # UdfSchema.copy builds a plain DeclarativeSchema, which has neither the pool
+        # settings nor drop_columns
+        copy = ParallelUdfSchema(
+            super().copy(), max_workers=self.max_workers, dedupe=self.dedupe
+        )
+        copy.drop_columns = set(self.drop_columns)
+        return copy
+
+    def _run_udfs(
+        self,
+        pandas: Optional[pd.DataFrame] = None,
+        row: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Optional[pd.DataFrame], Optional[Mapping[str, Any]]]:
+        with intermediates.batch_scope(), sampling.keyed(
+            pandas if pandas is not None else row or {}
+        ):
+            return apply_udfs(
+                self,
+                pandas=pandas,
+                row=row,
+                max_workers=self.max_workers,
+                dedupe=self.dedupe,
+            )
@@ -1,20 +1,302 @@
+import hashlib
 import json
+import os
 import re
+import threading
+from abc import ABC, abstractmethod
 from copy import deepcopy
+from dataclasses import dataclass, field
+from functools import lru_cache
 from logging import getLogger
-from typing import Optional
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from langkit import LangKitConfig, lang_config
+from langkit import LangKitConfig, lang_config, result_cache
 
 
 diagnostic_logger = getLogger(__name__)
 
+_SUPPORTED_ENGINES = ["re", "re2"]
 
-class PatternLoader:
-    def __init__(self, config: Optional[LangKitConfig] = None):
+
+@lru_cache(maxsize=None)
+def _get_re2():
+    # cached so the missing module is only reported once per process
+    try:
+        import re2  # type: ignore
+
+        return re2
+    except ImportError:
+        diagnostic_logger.warning(
+            "regex_engine 're2' requested but the re2 module is not installed, "
+            "falling back to python's re. Install it with `pip install google-re2`."
+        )
+        return None
+
+
+# re flags re2 accepts as inline flags
+_INLINE_FLAGS = [(re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s")]
+
+
+def compile_expression(expression: str, engine: str = "re", flags: int = 0):
+    """
+    Compiles expression with the requested engine and re flags (IGNORECASE, MULTILINE and
+    DOTALL). The re2 engine matches in linear time, expressions using constructs it does not
+    support (lookarounds, backreferences) fall back to re.
+    """
+    if engine not in _SUPPORTED_ENGINES:
+        raise ValueError(
+            f"Unknown regex engine {engine}, supported engines are {_SUPPORTED_ENGINES}"
+        )
+    if engine == "re2":
+        re2 = _get_re2()
+        if re2 is not None:
+            inline = "".join(letter for flag, letter in _INLINE_FLAGS if flags & flag)
+            try:
+                return re2.compile(f"(?{inline}){expression}" if inline else expression)
+            except Exception as unsupported:
+                diagnostic_logger.info(
+                    f"Expression {expression} is not supported by re2, falling back to re: {unsupported}"
+                )
+    return re.compile(expression, flags)
+
+
+def expression_engine(expression: Any) -> str:
+    return "re2" if type(expression).__module__.startswith("re2") else "re"
+
+
+_budget_warned = False
+
+
+def _budgeted(
+    regex_groups: List[Dict[str, Any]], text: str, time_budget: Optional[float]
+) -> Iterator[Tuple[str, Any]]:
+    """Yields (group name, expression) in order until text has used up time_budget."""
+    global _budget_warned
+    start = perf_counter() if time_budget is not None else None
+    for group in regex_groups:
+        for expression in group["expressions"]:
+            yield group["name"], expression
+            if start is not None and perf_counter() - start > time_budget:
+                if not _budget_warned:
+                    _budget_warned = True
+                    diagnostic_logger.warning(
+                        f"Pattern search exceeded regex_time_budget of {time_budget}s on a "
+                        f"text of length {len(text)}, skipping the remaining expressions; "
+                        "further occurrences are not logged. Use PatternLoader.profile to "
+                        "find the slow expression."
+                    )
+                return
+
+
+def search_groups(
+    regex_groups: List[Dict[str, Any]], text: str, time_budget: Optional[float] = None
+) -> Iterator[Tuple[str, bool]]:
+    """
+    Searches text with every expression in order, yielding (group name, matched) per
+    expression. With time_budget (in seconds), the remaining expressions are skipped once the
+    text has taken longer than the budget; an expression that is already searching can't be
+    interrupted with python's re, which is what the re2 engine is for.
+    """
+    for name, expression in _budgeted(regex_groups, text, time_budget):
+        yield name, expression.search(text) is not None
+
+
+def find_spans(
+    regex_groups: List[Dict[str, Any]], text: str, time_budget: Optional[float] = None
+) -> List[Tuple[int, int, str]]:
+    """
+    Every match of every expression as (start, end, group name), in group order and by
+    start within an expression, within time_budget as in search_groups.
+    """
+    return [
+        (match.start(), match.end(), name)
+        for name, expression in _budgeted(regex_groups, text, time_budget)
+        for match in expression.finditer(text)
+    ]
+
+
+@dataclass
+class ExpressionProfile:
+    """
+    Timing of a single compiled expression over a set of texts.
+
+    group: str
+        The name of the pattern group the expression belongs to.
+    expression: str
+        The expression source.
+    engine: str
+        The engine the expression was compiled with, either re or re2.
+    total_time: float
+        Seconds spent searching all texts.
+    max_time: float
+        Seconds spent on the slowest text.
+    over_budget: List[int]
+        Indexes of the texts where this expression alone exceeded the time budget.
+    """
+
+    group: str
+    expression: str
+    engine: str
+    total_time: float = 0.0
+    max_time: float = 0.0
+    over_budget: List[int] = field(default_factory=list)
+
+    def to_summary_dict(self):
+        return {
+            "group": self.group,
+            "expression": self.expression,
+            "engine": self.engine,
+            "total_time": self.total_time,
+            "max_time": self.max_time,
+            "over_budget": self.over_budget,
+        }
+
+
+def profile_regex_groups(
+    regex_groups: List[Dict[str, Any]], texts: List[str], time_budget: float = 0.01
+) -> List[ExpressionProfile]:
+    """
+    Searches every text with every expression and reports per-expression timings, slowest first.
+    Expressions exceeding time_budget (in seconds) for a single text are candidates for
+    rewriting or for the re2 engine.
+    """
+    profiles: List[ExpressionProfile] = []
+    for group in regex_groups:
+        for expression in group["expressions"]:
+            profile = ExpressionProfile(
+                group=group["name"],
+                expression=expression.pattern,
+                engine=expression_engine(expression),
+            )
+            for index, text in enumerate(texts):
+                start = perf_counter()
+                expression.search(text)
+                elapsed = perf_counter() - start
+                profile.total_time += elapsed
+                profile.max_time = max(profile.max_time, elapsed)
+                if elapsed > time_budget:
+                    profile.over_budget.append(index)
+            profiles.append(profile)
+    profiles.sort(key=lambda p: p.max_time, reverse=True)
+    return profiles
+
+
+class _ReloadableLoader(ABC):
+    """
+    Reloads a loader's file when it changes. The new content is parsed and compiled
+    by the caller of reload (or the watcher thread) and then swapped in with a single
+    reference assignment, so readers never block and always see a complete set.
+    """
+
+    def _init_reload_state(self):
+        # called with newly loaded content on the reloading thread before it is swapped in,
+        # to build what depends on it off the hot path; if it raises, the content is kept
+        self.prepare: Optional[Callable[[Any], None]] = None
+        self._reload_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._mtime = self._file_mtime()
+
+    @abstractmethod
+    def _file_path(self) -> str:
+        """The path of the watched file."""
+
+    @abstractmethod
+    def _load(self) -> Any:
+        """Parses the file, returning None if it can't be loaded."""
+
+    @abstractmethod
+    def _swap(self, loaded: Any) -> None:
+        """Makes the content returned by _load current."""
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._file_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reloads the file if it changed since the last load, or unconditionally if force is set.
+        If the new file cannot be loaded the current content is kept. Returns True if new content
+        was swapped in.
+        """
+        with self._reload_lock:
+            mtime = self._file_mtime()
+            if not force and mtime == self._mtime:
+                return False
+            try:
+                loaded = self._load()
+            except (re.error, KeyError, TypeError, ValueError) as load_error:
+                # a malformed file: an invalid expression or missing/mistyped entries
+                diagnostic_logger.warning(
+                    f"Could not load {self._file_path()}: {load_error!r}"
+                )
+                loaded = None
+            if loaded is None:
+                diagnostic_logger.warning(
+                    f"Keeping previously loaded content, could not reload {self._file_path()}"
+                )
+                return False
+            if self.prepare is not None:
+                try:
+                    self.prepare(loaded)
+                except Exception as prepare_error:  # noqa
+                    diagnostic_logger.warning(
+                        f"Keeping previously loaded content, could not prepare {self._file_path()}: {prepare_error!r}"
+                    )
+                    return False
+            self._swap(loaded)
+            self._mtime = mtime
+            result_cache.invalidate()
+            diagnostic_logger.info(f"Reloaded {self._file_path()}")
+            return True
+
+    def watch(self, interval: float = 1.0) -> None:
+        """Starts a daemon thread that checks the file every interval seconds and reloads it on change."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+
+        def poll():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload()
+                except Exception as reload_error:
+                    diagnostic_logger.warning(
+                        f"Failed to reload {self._file_path()}: {reload_error}"
+                    )
+
+        self._watcher = threading.Thread(
+            target=poll, name=f"langkit-watch-{type(self).__name__}", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+class PatternLoader(_ReloadableLoader):
+    def __init__(self, config: Optional[LangKitConfig] = None, flags: int = 0):
         self.config: LangKitConfig = config or deepcopy(lang_config)
+        self.flags = flags
+        self._init_reload_state()
+        self._kind_cache: Optional[Tuple[List[Dict[str, Any]], str]] = None
         self.regex_groups = self.load_patterns()
 
+    def _file_path(self) -> str:
+        return self.config.pattern_file_path
+
+    def _load(self):
+        return self.load_patterns()
+
+    def _swap(self, loaded) -> None:
+        self.regex_groups = loaded
+
     def load_patterns(self):
         json_path = self.config.pattern_file_path
         try:
@@ -25,7 +307,11 @@ class PatternLoader:
             for group in _REGEX_GROUPS:
                 compiled_expressions = []
                 for expression in group["expressions"]:
-                    compiled_expressions.append(re.compile(expression))
+                    compiled_expressions.append(
+                        compile_expression(
+                            expression, self.config.regex_engine, self.flags
+                        )
+                    )
 
                 regex_groups.append(
                     {"name": group["name"], "expressions": compiled_expressions}
@@ -45,17 +331,87 @@ class PatternLoader:
         self.config = config
 
     def update_patterns(self):
+        self._mtime = self._file_mtime()
         self.regex_groups = self.load_patterns()
 
     def get_regex_groups(self):
         return self.regex_groups
 
+    def spans_kind(self) -> str:
+        """
+        The intermediates kind of find_spans with the current groups. It only depends on the
+        expressions, so loaders of the same patterns share their spans within a batch scope.
+        """
+        return self._spans_kind(self.regex_groups or [])
+
+    def _spans_kind(self, groups: List[Dict[str, Any]]) -> str:
+        cached = self._kind_cache
+        if cached is not None and cached[0] is groups:
+            return cached[1]
+        description = repr(
+            (
+                [
+                    (
+                        g["name"],
+                        [(expression_engine(e), e.pattern) for e in g["expressions"]],
+                    )
+                    for g in groups
+                ],
+                self.flags,
+                self.config.regex_time_budget,
+            )
+        )
+        kind = (
+            "pattern_spans:"
+            + hashlib.blake2b(
+                description.encode("utf-8", "surrogatepass"), digest_size=8
+            ).hexdigest()
+        )
+        self._kind_cache = (groups, kind)
+        return kind
+
+    def spans(self, texts: List[str]) -> List[List[Tuple[int, int, str]]]:
+        """find_spans for every text, computed once per text within a batch scope."""
+        from langkit import intermediates
+
+        groups = self.regex_groups or []
+        budget = self.config.regex_time_budget
+        return intermediates.get_many(
+            self._spans_kind(groups),
+            list(texts),
+            lambda missing: [find_spans(groups, text, budget) for text in missing],
+        )
 
-class PresidioEntityLoader:
+    def search(
+        self, text: str, regex_groups: Optional[List[Dict[str, Any]]] = None
+    ) -> Iterator[Tuple[str, bool]]:
+        """search_groups over regex_groups, the current groups by default, within the
+        configured regex_time_budget."""
+        if regex_groups is None:
+            regex_groups = self.regex_groups or []
+        return search_groups(regex_groups, text, self.config.regex_time_budget)
+
+    def profile(
+        self, texts: List[str], time_budget: float = 0.01
+    ) -> List[ExpressionProfile]:
+        return profile_regex_groups(self.regex_groups or [], texts, time_budget)
+
+
+class PresidioEntityLoader(_ReloadableLoader):
     def __init__(self, config: Optional[LangKitConfig] = None):
         self.config: LangKitConfig = config or deepcopy(lang_config)
+        self._init_reload_state()
         self.entities = self.load_entities()
 
+    def _file_path(self) -> str:
+        return self.config.pii_entities_file_path
+
+    def _load(self):
+        return self.load_entities()
+
+    def _swap(self, loaded) -> None:
+        self.entities = loaded
+
     def load_entities(self):
         json_path = self.config.pii_entities_file_path
         try:
@@ -80,6 +436,7 @@ class PresidioEntityLoader:
         self.config = config
 
     def update_entities(self):
+        self._mtime = self._file_mtime()
         self.entities = self.load_entities()
 
     def get_entities(self):
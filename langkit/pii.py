@@ -1,22 +1,159 @@
 from copy import deepcopy
-from presidio_analyzer import AnalyzerEngine, RecognizerResult
-from whylogs.experimental.core.udf_schema import (
-    register_multioutput_udf,
+from dataclasses import replace
+from logging import getLogger
+from threading import Lock
+from presidio_analyzer import (
+    AnalyzerEngine,
+    BatchAnalyzerEngine,
+    RecognizerRegistry,
+    RecognizerResult,
 )
+from presidio_analyzer.nlp_engine import SpacyNlpEngine
+from presidio_analyzer.predefined_recognizers import SpacyRecognizer
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from langkit import intermediates
+from langkit.instrumentation import register_multioutput_udf, timed_init
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
-from langkit.pattern_loader import PresidioEntityLoader
+from langkit.pattern_loader import PatternLoader, PresidioEntityLoader
 from langkit.utils import _unregister_metric_udf
 import json
 
+diagnostic_logger = getLogger(__name__)
+
 _registered: List[str] = []
 
 entity_loader = PresidioEntityLoader()
 
 
 # entities = ["PHONE_NUMBER", "US_PASSPORT"]
-analyzer = AnalyzerEngine()
+# The analyzers are built on first use by _get_analyzer, for the configured entities only,
+# or by entity_loader.reload before new entities are swapped in
+analyzer: Optional[AnalyzerEngine] = None
+batch_analyzer: Optional[BatchAnalyzerEngine] = None
+_AnalyzerKey = Tuple[str, Optional[FrozenSet[str]]]
+# the analyzers of the current entities and of the ones they replaced, which extractions
+# that started before a reload still use; replaced as a whole, so readers don't lock
+_analyzers: Dict[_AnalyzerKey, Tuple[AnalyzerEngine, BatchAnalyzerEngine]] = {}
+# loaded spaCy pipelines by (model, excluded pipes), shared by the analyzers
+_nlp_engines: Dict[Tuple[str, Tuple[str, ...]], SpacyNlpEngine] = {}
+_analyzer_lock = Lock()
+_spacy_model: str = lang_config.pii_spacy_model
+_batch_size: int = lang_config.pii_batch_size
+_n_process: int = lang_config.pii_n_process
+prefilter_loader: Optional[PatternLoader] = None
+_output: str = lang_config.pii_output
+_output_spans: bool = lang_config.pii_output_spans
+_SUPPORTED_OUTPUTS = ["json", "counts"]
+
+# entities produced by spaCy's NER pipe rather than by pattern recognizers
+_NER_ENTITIES = {"PERSON", "LOCATION", "NRP", "DATE_TIME", "ORGANIZATION"}
+# spaCy pipes Presidio never reads; tokens, lemmas and entities are all it uses
+_UNUSED_PIPES = ["parser", "senter"]
+
+
+class _PrunedSpacyNlpEngine(SpacyNlpEngine):
+    """SpacyNlpEngine that loads its models without the excluded pipes."""
+
+    def __init__(self, models: List[Dict[str, str]], exclude: List[str]):
+        super().__init__(models=models)
+        self.exclude = exclude
+
+    def load(self) -> None:
+        import spacy
+
+        self.nlp = {
+            model["lang_code"]: spacy.load(model["model_name"], exclude=self.exclude)
+            for model in self.models
+        }
+
+
+def _excluded_pipes(entities: Optional[List[str]]) -> List[str]:
+    if entities is not None and not _NER_ENTITIES.intersection(entities):
+        return _UNUSED_PIPES + ["ner"]
+    return list(_UNUSED_PIPES)
+
+
+def _nlp_engine(excluded_pipes: List[str]) -> SpacyNlpEngine:
+    global _nlp_engines
+    key = (_spacy_model, tuple(excluded_pipes))
+    nlp_engine = _nlp_engines.get(key)
+    if nlp_engine is None:
+        nlp_engine = _PrunedSpacyNlpEngine(
+            models=[{"lang_code": "en", "model_name": _spacy_model}],
+            exclude=excluded_pipes,
+        )
+        nlp_engine.load()
+        # pipelines of a model no longer configured are dropped
+        _nlp_engines = {
+            k: engine for k, engine in _nlp_engines.items() if k[0] == _spacy_model
+        }
+        _nlp_engines[key] = nlp_engine
+    return nlp_engine
+
+
+def _build_analyzer(entities: Optional[List[str]]) -> AnalyzerEngine:
+    excluded_pipes = _excluded_pipes(entities)
+    nlp_engine = _nlp_engine(excluded_pipes)
+    registry = RecognizerRegistry()
+    registry.load_predefined_recognizers(languages=["en"], nlp_engine=nlp_engine)
+    if entities is not None:
+        registry.recognizers = [
+            recognizer
+            for recognizer in registry.recognizers
+            if set(recognizer.supported_entities).intersection(entities)
+            and not (
+                isinstance(recognizer, SpacyRecognizer) and "ner" in excluded_pipes
+            )
+        ]
+    diagnostic_logger.info(
+        f"Loaded Presidio analyzer with spaCy model {_spacy_model} and recognizers "
+        f"{[type(recognizer).__name__ for recognizer in registry.recognizers]}"
+    )
+    return AnalyzerEngine(
+        registry=registry, nlp_engine=nlp_engine, supported_languages=["en"]
+    )
+
+
+def _analyzer_key(entities: Optional[List[str]]) -> _AnalyzerKey:
+    return (_spacy_model, frozenset(entities) if entities is not None else None)
+
+
+def _prepare(
+    entities: Optional[List[str]],
+) -> Tuple[AnalyzerEngine, BatchAnalyzerEngine]:
+    """
+    Builds the analyzers for entities unless they exist. Only the recognizer registry is
+    rebuilt when the entities change, the spaCy pipeline is reused unless the entities need
+    other pipes. entity_loader calls this on reload, before the new entities are swapped in.
+    """
+    global analyzer, batch_analyzer, _analyzers
+    key = _analyzer_key(entities)
+    with _analyzer_lock:
+        built = _analyzers.get(key)
+        if built is None:
+            engine = _build_analyzer(entities)
+            built = (engine, BatchAnalyzerEngine(analyzer_engine=engine))
+            previous = list(_analyzers.items())[-1:]
+            _analyzers = dict(previous + [(key, built)])
+        analyzer, batch_analyzer = built
+        return built
+
+
+def _analyzers_for(
+    entities: Optional[List[str]],
+) -> Tuple[AnalyzerEngine, BatchAnalyzerEngine]:
+    built = _analyzers.get(_analyzer_key(entities))
+    return built if built is not None else _prepare(entities)
+
+
+def _get_analyzer() -> AnalyzerEngine:
+    """Returns the analyzer for the currently configured entities, building it on first use."""
+    return _analyzers_for(entity_loader.get_entities())[0]
+
+
+def _get_batch_analyzer() -> BatchAnalyzerEngine:
+    return _analyzers_for(entity_loader.get_entities())[1]
 
 
 def format_presidio_result(result: RecognizerResult) -> dict:
@@ -28,37 +165,195 @@ def format_presidio_result(result: RecognizerResult) -> dict:
     }
 
 
+def _format_results(results: List[RecognizerResult]) -> Tuple[str, int]:
+    dict_results = [format_presidio_result(entity) for entity in results]
+    return (json.dumps(dict_results), len(dict_results))
+
+
+def needs_analysis(text: str, entities: Optional[List[str]]) -> bool:
+    """
+    Cheap check run before Presidio. Returns False only if none of the entities has a candidate
+    in text according to the prefilter expressions. Entities without prefilter expressions, such
+    as PERSON or LOCATION which need NER, always require analysis.
+    """
+    prefilter_groups = prefilter_loader.get_regex_groups() if prefilter_loader else None
+    if not prefilter_groups or entities is None:
+        return True
+    expressions_by_entity = {
+        group["name"]: group["expressions"] for group in prefilter_groups
+    }
+    for entity in entities:
+        expressions = expressions_by_entity.get(entity)
+        if expressions is None:
+            return True
+        for expression in expressions:
+            if expression.search(text):
+                return True
+    return False
+
+
 def analyze_pii(text: str) -> Tuple[str, int]:
-    global analyzer
     global entity_loader
 
     entities = entity_loader.get_entities()
-    results = analyzer.analyze(
+    if not needs_analysis(text, entities):
+        return _format_results([])
+    results = _analyzers_for(entities)[0].analyze(
         text=text,
         entities=entities,
         language="en",
     )
-    dict_results = [format_presidio_result(entity) for entity in results]
-    return (json.dumps(dict_results), len(dict_results))
+    return _format_results(results)
+
+
+def _analyze_batch(
+    texts: List[str], entities: Optional[List[str]]
+) -> List[List[RecognizerResult]]:
+    texts = list(texts)
+    candidates = [i for i, text in enumerate(texts) if needs_analysis(text, entities)]
+    analyzed: List[List[RecognizerResult]] = [[] for _ in texts]
+    if candidates:
+        batch_results = _analyzers_for(entities)[1].analyze_iterator(
+            texts=[texts[i] for i in candidates],
+            language="en",
+            batch_size=_batch_size,
+            n_process=_n_process,
+            entities=entities,
+        )
+        for i, results in zip(candidates, batch_results):
+            analyzed[i] = results
+    return analyzed
+
+
+def _artifact(entities: Optional[List[str]]) -> str:
+    return (
+        f"presidio:{_spacy_model}:{sorted(entities) if entities is not None else None}"
+    )
+
+
+def _analyze_shared(
+    texts: List[str], entities: Optional[List[str]]
+) -> List[List[RecognizerResult]]:
+    """_analyze_batch, analyzing each text once within an intermediates batch scope."""
+    return intermediates.get_many(
+        _artifact(entities),
+        list(texts),
+        lambda missing: _analyze_batch(missing, entities),
+    )
+
+
+def analyze_pii_batch(texts: List[str]) -> List[Tuple[str, int]]:
+    """
+    Analyzes texts with spaCy's nlp.pipe batching through Presidio's BatchAnalyzerEngine.
+    Results are returned in the same order as texts.
+    """
+    global entity_loader
+
+    entities = entity_loader.get_entities()
+    return [_format_results(results) for results in _analyze_batch(texts, entities)]
+
+
+def _spans_array(analyzed: List[List[RecognizerResult]]):
+    import pyarrow as pa
+
+    span_type = pa.list_(
+        pa.struct(
+            [
+                ("type", pa.string()),
+                ("start", pa.int32()),
+                ("end", pa.int32()),
+                ("score", pa.float32()),
+            ]
+        )
+    )
+    return pa.array(
+        [
+            [
+                {
+                    "type": result.entity_type,
+                    "start": result.start,
+                    "end": result.end,
+                    "score": result.score,
+                }
+                for result in results
+            ]
+            for results in analyzed
+        ],
+        type=span_type,
+    )
+
+
+def _entity_types(entities: Optional[List[str]]) -> List[str]:
+    """The entity types with a count column: the configured ones, or all the analyzer finds."""
+    if entities is not None:
+        return list(entities)
+    return sorted(_get_analyzer().get_supported_entities(language="en"))
+
+
+def _compact_columns(
+    analyzed: List[List[RecognizerResult]],
+    entities: Optional[List[str]],
+    as_pandas: bool,
+) -> Dict:
+    """
+    Per-entity-type integer counts instead of one json string per row, plus an optional
+    Arrow list<struct> column with the spans. The count columns are the same for every
+    batch, whatever entities it contains.
+    """
+    counts: Dict[str, List[int]] = {
+        f"{entity_type}_count": [0] * len(analyzed)
+        for entity_type in _entity_types(entities)
+    }
+    for i, results in enumerate(analyzed):
+        for result in results:
+            column = counts.get(f"{result.entity_type}_count")
+            if column is not None:
+                column[i] += 1
+    to_return: Dict = {"entities_count": [len(results) for results in analyzed]}
+    to_return.update(counts)
+    if _output_spans:
+        spans = _spans_array(analyzed)
+        # pandas < 2 has no arrow-backed arrays, the spans are then lists of dicts
+        arrow_array = getattr(pd.arrays, "ArrowExtensionArray", None)
+        to_return["spans"] = (
+            pd.Series(arrow_array(spans))
+            if as_pandas and arrow_array is not None
+            else spans.to_pylist()
+        )
+    return to_return
 
 
 def _wrapper(column):
     def wrappee(text):
-        analyzer_results: List[tuple] = []
-        for input in text[column]:
-            analyzer_results.append(analyze_pii(input))
-        to_return = {
-            "result": [x[0] for x in analyzer_results],
-            "entities_count": [x[1] for x in analyzer_results],
-        }
+        entities = entity_loader.get_entities()
+        analyzed = _analyze_shared(text[column], entities)
+        if _output == "counts":
+            to_return = _compact_columns(
+                analyzed, entities, isinstance(text, pd.DataFrame)
+            )
+        else:
+            analyzer_results = [_format_results(results) for results in analyzed]
+            to_return = {
+                "result": [x[0] for x in analyzer_results],
+                "entities_count": [x[1] for x in analyzer_results],
+            }
         if isinstance(text, pd.DataFrame):
             return pd.DataFrame(to_return)
         else:
             return to_return
 
+    wrappee.outputs = _outputs  # type: ignore
     return wrappee
 
 
+def _outputs() -> List[str]:
+    """The result keys of the UDFs with the current output settings and entities."""
+    if _output != "counts":
+        return ["result", "entities_count"]
+    counts = [f"{t}_count" for t in _entity_types(entity_loader.get_entities())]
+    return ["entities_count"] + counts + (["spans"] if _output_spans else [])
+
+
 def _register_udfs(config: Optional[LangKitConfig] = None):
     from whylogs.experimental.core.udf_schema import _resolver_specs
 
@@ -89,23 +384,65 @@ def _register_udfs(config: Optional[LangKitConfig] = None):
             udf_name = f"{column}.{entity_metric_name}"
             register_multioutput_udf(
                 [column],
+                udf_name=udf_name,
                 prefix=udf_name,
             )(_wrapper(column))
+            intermediates.declare(udf_name, _artifact(entity_loader.get_entities()))
             _registered.append(udf_name)
 
 
+@timed_init
 def init(
-    entities_file_path: Optional[str] = None, config: Optional[LangKitConfig] = None
+    entities_file_path: Optional[str] = None,
+    config: Optional[LangKitConfig] = None,
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
 ):
+    """
+    The Presidio analyzer, and the spaCy model set by config.pii_spacy_model, are loaded
+    on first use rather than here.
+
+    Args:
+        entities_file_path: json file with the list of entities to search for.
+        batch_size: number of texts sent through the spaCy pipeline at once.
+        n_process: number of processes spaCy uses to analyze a batch. Values above 1
+            pay a process startup cost per batch and are meant for large offline jobs.
+    """
     config = deepcopy(config or lang_config)
     if entities_file_path:
         config.pii_entities_file_path = entities_file_path
 
-    global entity_loader
+    global entity_loader, prefilter_loader, _spacy_model, _batch_size, _n_process
+    global _output, _output_spans
+    if config.pii_output not in _SUPPORTED_OUTPUTS:
+        raise ValueError(
+            f"Unknown pii_output {config.pii_output}, supported outputs are {_SUPPORTED_OUTPUTS}"
+        )
+    _output = config.pii_output
+    _output_spans = config.pii_output_spans
+    _spacy_model = config.pii_spacy_model
+    _batch_size = batch_size or config.pii_batch_size
+    _n_process = n_process or config.pii_n_process
+    # compiled with the flags Presidio compiles its recognizers with, so the prefilter never
+    # rules out a text the recognizers would match
+    prefilter_loader = (
+        PatternLoader(
+            replace(config, pattern_file_path=config.pii_prefilter_file_path),
+            flags=int(RecognizerRegistry().global_regex_flags),
+        )
+        if config.pii_prefilter
+        else None
+    )
     entity_loader = PresidioEntityLoader(config)
     entity_loader.update_entities()
+    entity_loader.prepare = _prepare
 
     _register_udfs(config)
 
 
+def warmup() -> None:
+    """Builds the Presidio analyzer and loads its spaCy model now rather than on the first row."""
+    _get_analyzer()
+
+
 init()
@@ -1,4 +1,4 @@
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 from langkit import prompt_column
 from langkit.openai.openai import LLMInvocationParams, Conversation, ChatLog
 from dataclasses import dataclass
@@ -96,6 +96,7 @@ def _register_proactive_injection():
                 _registered.add(udf_name)
 
 
+@timed_init
 def init(llm: LLMInvocationParams):
     global proactive_detector
     if os.getenv("OPENAI_API_KEY") is None:
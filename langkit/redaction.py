@@ -0,0 +1,168 @@
+from copy import deepcopy
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from whylogs.core.stubs import pd
+
+from langkit.instrumentation import timed_init
+from langkit import LangKitConfig, lang_config, prompt_column, response_column
+from langkit.pattern_loader import PatternLoader
+
+# (start, end, entity type or pattern group name)
+Span = Tuple[int, int, str]
+
+_pattern_loader: Optional[PatternLoader] = None
+_use_presidio: bool = True
+_replacement: str = "<{type}>"
+
+
+@timed_init
+def init(
+    use_presidio: bool = True,
+    replacement: str = "<{type}>",
+    config: Optional[LangKitConfig] = None,
+):
+    """
+    Args:
+        use_presidio: also redact the entities found by the pii module. If False, only the
+            pattern groups are used and Presidio is never loaded.
+        replacement: format string for the redacted text, {type} is replaced by the
+            entity type or pattern group name.
+    """
+    config = deepcopy(config or lang_config)
+    global _pattern_loader, _use_presidio, _replacement
+    _pattern_loader = PatternLoader(config)
+    _use_presidio = use_presidio
+    _replacement = replacement
+
+
+def merge_spans(spans: List[Span]) -> List[Span]:
+    """
+    Sorts the spans by start and merges overlapping ones in a single sweep, so merging takes
+    O(n log n) for n spans. A merged span keeps the type of the span that starts first (the
+    longest one on ties).
+    """
+    merged: List[Span] = []
+    for start, end, entity_type in sorted(spans, key=lambda s: (s[0], -s[1])):
+        if merged and start < merged[-1][1]:
+            last_start, last_end, last_type = merged[-1]
+            merged[-1] = (last_start, max(last_end, end), last_type)
+        else:
+            merged.append((start, end, entity_type))
+    return merged
+
+
+def _pattern_spans(texts: List[str]) -> List[List[Span]]:
+    assert _pattern_loader is not None
+    return [
+        [(start, end, name) for start, end, name in spans if end > start]
+        for spans in _pattern_loader.spans(texts)
+    ]
+
+
+def _presidio_spans(texts: List[str]) -> List[List[Span]]:
+    from langkit import pii
+
+    analyzed = pii._analyze_shared(texts, pii.entity_loader.get_entities())
+    return [
+        [(result.start, result.end, result.entity_type) for result in results]
+        for results in analyzed
+    ]
+
+
+def find_spans(texts: List[str]) -> List[List[Span]]:
+    """
+    Finds the spans to redact in every text and returns them merged and sorted. The matches
+    of the pattern groups and the Presidio results are the ones the has_patterns and pii
+    metrics compute, so within an intermediates batch scope around both, the texts are only
+    analyzed once.
+    """
+    texts = list(texts)
+    presidio = _presidio_spans(texts) if _use_presidio else [[] for _ in texts]
+    return [
+        merge_spans(patterns + spans)
+        for patterns, spans in zip(_pattern_spans(texts), presidio)
+    ]
+
+
+def redact_text(text: str, spans: List[Span]) -> str:
+    """Replaces the merged, sorted spans in text."""
+    pieces = []
+    position = 0
+    for start, end, entity_type in spans:
+        pieces.append(text[position:start])
+        pieces.append(_replacement.format(type=entity_type))
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def _redact_column(texts: List[str]) -> Tuple[List[str], List[List[Dict[str, Any]]]]:
+    texts = ["" if text is None else str(text) for text in texts]
+    all_spans = find_spans(texts)
+    redacted = [redact_text(text, spans) for text, spans in zip(texts, all_spans)]
+    span_dicts = [
+        [{"type": t, "start": start, "end": end} for start, end, t in spans]
+        for spans in all_spans
+    ]
+    return redacted, span_dicts
+
+
+def redact(
+    data: Union[pd.DataFrame, Dict[str, Any]],
+    columns: Optional[List[str]] = None,
+) -> Union[pd.DataFrame, Dict[str, Any]]:
+    """
+    Returns a copy of data with a <column>.redacted column holding the redacted text and a
+    <column>.redacted_spans column with the replaced spans, for each of columns
+    (prompt and response by default) present in data.
+    """
+    columns = columns or [prompt_column, response_column]
+    if isinstance(data, pd.DataFrame):
+        result = data.copy()
+        for column in columns:
+            if column in data.columns:
+                redacted, spans = _redact_column(data[column].to_list())
+                result[f"{column}.redacted"] = redacted
+                result[f"{column}.redacted_spans"] = spans
+        return result
+    elif isinstance(data, dict):
+        return next(redact_stream([data], columns=columns))
+    raise ValueError(
+        f"Redact: data of type {type(data)} is invalid: supported input types are pandas dataframe or dictionary"
+    )
+
+
+def redact_stream(
+    rows: Iterable[Dict[str, Any]],
+    columns: Optional[List[str]] = None,
+    batch_size: int = 32,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Redacts an iterable of rows lazily. Rows are analyzed in batches of batch_size so Presidio
+    can batch its NLP pipeline, and are yielded one at a time in input order.
+    """
+    columns = columns or [prompt_column, response_column]
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        results = [dict(row) for row in batch]
+        for column in columns:
+            present = [i for i, row in enumerate(batch) if column in row]
+            if not present:
+                continue
+            redacted, spans = _redact_column([batch[i][column] for i in present])
+            for i, text, row_spans in zip(present, redacted, spans):
+                results[i][f"{column}.redacted"] = text
+                results[i][f"{column}.redacted_spans"] = row_spans
+        return results
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+
+init()
@@ -1,8 +1,9 @@
 from copy import deepcopy
 from logging import getLogger
 
+from langkit import intermediates
 from langkit.pattern_loader import PatternLoader
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
 from whylogs.core.metrics.metrics import FrequentItemsMetric
 from whylogs.core.resolvers import MetricSpec
@@ -17,21 +18,23 @@ pattern_loader = PatternLoader()
 def has_patterns(text):
     regex_groups = pattern_loader.get_regex_groups()
     if regex_groups:
-        matched = None
-        for group in regex_groups:
-            for expression in group["expressions"]:
-                if expression.search(text):
-                    matched = matched or group["name"]
-                    break
-            if matched is not None:
-                break
+        for name, matched in pattern_loader.search(text, regex_groups):
+            if matched:
+                return name
+        return None
 
-        return matched
+
+def _first_group(spans):
+    # spans are in group order, so the first one belongs to the first group that matched
+    return spans[0][2] if spans else None
 
 
 def _wrapper(column):
     def wrappee(text):
-        return [has_patterns(input) for input in text[column]]
+        if not pattern_loader.get_regex_groups():
+            return [None] * len(text[column])
+        # the spans are shared with redaction within a batch scope
+        return [_first_group(spans) for spans in pattern_loader.spans(text[column])]
 
     return wrappee
 
@@ -72,9 +75,11 @@ def _register_udfs(config: Optional[LangKitConfig] = None):
                 udf_name=udf_name,
                 metrics=[MetricSpec(FrequentItemsMetric)],
             )(_wrapper(column))
+            intermediates.declare(udf_name, pattern_loader.spans_kind())
             _registered.append(udf_name)
 
 
+@timed_init
 def init(
     pattern_file_path: Optional[str] = None, config: Optional[LangKitConfig] = None
 ):
@@ -1,12 +1,11 @@
 from dataclasses import dataclass
 from logging import getLogger
 from typing import List, Optional
-from whylogs.experimental.core.udf_schema import register_dataset_udf
-from langkit import lang_config, prompt_column, response_column
-from nltk.tokenize import sent_tokenize
+from langkit.instrumentation import register_dataset_udf, timed_init
+from langkit import intermediates, lang_config, prompt_column, response_column
 from langkit.openai.openai import LLMInvocationParams, Conversation, ChatLog
 from langkit.transformer import Encoder
-from sentence_transformers import util
+from langkit.utils import _offline
 
 _prompt = prompt_column
 _response = response_column
@@ -115,6 +114,9 @@ class ConsistencyChecker:
     def sentence_semantic_score(
         self, response_sentence, samples_list, embeddings_encoder
     ):
+        from nltk.tokenize import sent_tokenize
+        from sentence_transformers import util
+
         sample_similarities = []
         for sample in samples_list:
             sample_sentences = sent_tokenize(sample)
@@ -138,7 +140,7 @@ class ConsistencyChecker:
         The semantic score is calculated per sentence and then averaged.
 
         """
-        response_sentences = sent_tokenize(response)
+        response_sentences = intermediates.get("sentences", response)
         samples_list = [sample.response for sample in additional_samples]
         response_similarities = [
             self.sentence_semantic_score(
@@ -158,7 +160,7 @@ class ConsistencyChecker:
 
         """
         llm_scores = []
-        response_sentences = sent_tokenize(response)
+        response_sentences = intermediates.get("sentences", response)
         response_halves = [
             "".join(response_sentences[:2]),
             "".join(response_sentences[2:]),
@@ -248,15 +250,18 @@ class ConsistencyChecker:
 checker: Optional[ConsistencyChecker] = None
 
 
+@timed_init
 def init(llm: LLMInvocationParams, num_samples=1):
     global checker
     import nltk
 
-    nltk.download("punkt")
+    if not _offline():
+        nltk.download("punkt")
     diagnostic_logger.info(
         "Info: the response_hallucination metric module performs additionall LLM calls to check the consistency of the response."
     )
     checker = ConsistencyChecker(llm, num_samples, embeddings_encoder)
+    intermediates.declare(f"{_response}.hallucination", "sentences")
 
 
 @register_dataset_udf([_prompt, _response], f"{_response}.hallucination")
@@ -0,0 +1,254 @@
+"""
+Opt-in cache of metric results across extract calls.
+
+Templated prompts and canned responses repeat many times a day; with the cache enabled,
+every langkit UDF looks up each row's result by (UDF name, fingerprint of its module's init
+arguments, hash of the row's input texts) and only computes the rows it hasn't seen. A
+module's fingerprint changes whenever its init is called with different arguments or a
+different lang_config, and every fingerprint changes when a pattern or entities file is
+reloaded or a model is overridden, so results computed with an older model, config or
+pattern set are never served. Reloads only invalidate the results of the process they happen
+in: processes sharing the disk tier should reload together, or call clear(disk=True).
+
+    from langkit import result_cache
+    result_cache.enable(max_entries=100_000, ttl_seconds=3600)
+
+Entries live in an in-process LRU bounded by max_entries and, when disk_path is given, in a
+SQLite file that processes on the same host share. Rows with non-string inputs are always
+computed. Hit rates are reported by langkit.stats() under caches["results"].
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict
+from functools import wraps
+from logging import getLogger
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+diagnostic_logger = getLogger(__name__)
+
+_fingerprints: Dict[str, str] = {}
+# bumped when something the modules compute with changes outside init
+_generation = 0
+_MISSING = object()
+
+
+def fingerprint(module: str, args: Tuple, kwargs: Dict[str, Any]) -> None:
+    """Records the init arguments of module; called by instrumentation.timed_init."""
+    from langkit import lang_config
+
+    _fingerprints[module] = hashlib.blake2b(
+        repr((args, sorted(kwargs.items()), lang_config)).encode(), digest_size=8
+    ).hexdigest()
+
+
+def invalidate() -> None:
+    """
+    Stops serving the results computed so far, without discarding them. Called when a
+    pattern or entities file is reloaded and when a model is overridden, since neither
+    goes through init.
+    """
+    global _generation
+    _generation += 1
+
+
+class _DiskTier:
+    def __init__(self, path: str):
+        self.path = path
+        self._pid: Optional[int] = None
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections don't survive a fork, so each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+            )
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, key: str, now: float) -> Any:
+        row = (
+            self._connect()
+            .execute("SELECT value, expires FROM results WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None or (row[1] is not None and row[1] < now):
+            return _MISSING
+        return pickle.loads(row[0])
+
+    def set_many(self, items: List[Tuple[str, Any, Optional[float]]]) -> None:
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                [(key, pickle.dumps(value), expires) for key, value, expires in items],
+            )
+
+    def clear(self) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM results")
+
+
+class _ResultCache:
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float],
+        disk_path: Optional[str],
+        exclude: Iterable[str],
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = _DiskTier(disk_path) if disk_path else None
+        self.exclude = set(exclude)
+        self.lock = Lock()
+        self.memory: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str, now: float) -> Any:
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires >= now:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.memory[key]
+            if self.disk is not None:
+                value = self.disk.get(key, now)
+                if value is not _MISSING:
+                    self.disk_hits += 1
+                    self._remember(key, value, now)
+                    return value
+            self.misses += 1
+            return _MISSING
+
+    def _remember(self, key: str, value: Any, now: float) -> Optional[float]:
+        expires = now + self.ttl_seconds if self.ttl_seconds is not None else None
+        self.memory[key] = (value, expires)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+        return expires
+
+    def set_many(self, items: List[Tuple[str, Any]], now: float) -> None:
+        with self.lock:
+            stored = [
+                (key, value, self._remember(key, value, now)) for key, value in items
+            ]
+            if self.disk is not None:
+                self.disk.set_many(stored)
+
+
+_cache: Optional[_ResultCache] = None
+
+
+def enable(
+    max_entries: int = 100_000,
+    ttl_seconds: Optional[float] = None,
+    disk_path: Optional[str] = None,
+    exclude: Iterable[str] = (),
+) -> None:
+    """
+    Turns the cache on, replacing the current one. exclude lists UDF names that are
+    always computed, e.g. metrics that call an LLM and are expected to vary.
+    """
+    global _cache
+    _cache = _ResultCache(max_entries, ttl_seconds, disk_path, exclude)
+
+
+def disable() -> None:
+    global _cache
+    _cache = None
+
+
+def clear(disk: bool = False) -> None:
+    """Empties the in-process cache, and the disk tier too if disk is set."""
+    if _cache is None:
+        return
+    with _cache.lock:
+        _cache.memory.clear()
+        if disk and _cache.disk is not None:
+            _cache.disk.clear()
+
+
+def cache_info() -> Tuple[int, int, int]:
+    """Rows served from the cache (memory or disk), rows computed, and entries in memory."""
+    if _cache is None:
+        return 0, 0, 0
+    return _cache.hits + _cache.disk_hits, _cache.misses, len(_cache.memory)
+
+
+def _key(udf_id: str, module_fingerprint: str, values: Sequence[str]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        encoded = value.encode("utf-8", "surrogatepass")
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return f"{udf_id}:{module_fingerprint}:{digest.hexdigest()}"
+
+
+def _subset(data: Any, positions: List[int]) -> Any:
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[positions].reset_index(drop=True)
+    return {column: [values[i] for i in positions] for column, values in data.items()}
+
+
+def _rows(output: Any, count: int) -> List[Dict[str, Any]]:
+    columns = {column: list(values) for column, values in output.items()}
+    return [
+        {column: values[i] for column, values in columns.items()} for i in range(count)
+    ]
+
+
+def cached_udf(
+    name: str, columns: Sequence[str], func: Callable, multioutput: bool = False
+) -> Callable:
+    """Wraps a langkit UDF so that, while the cache is enabled, each row is computed once."""
+    module = func.__module__
+    # UDFs registered in different schemas can share an output name
+    udf_id = f"{name}:{module}.{func.__qualname__}"
+
+    @wraps(func)
+    def cached(data):
+        cache = _cache
+        if cache is None or name in cache.exclude:
+            return func(data)
+        inputs = [list(data[column]) for column in columns]
+        count = len(inputs[0]) if inputs else 0
+        if not count or not all(
+            isinstance(v, str) for values in inputs for v in values
+        ):
+            return func(data)
+
+        now = time.time()
+        module_fingerprint = f"{_fingerprints.get(module, '')}.{_generation}"
+        keys = [_key(udf_id, module_fingerprint, row) for row in zip(*inputs)]
+        results = [cache.get(key, now) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is _MISSING]
+        if missing:
+            computed = func(_subset(data, missing) if len(missing) < count else data)
+            values = _rows(computed, len(missing)) if multioutput else list(computed)
+            for i, value in zip(missing, values):
+                results[i] = value
+            cache.set_many([(keys[i], results[i]) for i in missing], now)
+        if not multioutput:
+            return results
+        output_columns = list(dict.fromkeys(c for row in results for c in row))
+        output = {c: [row.get(c) for row in results] for c in output_columns}
+        return pd.DataFrame(output) if isinstance(data, pd.DataFrame) else output
+
+    return cached
@@ -0,0 +1,202 @@
+"""
+Computing expensive metrics on a sample of the rows.
+
+LangKitConfig.metric_sample_rates maps metric names (e.g. "prompt.closest_topic") or langkit
+module names (e.g. "topics", "pii", "response_hallucination") to the fraction of rows they are
+computed on; metrics that aren't listed run on every row, and a metric name takes precedence
+over its module. Rows left out get None for the metric.
+
+    config = LangKitConfig(metric_sample_rates={"topics": 0.1, "pii": 0.1})
+    schema = llm_metrics.init(config=config)
+
+Sampling is deterministic: a row is in the sample when the hash of its prompt and response
+(or of whichever of the two the data has), mapped to [0, 1), is below the rate, so the same
+row is always in or always out, and rows sampled at a lower rate are also sampled at every
+higher rate. A UDF only sees the columns it reads, so extract and ParallelUdfSchema compute
+the row keys from the whole batch inside keyed(): a row's prompt metrics and response-only
+metrics, such as response.toxicity, are then in or out together at equal rates. Elsewhere,
+e.g. why.log with a plain udf_schema() or UDFs deduplicated with dedupe, each UDF hashes the
+prompt and response among the columns it reads. The metric collections record the rates in
+the schema metadata under langkit.sample_rates.
+
+Sampling is for profiling: RowScorer and Guardrail compute inside bypassed(), so a blocking
+decision never skips a metric.
+"""
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import deepcopy
+from functools import wraps
+from logging import getLogger
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import pandas as pd
+
+from langkit.result_cache import _subset
+
+if TYPE_CHECKING:
+    from langkit import LangKitConfig
+
+diagnostic_logger = getLogger(__name__)
+
+_config: Optional["LangKitConfig"] = None
+_bypass: ContextVar[bool] = ContextVar("langkit_sampling_bypass", default=False)
+# the sampling key of every row of the batch being extracted, see keyed()
+_row_keys: ContextVar[Optional[List[Any]]] = ContextVar(
+    "langkit_sampling_row_keys", default=None
+)
+# the result keys last computed by each multi-output UDF, for the ones that don't list them
+_seen_outputs: Dict[str, List[str]] = {}
+
+
+def init(config: Optional["LangKitConfig"] = None) -> None:
+    """Uses the sample rates of config, lang_config by default, from now on."""
+    from langkit import lang_config
+
+    config = deepcopy(config or lang_config)
+    for name, rate in config.metric_sample_rates.items():
+        if not 0 <= rate <= 1:
+            raise ValueError(
+                f"Sample rate of {name} must be between 0 and 1, got {rate}"
+            )
+    global _config
+    _config = config
+
+
+def sample_rates() -> Dict[str, float]:
+    """The sample rates in use, by metric or module name."""
+    from langkit import lang_config
+
+    return dict((_config or lang_config).metric_sample_rates)
+
+
+def _rate(name: str, module: str) -> Optional[float]:
+    from langkit import lang_config
+
+    rates = (_config or lang_config).metric_sample_rates
+    if not rates:
+        return None
+    rate = rates.get(name)
+    if rate is None:
+        package, _, module_name = module.rpartition(".")
+        rate = rates.get(module_name) if package == "langkit" else None
+    return rate
+
+
+@contextmanager
+def bypassed():
+    """Computes every metric on every row inside the block, whatever the sample rates."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+@contextmanager
+def keyed(data: Union[pd.DataFrame, Mapping[str, Any]]):
+    """
+    Samples the UDFs run on data inside the block by the keys of its rows, whatever
+    columns each UDF reads. data is a DataFrame or a single row.
+    """
+    keys: Optional[List[Any]] = None
+    if isinstance(data, pd.DataFrame):
+        keys = row_keys(data)
+    elif isinstance(data, Mapping):
+        keys = row_keys({column: [value] for column, value in data.items()})
+    token = _row_keys.set(keys)
+    try:
+        yield
+    finally:
+        _row_keys.reset(token)
+
+
+def row_keys(data: Union[pd.DataFrame, Mapping[str, Sequence[Any]]]) -> List[Any]:
+    """
+    The sampling key of every row of data, a DataFrame or a dict of columns: the prompt and
+    response together when both are there, else the prompt or the response.
+    """
+    from langkit import prompt_column, response_column
+
+    columns = [c for c in [prompt_column, response_column] if c in data.keys()]
+    if not columns:
+        columns = list(data.keys())[:1]
+    if not columns:
+        return []
+    if len(columns) == 1:
+        return list(data[columns[0]])
+    return list(zip(data[columns[0]], data[columns[1]]))
+
+
+def fraction(value: Any) -> float:
+    """Maps a row's key to [0, 1), the same way in every process."""
+    digest = hashlib.blake2b(
+        str(value).encode("utf-8", "surrogatepass"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little") / 2**64
+
+
+def sampled_udf(
+    name: str, columns: Sequence[str], func: Callable, multioutput: bool = False
+) -> Callable:
+    """Wraps a langkit UDF so it only computes the rows sampled at its rate."""
+    module = func.__module__
+
+    @wraps(func)
+    def sampled(data):
+        rate = _rate(name, module)
+        if rate is None or rate >= 1 or not columns or _bypass.get():
+            return _remember(func(data))
+        count = len(data[columns[0]])
+        keys = _row_keys.get()
+        if keys is None or len(keys) != count:
+            # not in keyed(), or run on the distinct values of its columns: its own columns
+            keys = row_keys({column: data[column] for column in columns})
+        positions = [i for i, key in enumerate(keys) if fraction(key) < rate]
+        if len(positions) == count:
+            return _remember(func(data))
+        if not positions:
+            if not multioutput:
+                return [None] * count
+            # no row to take the output names from: the UDF's own list, or the last result's
+            outputs = getattr(func, "outputs", None)
+            names = outputs() if outputs is not None else _seen_outputs.get(name, [])
+            output = {column: [None] * count for column in names}
+            return (
+                pd.DataFrame(output, index=range(count))
+                if isinstance(data, pd.DataFrame)
+                else output
+            )
+
+        computed = _remember(func(_subset(data, positions)))
+        if not multioutput:
+            return _spread(list(computed), positions, count)
+        output = {
+            column: _spread(list(values), positions, count)
+            for column, values in computed.items()
+        }
+        return pd.DataFrame(output) if isinstance(data, pd.DataFrame) else output
+
+    def _remember(result):
+        if multioutput:
+            _seen_outputs[name] = list(result.keys())
+        return result
+
+    return sampled
+
+
+def _spread(values: List[Any], positions: List[int], count: int) -> List[Any]:
+    spread: List[Any] = [None] * count
+    for i, value in zip(positions, values):
+        spread[i] = value
+    return spread
@@ -0,0 +1,120 @@
+"""
+Low-latency scoring of single rows.
+
+extract(row) goes through whylogs' UdfSchema.apply_udfs, which deep-copies the row, builds an
+empty DataFrame and matches every UDF spec against the row's columns on each call. RowScorer
+does that matching once per row shape (its columns and value types) and keeps the resolved
+list of UDF calls, so scoring a row only calls the metrics:
+
+    scorer = RowScorer(llm_metrics.init())
+    metrics = scorer({"prompt": prompt, "response": response})
+
+The result is the same as extract(row): the row with the metric columns added, with None for
+a metric whose UDF raised. The row is copied shallowly rather than deep-copied. Sample rates
+don't apply: every metric is computed.
+"""
+from functools import wraps
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from whylogs.experimental.core.udf_schema import UdfSchema, udf_schema
+
+from langkit import intermediates, sampling
+
+diagnostic_logger = getLogger(__name__)
+
+# (output name, input columns, udf, prefix); a None output name marks a multi-output UDF,
+# whose outputs are named after its result keys
+_Step = Tuple[Optional[str], Tuple[str, ...], Callable, Optional[str]]
+
+# the columns and value types of a row
+_Shape = Tuple[Tuple[str, type], ...]
+
+
+class RowScorer:
+    def __init__(self, schema: Optional[UdfSchema] = None):
+        self._schema = schema if schema is not None else udf_schema()
+        self._drop_columns = set(self._schema.drop_columns or [])
+        self._plans: Dict[_Shape, List[_Step]] = {}
+
+    def _plan(self, row: Mapping[str, Any]) -> List[_Step]:
+        steps: List[_Step] = []
+        for spec in self._schema.multicolumn_udfs:
+            if not spec.column_names or not set(spec.column_names).issubset(row.keys()):
+                continue
+            columns = tuple(spec.column_names)
+            if spec.udf is not None:
+                steps.append((None, columns, spec.udf, spec.prefix))
+            else:
+                for new_col, udf in spec.udfs.items():
+                    if new_col not in row:
+                        steps.append((new_col, columns, udf, None))
+        for column, value in row.items():
+            why_type = type(self._schema.type_mapper(type(value)))
+            for spec in self._schema.type_udfs[why_type]:
+                for key, udf in spec.udfs.items():
+                    new_col = f"{column}.{key}"
+                    if new_col not in row:
+                        # type UDFs take the bare list of values
+                        steps.append((new_col, (column,), _bare(udf), None))
+        return steps
+
+    def steps(self, row: Mapping[str, Any]) -> List[_Step]:
+        """The resolved UDF calls for rows shaped like row."""
+        shape = tuple((column, type(value)) for column, value in row.items())
+        plan = self._plans.get(shape)
+        if plan is None:
+            plan = self._plans[shape] = self._plan(row)
+        return plan
+
+    def score(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        """Returns row with the metric columns added, like extract(row)."""
+        result = dict(row)
+        with intermediates.batch_scope(), sampling.bypassed():
+            for step in self.steps(row):
+                _run(step, row, result)
+        for column in self._drop_columns.intersection(row.keys()):
+            result.pop(column)
+        return result
+
+    __call__ = score
+
+
+def _run(step: _Step, row: Mapping[str, Any], result: Dict[str, Any]) -> None:
+    """Calls one UDF on row and writes its outputs to result, None if it raised."""
+    new_col, columns, udf, prefix = step
+    inputs = {column: [row[column]] for column in columns}
+    if new_col is not None:
+        try:
+            result[new_col] = udf(inputs)[0]
+        except Exception:  # noqa
+            result[new_col] = None
+            diagnostic_logger.exception(f"Evaluating UDF {new_col} failed")
+        return
+    try:
+        for key, values in udf(inputs).items():
+            result[f"{prefix}.{key}" if prefix else key] = values[0]
+    except Exception as e:  # noqa
+        diagnostic_logger.exception(f"Evaluating UDF {prefix} failed with error {e}")
+
+
+def _output_names(step: _Step) -> Optional[List[str]]:
+    """
+    The metric names a step writes, if known before it runs: multi-output UDFs name their
+    outputs after their result keys, which langkit's UDFs list through an outputs attribute.
+    """
+    new_col, _, udf, prefix = step
+    if new_col is not None:
+        return [new_col]
+    outputs = getattr(udf, "outputs", None)
+    if outputs is None:
+        return None
+    return [f"{prefix}.{key}" if prefix else key for key in outputs()]
+
+
+def _bare(udf: Callable) -> Callable:
+    @wraps(udf)
+    def bare(inputs):
+        return udf(next(iter(inputs.values())))
+
+    return bare
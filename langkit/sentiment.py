@@ -1,21 +1,38 @@
 from copy import deepcopy
 from typing import Optional
 
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
+from langkit.utils import _offline
 
 
 _prompt = prompt_column
 _response = response_column
 _sentiment_analyzer = None
 _nltk_downloaded = False
+# set by init; the lexicon is downloaded and the analyzer built on first use
+_lexicon: Optional[str] = None
 
 
-def sentiment_nltk(text: str) -> float:
-    if _sentiment_analyzer is None:
+def warmup() -> None:
+    """Downloads the lexicon and builds the analyzer now rather than on the first scored row."""
+    import nltk
+    from nltk.sentiment import SentimentIntensityAnalyzer
+
+    global _sentiment_analyzer, _nltk_downloaded
+    if _lexicon is None:
         raise ValueError(
             "sentiment metrics must initialize sentiment analyzer before evaluation!"
         )
+    if not _nltk_downloaded and not _offline():
+        nltk.download(_lexicon)
+        _nltk_downloaded = True
+    _sentiment_analyzer = SentimentIntensityAnalyzer()
+
+
+def sentiment_nltk(text: str) -> float:
+    if _sentiment_analyzer is None:
+        warmup()
     return _sentiment_analyzer.polarity_scores(text)["compound"]
 
 
@@ -29,18 +46,15 @@ def response_sentiment(text):
     return [sentiment_nltk(t) for t in text[_response]]
 
 
+@timed_init
 def init(lexicon: Optional[str] = None, config: Optional[LangKitConfig] = None):
-    import nltk
-    from nltk.sentiment import SentimentIntensityAnalyzer
-
     config = config or deepcopy(lang_config)
-    lexicon = lexicon or config.sentiment_lexicon
-    global _sentiment_analyzer, _nltk_downloaded
-    if not _nltk_downloaded:
-        nltk.download(lexicon)
-        _nltk_downloaded = True
-
-    _sentiment_analyzer = SentimentIntensityAnalyzer()
+    global _lexicon, _sentiment_analyzer, _nltk_downloaded
+    new_lexicon = lexicon or config.sentiment_lexicon
+    if new_lexicon != _lexicon:
+        _nltk_downloaded = False
+    _lexicon = new_lexicon
+    _sentiment_analyzer = None
 
 
 init()
@@ -0,0 +1,155 @@
+import importlib
+import inspect
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from whylogs.core import DatasetProfile, DatasetProfileView
+from whylogs.experimental.core.udf_schema import UdfSchema, udf_schema
+
+from langkit import LangKitConfig
+from langkit.extract import extract
+
+diagnostic_logger = getLogger(__name__)
+
+# modules that start threads or hold native state at import, which do not survive a fork
+_FORK_UNSAFE_MODULES = ["torch", "tensorflow", "transformers", "sentence_transformers"]
+
+_worker_schema: Optional[UdfSchema] = None
+
+
+def _module_name(module: str) -> str:
+    return module if module.startswith("langkit.") else f"langkit.{module}"
+
+
+def _init_module(module: str, config: Optional[LangKitConfig]) -> Any:
+    init = importlib.import_module(_module_name(module)).init
+    # some modules (vader_sentiment, the LLM-based ones) take no config
+    if config is not None and "config" in inspect.signature(init).parameters:
+        return init(config=config)
+    return init()
+
+
+def _init_worker(modules: Sequence[str], config: Optional[LangKitConfig]) -> None:
+    global _worker_schema
+    schema = None
+    for module in modules:
+        schema = _init_module(module, config)
+    _worker_schema = schema if isinstance(schema, UdfSchema) else udf_schema()
+
+
+def _profile_shard(
+    shard: pd.DataFrame, return_enhanced: bool
+) -> Tuple[bytes, Optional[pd.DataFrame]]:
+    assert _worker_schema is not None
+    enhanced = extract(shard, schema=_worker_schema)
+    profile = DatasetProfile(schema=_worker_schema)
+    profile.track(pandas=enhanced, execute_udfs=False)
+    return profile.view().serialize(), enhanced if return_enhanced else None
+
+
+def default_start_method() -> str:
+    """
+    fork is cheapest, but forking a process that already imported torch or tensorflow can
+    deadlock the children, so spawn is used once any of them is loaded or where fork is missing.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return "spawn"
+    if any(module in sys.modules for module in _FORK_UNSAFE_MODULES):
+        return "spawn"
+    return "fork"
+
+
+def _shards(data: pd.DataFrame, num_shards: int) -> List[pd.DataFrame]:
+    size = max(1, -(-len(data) // num_shards))
+    return [
+        data.iloc[start : start + size].reset_index(drop=True)
+        for start in range(0, len(data), size)
+    ]
+
+
+def profile_sharded(
+    data: pd.DataFrame,
+    modules: Sequence[str] = ("light_metrics",),
+    config: Optional[LangKitConfig] = None,
+    num_workers: Optional[int] = None,
+    num_shards: Optional[int] = None,
+    return_enhanced: bool = False,
+    start_method: Optional[str] = None,
+) -> Tuple[DatasetProfileView, Optional[pd.DataFrame]]:
+    """
+    Profiles data on a pool of num_workers processes (os.cpu_count() by default), which scales
+    GIL-bound metrics such as textstat, sentiment and regexes across cores.
+
+    Every worker imports the given langkit modules (e.g. "light_metrics" or "langkit.toxicity")
+    and calls their init(config=config) once, so models are loaded once per worker. The schema
+    returned by the last init is used, or udf_schema() if it returns none. data is split into
+    num_shards contiguous partitions (one per worker by default), each worker profiles its
+    shards, and the serialized profile views are merged in the parent.
+
+    Returns the merged profile view and, if return_enhanced is set, the enhanced DataFrame in
+    the original row order. With the spawn start method, call this from under an
+    `if __name__ == "__main__":` guard, as with any multiprocessing code.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    num_shards = num_shards or num_workers
+    start_method = start_method or default_start_method()
+    shards = _shards(data, num_shards)
+    if not shards:
+        shards = [data]
+    context = multiprocessing.get_context(start_method)
+    with ProcessPoolExecutor(
+        max_workers=min(num_workers, len(shards)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(list(modules), config),
+    ) as pool:
+        results = list(
+            pool.map(_profile_shard, shards, [return_enhanced] * len(shards))
+        )
+
+    view = DatasetProfileView.deserialize(results[0][0])
+    for serialized, _ in results[1:]:
+        view = view.merge(DatasetProfileView.deserialize(serialized))
+    enhanced = None
+    if return_enhanced:
+        enhanced = pd.concat(
+            [shard for _, shard in results if shard is not None], ignore_index=True
+        )
+    return view, enhanced
+
+
+def scaling_benchmark(
+    data: pd.DataFrame,
+    modules: Sequence[str] = ("light_metrics",),
+    config: Optional[LangKitConfig] = None,
+    worker_counts: Sequence[int] = (1, 2, 4),
+    start_method: Optional[str] = None,
+) -> Dict[int, Dict[str, float]]:
+    """
+    Times profile_sharded over data for each worker count. Returns, per worker count, the
+    wall time in seconds (including worker start-up and model init), rows per second, and
+    the speedup relative to the first worker count.
+    """
+    results: Dict[int, Dict[str, float]] = {}
+    for workers in worker_counts:
+        start = time.perf_counter()
+        profile_sharded(
+            data,
+            modules=modules,
+            config=config,
+            num_workers=workers,
+            start_method=start_method,
+        )
+        seconds = time.perf_counter() - start
+        results[workers] = {"seconds": seconds, "rows_per_sec": len(data) / seconds}
+        diagnostic_logger.info(f"{workers} workers: {len(data)} rows in {seconds:.2f}s")
+    baseline = results[worker_counts[0]]["seconds"]
+    for result in results.values():
+        result["speedup"] = baseline / result["seconds"]
+    return results
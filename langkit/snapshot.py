@@ -0,0 +1,163 @@
+"""
+Snapshots of the initialized models, for processes that have to start fast.
+
+save() warms up the given metric modules and writes every model in the registry to a
+directory: transformer weights as safetensors next to their tokenizers, and reference
+matrices such as the injections harm embeddings as .npy files. restore() points the registry
+at that directory, so models load from it, weights memory-mapped, instead of from the hub, a
+download or a parquet file.
+
+    python -m langkit.snapshot save /models/langkit --modules llm_metrics injections
+
+and in the serving process, before the first request (or before langkit.warmup()):
+
+    from langkit import snapshot
+    snapshot.restore("/models/langkit")
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import sys
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Sequence
+
+from langkit import models
+from langkit.models import ModelKey
+from langkit.utils import _use_cuda
+
+diagnostic_logger = getLogger(__name__)
+
+MANIFEST = "snapshot.json"
+
+_PIPELINE = "transformers.pipeline:"
+
+
+def _device(key: ModelKey) -> str:
+    return "cpu" if key.device == "cpu" or not _use_cuda() else "cuda"
+
+
+def _dir_name(key: ModelKey) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{key.backend}__{key.model_id}")
+
+
+def _save_model(key: ModelKey, model: Any, path: str) -> Optional[str]:
+    """Writes one model under path; returns the file or directory name, or None if unsupported."""
+    name = _dir_name(key)
+    target = os.path.join(path, name)
+    if key.backend == "numpy":
+        import numpy as np
+
+        name += ".npy"
+        np.save(target + ".npy", np.ascontiguousarray(model))
+    elif key.backend == "sentence_transformers":
+        try:
+            model.save(target, safe_serialization=True)
+        except TypeError:  # sentence_transformers < 2.3
+            model.save(target)
+    elif key.backend.startswith(_PIPELINE):
+        model.save_pretrained(target, safe_serialization=True)
+    else:
+        return None
+    return name
+
+
+def _loader(backend: str, path: str):
+    def load(key: ModelKey) -> Any:
+        diagnostic_logger.info(f"Loading {key.model_id} from snapshot {path}")
+        if backend == "numpy":
+            import numpy as np
+
+            return np.load(path, mmap_mode="r")
+        if backend == "sentence_transformers":
+            from sentence_transformers import SentenceTransformer
+
+            return SentenceTransformer(path, device=_device(key))
+        from transformers import pipeline
+
+        return pipeline(
+            backend[len(_PIPELINE) :],
+            model=path,
+            tokenizer=path,
+            device=_device(key),
+        )
+
+    return load
+
+
+def save(path: str, modules: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Warms up the given langkit modules (e.g. ["llm_metrics", "injections"]), importing them
+    if needed, or every imported module if modules is None, then writes the loaded models
+    and a manifest to path. Returns the manifest.
+    """
+    from langkit import __version__, warmup
+
+    if modules is None:
+        warmup()
+    else:
+        for module in modules:
+            name = module if module.startswith("langkit.") else f"langkit.{module}"
+            module_warmup = getattr(importlib.import_module(name), "warmup", None)
+            if callable(module_warmup):
+                module_warmup()
+
+    os.makedirs(path, exist_ok=True)
+    entries: List[Dict[str, str]] = []
+    for key, model in models.loaded().items():
+        name = _save_model(key, model, path)
+        if name is None:
+            diagnostic_logger.warning(
+                f"Snapshot: {key.backend} models can't be snapshotted, {key.model_id} will load as usual"
+            )
+            continue
+        entries.append({"model_id": key.model_id, "backend": key.backend, "path": name})
+    manifest = {"langkit_version": __version__, "models": entries}
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def restore(path: str) -> List[str]:
+    """
+    Makes the registry load the models saved in path from there. Models that are already
+    loaded are left alone, so call this before the first request or warmup(). Returns the
+    ids of the models redirected to the snapshot.
+    """
+    from langkit import __version__
+
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("langkit_version") != __version__:
+        diagnostic_logger.warning(
+            f"Snapshot {path} was written by langkit {manifest.get('langkit_version')}, "
+            f"this is {__version__}"
+        )
+    restored = []
+    for entry in manifest["models"]:
+        models.override(
+            entry["model_id"],
+            entry["backend"],
+            _loader(entry["backend"], os.path.join(path, entry["path"])),
+        )
+        restored.append(entry["model_id"])
+    return restored
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="LangKit model snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    save_command = commands.add_parser("save", help="write a snapshot")
+    save_command.add_argument("path")
+    save_command.add_argument("--modules", nargs="+", default=["all_metrics"])
+    args = parser.parse_args(argv)
+
+    manifest = save(args.path, args.modules)
+    for entry in manifest["models"]:
+        print(f"{entry['model_id']} ({entry['backend']}) -> {entry['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import os
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+from langkit import LangKitConfig, artifacts, models
+
+
+def _config(source_dir) -> LangKitConfig:
+    config = LangKitConfig()
+    config.injections_base_url = f"file://{source_dir}{os.sep}"
+    return config
+
+
+def test_artifacts_cover_every_download():
+    kinds = {artifact.kind for artifact in artifacts.artifacts(LangKitConfig())}
+    assert kinds == set(artifacts.KINDS)
+
+
+def test_injections_artifacts_follow_config():
+    config = LangKitConfig(
+        injections_transformer_name="paraphrase-MiniLM-L3-v2", injections_version="v3"
+    )
+    names = {artifact.name for artifact in artifacts.artifacts(config)}
+    assert "sentence-transformers/paraphrase-MiniLM-L3-v2" in names
+    assert "embeddings_paraphrase-MiniLM-L3-v2_harm_v3.parquet" in names
+    assert "embeddings_all-MiniLM-L6-v2_harm_v2.parquet" not in names
+
+
+def test_prefetch_verify_and_use(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    source.mkdir()
+    name = "embeddings_all-MiniLM-L6-v2_harm_v2.parquet"
+    pd.DataFrame({"sentence_embedding": [[3.0, 4.0], [0.0, 2.0]]}).to_parquet(
+        source / name
+    )
+    directory = str(tmp_path / "artifacts")
+    config = _config(source)
+
+    artifacts.prefetch(directory, config, kinds=["url"])
+    assert artifacts.verify(directory) == []
+    [entry] = artifacts.report(directory)
+    assert entry["name"] == name
+    assert entry["size_bytes"] == os.path.getsize(source / name)
+
+    for variable in ["LANGKIT_OFFLINE", "HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE"]:
+        monkeypatch.setenv(variable, "")
+    try:
+        assert artifacts.use(directory, config, check=True) is config
+        assert os.environ["LANGKIT_OFFLINE"] == "1"
+        source.joinpath(name).unlink()
+        # the reference embeddings are read by langkit.injections
+        if find_spec("torch") and find_spec("sentence_transformers"):
+            embeddings = models.load(name, "numpy", "cpu", lambda: None)
+            np.testing.assert_allclose(embeddings, [[0.6, 0.8], [0.0, 1.0]])
+    finally:
+        models.override(name, "numpy", None)
+        models.evict(models.ModelKey(name, "numpy", "cpu"))
+
+    with open(os.path.join(directory, "url", name), "ab") as f:
+        f.write(b"tampered")
+    assert artifacts.verify(directory) == [
+        f"{name}: {os.path.join('url', name)} does not match its checksum"
+    ]
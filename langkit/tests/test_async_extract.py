@@ -0,0 +1,87 @@
+import asyncio
+
+from whylogs.experimental.core.udf_schema import register_dataset_udf, udf_schema
+
+import langkit
+from langkit.async_extract import AsyncExtractor, aextract
+
+_SCHEMA = "async_extract_test"
+
+
+@register_dataset_udf(["prompt"], "prompt.length", schema_name=_SCHEMA)
+def _length(text):
+    return [len(t) for t in text["prompt"]]
+
+
+@register_dataset_udf(["prompt"], "prompt.ratio", schema_name=_SCHEMA)
+def _ratio(text):
+    return [len(t) / 10 for t in text["prompt"]]
+
+
+@register_dataset_udf(["prompt"], "prompt.broken", schema_name=_SCHEMA)
+def _broken(text):
+    raise RuntimeError("broken UDF")
+
+
+def test_async_extract_coalesces_rows(monkeypatch):
+    from langkit import regexes
+
+    regexes.init()
+    extractor = AsyncExtractor(max_wait=0.05, max_batch_size=8)
+    batch_sizes = []
+    extract_batch = extractor._extract_batch
+
+    def spy(rows):
+        batch_sizes.append(len(rows))
+        return extract_batch(rows)
+
+    monkeypatch.setattr(extractor, "_extract_batch", spy)
+    rows = [
+        {"prompt": "I love you", "response": "address: 123 Main St."},
+        {"prompt": "call me at 555-555-5555", "response": "ok"},
+        {"prompt": "hi"},
+    ]
+
+    async def run():
+        results = await asyncio.gather(*[extractor.extract(row) for row in rows])
+        await extractor.close()
+        return results
+
+    results = asyncio.run(run())
+    assert batch_sizes == [3]
+    for result, row in zip(results, rows):
+        expected = langkit.extract(row)
+        assert result.keys() == expected.keys()
+        assert result["prompt.has_patterns"] == expected["prompt.has_patterns"]
+    assert results[0]["response.has_patterns"] == "mailing address"
+    assert results[1]["prompt.has_patterns"] == "phone number"
+
+
+def test_aextract():
+    from langkit import regexes
+
+    regexes.init()
+    row = {"prompt": "I love you", "response": "address: 123 Main St."}
+    result = asyncio.run(aextract(row))
+    assert result.get("response.has_patterns") == "mailing address"
+
+
+def test_async_extract_returns_python_values():
+    schema = udf_schema(schema_name=_SCHEMA)
+    extractor = AsyncExtractor(schema=schema, max_wait=0.05)
+    rows = [{"prompt": "abc"}, {"prompt": "hello"}]
+
+    async def run():
+        results = await asyncio.gather(*[extractor.extract(row) for row in rows])
+        await extractor.close()
+        return results
+
+    results = asyncio.run(run())
+    for result, row in zip(results, rows):
+        expected = langkit.extract(row, schema=schema)
+        assert result == expected
+        assert {k: type(v) for k, v in result.items()} == {
+            k: type(v) for k, v in expected.items()
+        }
+    assert results[1]["prompt.length"] == 5
+    assert results[1]["prompt.broken"] is None
@@ -0,0 +1,43 @@
+import pytest
+
+from langkit import benchmark
+
+
+def test_generate_is_deterministic():
+    for workload in benchmark.WORKLOADS:
+        rows = benchmark.generate(workload, 5, seed=1)
+        assert rows == benchmark.generate(workload, 5, seed=1)
+        assert rows != benchmark.generate(workload, 5, seed=2)
+        assert all(row["prompt"] and row["response"] for row in rows)
+
+
+def test_latency_rows_are_interleaved_and_not_batch_rows():
+    rows = benchmark.generate_latency_rows(benchmark.WORKLOADS, 8, seed=1)
+    assert len(rows) == 8
+    assert rows == benchmark.generate_latency_rows(benchmark.WORKLOADS, 8, seed=1)
+    # chat, rag, code, pii, chat, ...
+    code = [i for i, row in enumerate(rows) if row["prompt"].startswith("Write code")]
+    assert code == [2, 6]
+    assert [row["response"].count("@example.com") for row in rows][3::4] == [1, 1]
+    batch = [
+        row
+        for workload in benchmark.WORKLOADS
+        for row in benchmark.generate(workload, 8, 1)
+    ]
+    assert not any(row in batch for row in rows)
+
+
+def test_compare_reports_regressions():
+    baseline = {"results": {"textstat": {"rows_per_sec": 100.0, "init_seconds": 1.0}}}
+    current = {"results": {"textstat": {"rows_per_sec": 80.0, "init_seconds": 1.05}}}
+    regressions = benchmark.compare(current, baseline, tolerance=0.1)
+    assert [r["metric"] for r in regressions] == ["rows_per_sec"]
+    assert benchmark.compare(current, baseline, tolerance=0.3) == []
+
+
+@pytest.mark.load
+def test_benchmark_module():
+    result = benchmark.benchmark_module("regexes", rows=40, latency_rows=5)
+    assert result["rows"] == 40
+    assert result["rows_per_sec"] > 0
+    assert result["p50_row_seconds"] <= result["p99_row_seconds"]
@@ -83,3 +83,25 @@ def test_count_patterns(ptt_df, user_defined_json):
             "distribution"
             in view.get_column(f"prompt.{group}_count").get_metric_names()
         )
+
+
+def test_count_patterns_single_udf_per_column(ptt_df):
+    from langkit import count_regexes, extract
+
+    count_regexes.init(config=LangKitConfig())
+    schema = udf_schema()
+    count_specs = [
+        spec
+        for spec in schema.multicolumn_udfs
+        if spec.name in count_regexes._registered
+    ]
+    assert len(count_specs) == 2
+
+    result = extract(ptt_df, schema=schema)
+    assert result["prompt.SSN_count"].to_list()[10:14] == [1, 1, 1, 1]
+    assert result["prompt.email address_count"].to_list()[4] == 1
+    assert result["prompt.credit card number_count"].to_list()[-1] == 0
+
+    row = extract({"prompt": "my ssn is 856-45-6789"}, schema=schema)
+    assert row["prompt.SSN_count"] == 1
+    assert row["prompt.phone number_count"] == 0
@@ -46,3 +46,253 @@ def test_extract_with_custom_schema():
     row = {"prompt": "I love you", "response": "address: 123 Main St."}
     enhanced_row = langkit.extract(row, schema=schema)
     assert enhanced_row.get("prompt.customfeature") == "I love you"
+
+
+def test_extract_parallel_matches_sequential():
+    from langkit import light_metrics
+
+    light_metrics.init()
+    df = pd.DataFrame(
+        {
+            "prompt": ["I love you", "call me at 555-555-5555"],
+            "response": ["address: 123 Main St.", "I hate you"],
+        }
+    )
+    sequential = langkit.extract(df)
+    parallel = langkit.extract(df, max_workers=4)
+    assert list(parallel.columns) == list(sequential.columns)
+    pd.testing.assert_frame_equal(parallel, sequential)
+
+    row = {"prompt": "I love you", "response": "address: 123 Main St."}
+    assert langkit.extract(row, max_workers=4) == langkit.extract(row)
+
+
+def test_parallel_udf_schema_logging():
+    import whylogs as why
+    from langkit import textstat
+    from langkit.parallel import ParallelUdfSchema
+    from whylogs.experimental.core.udf_schema import udf_schema
+
+    textstat.init()
+    df = pd.DataFrame({"prompt": ["I love you", "I hate you"]})
+    schema = ParallelUdfSchema(udf_schema(), max_workers=4)
+    columns = why.log(df, schema=schema).view().get_columns()
+    assert "prompt.flesch_reading_ease" in columns
+
+
+def test_parallel_udf_schema_copy_keeps_its_settings():
+    from langkit import textstat
+    from langkit.parallel import ParallelUdfSchema
+    from whylogs.experimental.core.udf_schema import udf_schema
+
+    textstat.init()
+    schema = ParallelUdfSchema(
+        udf_schema(drop_columns={"prompt"}), max_workers=3, dedupe=True
+    )
+    copy = schema.copy()
+    assert isinstance(copy, ParallelUdfSchema)
+    assert (copy.max_workers, copy.dedupe) == (3, True)
+    assert copy.drop_columns == {"prompt"}
+    assert len(copy.multicolumn_udfs) == len(schema.multicolumn_udfs)
+    assert copy.multicolumn_udfs is not schema.multicolumn_udfs
+
+
+def test_whylogs_logs_through_run_udfs(monkeypatch):
+    # ParallelUdfSchema overrides UdfSchema._run_udfs, a whylogs internal: this fails if
+    # a whylogs upgrade renames it or stops calling it when tracking or applying UDFs
+    import inspect
+
+    import whylogs as why
+    from langkit import textstat
+    from langkit.parallel import ParallelUdfSchema
+    from whylogs.experimental.core.udf_schema import udf_schema
+
+    assert list(inspect.signature(UdfSchema._run_udfs).parameters) == [
+        "self",
+        "pandas",
+        "row",
+    ]
+    textstat.init()
+    calls = []
+    run_udfs = ParallelUdfSchema._run_udfs
+
+    def spy(self, pandas=None, row=None):
+        calls.append("row" if row is not None else "pandas")
+        return run_udfs(self, pandas, row)
+
+    monkeypatch.setattr(ParallelUdfSchema, "_run_udfs", spy)
+    schema = ParallelUdfSchema(udf_schema(), max_workers=2)
+    df = pd.DataFrame({"prompt": ["I love you"]})
+    why.log(df, schema=schema)
+    why.log(row={"prompt": "I love you"}, schema=schema)
+    schema.apply_udfs(pandas=df)
+    assert calls == ["pandas", "row", "pandas"]
+
+
+def test_extract_stream_chunks(tmp_path):
+    from langkit import textstat
+
+    textstat.init()
+    rows = [{"prompt": f"I love you {i} times"} for i in range(7)]
+    chunks = list(langkit.extract_stream(iter(rows), chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert all("prompt.flesch_reading_ease" in chunk.columns for chunk in chunks)
+
+    df = pd.DataFrame(rows)
+    streamed = pd.concat(langkit.extract_stream(df, chunk_size=3), ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, langkit.extract(df))
+
+    path = tmp_path / "rows.jsonl"
+    df.to_json(path, orient="records", lines=True)
+    from_file = pd.concat(
+        langkit.extract_stream(str(path), chunk_size=3), ignore_index=True
+    )
+    pd.testing.assert_frame_equal(from_file, langkit.extract(df))
+
+
+def test_extract_stream_profile():
+    from langkit import textstat
+    from whylogs.core import DatasetProfile
+    from whylogs.experimental.core.udf_schema import udf_schema
+
+    textstat.init()
+    schema = udf_schema()
+    profile = DatasetProfile(schema=schema)
+    rows = ({"prompt": f"I love you {i} times"} for i in range(5))
+    for _ in langkit.extract_stream(rows, schema=schema, chunk_size=2, profile=profile):
+        pass
+    column = profile.view().get_column("prompt.flesch_reading_ease")
+    assert column.get_metric("counts").n.value == 5
+
+
+def test_extract_arrow(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from langkit import regexes
+
+    regexes.init()
+    table = pa.table(
+        {
+            "prompt": ["I love you", "I hate you"],
+            "response": ["address: 123 Main St.", "ok"],
+            "id": [1, 2],
+        }
+    )
+    enhanced = langkit.extract(table)
+    assert isinstance(enhanced, pa.Table)
+    assert enhanced.column_names[:3] == ["prompt", "response", "id"]
+    assert enhanced.column("response.has_patterns").to_pylist() == [
+        "mailing address",
+        None,
+    ]
+    batch = langkit.extract(table.to_batches()[0])
+    assert isinstance(batch, pa.RecordBatch)
+    assert batch.num_columns == enhanced.num_columns
+
+    path = tmp_path / "rows.parquet"
+    pq.write_table(table, path)
+    chunks = list(langkit.extract_stream(str(path), chunk_size=1, arrow=True))
+    assert [chunk.num_rows for chunk in chunks] == [1, 1]
+    assert "id" not in chunks[0].schema.names
+    assert chunks[0].column("response.has_patterns").to_pylist() == ["mailing address"]
+
+
+def test_extract_dedupe():
+    calls = []
+
+    def relevance(text):
+        calls.append(len(text["prompt"]))
+        return [len(p) + len(r) for p, r in zip(text["prompt"], text["response"])]
+
+    def broken(text):
+        raise ValueError("broken")
+
+    schema = UdfSchema(
+        udf_specs=[
+            UdfSpec(
+                column_names=["prompt", "response"],
+                udfs={"response.relevance": relevance},
+            ),
+            UdfSpec(column_names=["response"], udfs={"response.broken": broken}),
+        ],
+    )
+    df = pd.DataFrame(
+        {
+            "prompt": ["a", "bb", "a", "a"],
+            "response": ["x", "x", "x", "yy"],
+        }
+    )
+    deduped = langkit.extract(df, schema=schema, dedupe=True)
+    assert calls == [3]
+    assert list(deduped["response.relevance"]) == [2, 3, 2, 3]
+    assert deduped["response.broken"].isna().all()
+    pd.testing.assert_frame_equal(
+        deduped[["prompt", "response", "response.relevance"]],
+        langkit.extract(df, schema=schema)[
+            ["prompt", "response", "response.relevance"]
+        ],
+    )
+
+
+def test_extract_dedupe_matches_light_metrics():
+    from langkit import light_metrics
+
+    light_metrics.init()
+    df = pd.DataFrame(
+        {
+            "prompt": ["I love you", "call me at 555-555-5555", "I love you"],
+            "response": ["address: 123 Main St.", "I hate you", "I hate you"],
+        }
+    )
+    pd.testing.assert_frame_equal(
+        langkit.extract(df, dedupe=True, max_workers=2), langkit.extract(df)
+    )
+
+
+def test_nested_parallel_extract_runs_inline():
+    import threading
+
+    from langkit import parallel
+
+    inner = UdfSchema(
+        udf_specs=[
+            UdfSpec(
+                column_names=["prompt"],
+                udfs={
+                    "prompt.a": lambda text: [len(t) for t in text["prompt"]],
+                    "prompt.b": lambda text: [t.upper() for t in text["prompt"]],
+                },
+            )
+        ]
+    )
+
+    def nested(text):
+        df = pd.DataFrame({"prompt": list(text["prompt"])})
+        return list(langkit.extract(df, schema=inner, max_workers=2)["prompt.a"])
+
+    outer = UdfSchema(
+        udf_specs=[
+            UdfSpec(
+                column_names=["prompt"],
+                udfs={f"prompt.nested_{i}": nested for i in range(4)},
+            )
+        ]
+    )
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(
+            langkit.extract(pd.DataFrame({"prompt": ["ab", "c"]}), outer, 2)
+        ),
+        daemon=True,
+    )
+    thread.start()
+    # every worker of the pool waiting on the same pool would never finish
+    thread.join(timeout=30)
+    assert results, "nested parallel extract deadlocked"
+    assert list(results[0]["prompt.nested_3"]) == [2, 1]
+
+    parallel.shutdown()
+    assert parallel._executors == {}
+    assert list(
+        langkit.extract(pd.DataFrame({"prompt": ["abc"]}), inner, 2)["prompt.a"]
+    ) == [3]
@@ -0,0 +1,154 @@
+import pytest
+from whylogs.experimental.core.udf_schema import register_dataset_udf, udf_schema
+
+from langkit.guardrails import LLM, REGEX, Guardrail, Policy
+
+_SCHEMA = "guardrails_test"
+_calls = []
+
+
+@register_dataset_udf(["prompt"], "prompt.expensive", schema_name=_SCHEMA)
+def _expensive(text):
+    _calls.append("expensive")
+    return [len(t) for t in text["prompt"]]
+
+
+@register_dataset_udf(["prompt"], "prompt.cheap", schema_name=_SCHEMA)
+def _cheap(text):
+    _calls.append("cheap")
+    return ["forbidden" in t for t in text["prompt"]]
+
+
+@register_dataset_udf(["prompt"], "prompt.unused", schema_name=_SCHEMA)
+def _unused(text):
+    _calls.append("unused")
+    return [0 for _ in text["prompt"]]
+
+
+@pytest.fixture
+def guardrail():
+    _calls.clear()
+    return Guardrail(
+        [Policy("prompt.expensive", above=10), Policy("prompt.cheap")],
+        udf_schema(schema_name=_SCHEMA),
+        costs={"prompt.cheap": REGEX, "prompt.expensive": LLM},
+    )
+
+
+def test_policy_fires():
+    assert Policy("m", above=0.5).fires(0.6)
+    assert not Policy("m", above=0.5).fires(0.5)
+    assert Policy("m", below=10).fires(3)
+    assert Policy("m").fires("ssn")
+    assert not Policy("m").fires(None)
+    assert not Policy("m", above=0.5).fires(None)
+
+
+def test_guardrail_stops_at_cheap_policy(guardrail):
+    verdict = guardrail({"prompt": "a forbidden prompt"})
+    assert verdict.blocked
+    assert verdict.fired == Policy("prompt.cheap")
+    assert verdict.metrics == {"prompt.cheap": True}
+    assert _calls == ["cheap"]
+
+
+def test_guardrail_evaluates_all_policies_when_none_fire(guardrail):
+    verdict = guardrail({"prompt": "short"})
+    assert not verdict.blocked
+    assert verdict.fired is None
+    assert verdict.metrics == {"prompt.cheap": False, "prompt.expensive": 5}
+    assert _calls == ["cheap", "expensive"]
+
+    verdict = guardrail({"prompt": "a long enough prompt"})
+    assert verdict.blocked
+    assert verdict.fired == Policy("prompt.expensive", above=10)
+
+
+def test_guardrail_orders_langkit_metrics_by_cost():
+    from langkit import light_metrics
+
+    guardrail = Guardrail(
+        [
+            Policy("prompt.flesch_reading_ease", below=1000),
+            Policy("prompt.has_patterns"),
+        ],
+        light_metrics.init(),
+    )
+    verdict = guardrail({"prompt": "call me at 555-555-5555"})
+    assert verdict.blocked
+    assert verdict.fired == Policy("prompt.has_patterns")
+    assert list(verdict.metrics) == ["prompt.has_patterns"]
+
+    verdict = guardrail({"prompt": "hello there"})
+    assert verdict.fired == Policy("prompt.flesch_reading_ease", below=1000)
+    assert list(verdict.metrics) == [
+        "prompt.has_patterns",
+        "prompt.flesch_reading_ease",
+    ]
+
+
+def test_guardrail_matches_multioutput_udfs_by_prefix():
+    from langkit import count_regexes  # noqa
+
+    _calls.clear()
+    guardrail = Guardrail(
+        [Policy("prompt.phone number_count", above=0), Policy("prompt.cheap")],
+        udf_schema(schema_name=_SCHEMA),
+        costs={"prompt.cheap": LLM},
+    )
+    verdict = guardrail({"prompt": "a forbidden prompt, call 555-555-5555"})
+    assert verdict.fired == Policy("prompt.phone number_count", above=0)
+    assert verdict.metrics["prompt.phone number_count"] == 1
+    assert _calls == []
+
+
+def test_guardrail_matches_multioutput_udfs_by_output_name():
+    from langkit import count_regexes  # noqa
+
+    _calls.clear()
+    guardrail = Guardrail(
+        [Policy("prompt.cheap"), Policy("prompt.unknown_count", above=0)],
+        udf_schema(schema_name=_SCHEMA),
+    )
+    plan = guardrail._plan({"prompt": "text"})
+    assert [policies for _, _, policies in plan] == [[Policy("prompt.cheap")]]
+
+
+def test_guardrail_matches_unnamed_outputs_by_longest_prefix():
+    from langkit.instrumentation import register_multioutput_udf
+
+    schema_name = "guardrails_prefix_test"
+
+    @register_multioutput_udf(["prompt"], prefix="prompt", schema_name=schema_name)
+    def _short(text):
+        _calls.append("short")
+        return {"other": [0 for _ in text["prompt"]]}
+
+    @register_multioutput_udf(
+        ["prompt"], prefix="prompt.detector", schema_name=schema_name
+    )
+    def _long(text):
+        _calls.append("long")
+        return {"score": [1 for _ in text["prompt"]]}
+
+    _calls.clear()
+    guardrail = Guardrail(
+        [Policy("prompt.detector.score", above=0)],
+        udf_schema(schema_name=schema_name, include_default_schema=False),
+    )
+    verdict = guardrail({"prompt": "text"})
+    assert verdict.fired == Policy("prompt.detector.score", above=0)
+    assert _calls == ["long"]
+
+
+@pytest.mark.load
+def test_pii_policy_does_not_run_count_regexes():
+    from langkit import count_regexes, pii  # noqa
+
+    pii.init()
+    guardrail = Guardrail([Policy("prompt.pii_presidio.entities_count", above=0)])
+    [(_, step, _)] = guardrail._plan({"prompt": "text"})
+    assert step[3] == "prompt.pii_presidio"
+    verdict = guardrail({"prompt": "My SSN is 856-45-6789"})
+    assert verdict.blocked
+    assert all(metric.startswith("prompt.pii_presidio.") for metric in verdict.metrics)
@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+from importlib.util import find_spec
+
+import pytest
+
+# seconds for a fresh interpreter to import the module, whylogs and pandas included
+IMPORT_BUDGET = 3.0
+
+# imported only once a model or lexicon is actually needed
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "nltk", "spacy"]
+
+_has_llm_dependencies = all(
+    find_spec(package) is not None
+    for package in ["torch", "transformers", "sentence_transformers"]
+)
+
+
+def _import(module: str):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps([seconds, heavy]))\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "langkit.light_metrics",
+        "langkit.sentiment",
+        pytest.param(
+            "langkit.llm_metrics",
+            marks=pytest.mark.skipif(
+                not _has_llm_dependencies, reason="needs langkit[all]"
+            ),
+        ),
+        pytest.param(
+            "langkit.all_metrics",
+            marks=pytest.mark.skipif(
+                not _has_llm_dependencies, reason="needs langkit[all]"
+            ),
+        ),
+    ],
+)
+def test_import_is_cheap(module):
+    seconds, heavy = _import(module)
+    assert heavy == []
+    assert seconds < IMPORT_BUDGET
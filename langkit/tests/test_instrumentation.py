@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+import langkit
+from langkit import instrumentation
+
+
+def test_stats_per_udf():
+    from langkit import regexes
+
+    regexes.init()
+    instrumentation.reset_stats()
+    df = pd.DataFrame({"prompt": ["I love you", "call me at 555-555-5555", "hi"]})
+    langkit.extract(df)
+    langkit.extract({"prompt": "hello"})
+
+    udf = langkit.stats()["udfs"]["prompt.has_patterns"]
+    assert udf["calls"] == 2
+    assert udf["rows"] == 4
+    assert udf["p50"] <= udf["p95"] <= udf["p99"]
+    assert "langkit.regexes" in langkit.stats()["init"]
+    assert "intermediates" in langkit.stats()["caches"]
+
+    frame = instrumentation.stats_dataframe()
+    assert "prompt.has_patterns" in list(frame["udf"])
+
+
+def test_stats_disabled():
+    from langkit import regexes
+
+    regexes.init()
+    instrumentation.reset_stats()
+    instrumentation.enable(False)
+    try:
+        langkit.extract({"prompt": "hello"})
+    finally:
+        instrumentation.enable(True)
+    assert "prompt.has_patterns" not in langkit.stats()["udfs"]
+
+
+@pytest.mark.load
+def test_stats_per_multioutput_udf():
+    from langkit import count_regexes, pii
+
+    count_regexes.init()
+    pii.init()
+    instrumentation.reset_stats()
+    langkit.extract({"prompt": "call me at 555-555-5555", "response": "ok"})
+
+    udfs = langkit.stats()["udfs"]
+    for column in ["prompt", "response"]:
+        assert udfs[f"{column}.pii_presidio"]["rows"] == 1
+        assert udfs[f"{column}.pattern_counts"]["rows"] == 1
+    assert "wrappee" not in udfs
+
+
+def test_multioutput_udf_name_defaults_to_prefix():
+    from whylogs.experimental.core.udf_schema import udf_schema
+
+    def per_column(column):
+        def wrappee(text):
+            return {"length": [len(t) for t in text[column]]}
+
+        return wrappee
+
+    for column in ["prompt", "response"]:
+        instrumentation.register_multioutput_udf(
+            [column], prefix=f"{column}.test", schema_name="instrumentation_test"
+        )(per_column(column))
+    instrumentation.reset_stats()
+    langkit.extract(
+        {"prompt": "hello", "response": "hi"},
+        schema=udf_schema(schema_name="instrumentation_test"),
+    )
+
+    udfs = langkit.stats()["udfs"]
+    assert udfs["prompt.test"]["rows"] == 1
+    assert udfs["response.test"]["rows"] == 1
+
+
+def test_stats_report_model_load_times():
+    from langkit import models
+
+    models.load("instrumentation_test_model", "numpy", "cpu", lambda: [1.0])
+    try:
+        model = langkit.stats()["models"]["instrumentation_test_model (numpy, cpu)"]
+        assert model["loaded"]
+        assert model["load_seconds"] >= 0
+    finally:
+        models.evict(models.ModelKey("instrumentation_test_model", "numpy", "cpu"))
@@ -0,0 +1,88 @@
+import pandas as pd
+from whylogs.experimental.core.udf_schema import UdfSchema, UdfSpec
+
+import langkit
+from langkit import intermediates
+
+
+def test_artifacts_computed_once_per_batch():
+    calls = []
+
+    def producer(texts):
+        calls.append(list(texts))
+        return [len(text) for text in texts]
+
+    intermediates.register_artifact("test_length", producer)
+    intermediates.declare("prompt.length_a", "test_length")
+    intermediates.declare("prompt.length_b", "test_length")
+
+    def length(text):
+        return intermediates.get_many("test_length", list(text["prompt"]))
+
+    schema = UdfSchema(
+        udf_specs=[
+            UdfSpec(column_names=["prompt"], udfs={"prompt.length_a": length}),
+            UdfSpec(column_names=["prompt"], udfs={"prompt.length_b": length}),
+        ]
+    )
+    df = pd.DataFrame({"prompt": ["hi", "hello", "hi"]})
+    enhanced = langkit.extract(df, schema=schema)
+    assert list(enhanced["prompt.length_a"]) == [2, 5, 2]
+    assert list(enhanced["prompt.length_b"]) == [2, 5, 2]
+    assert calls == [["hi", "hello"]]
+    assert intermediates._current.get() is None
+    assert intermediates.cache_info()[2] == 0
+
+    langkit.extract(df, schema=schema)
+    assert len(calls) == 2
+    assert intermediates.consumers()["prompt.length_a"] == ["test_length"]
+
+
+def test_concurrent_scopes_have_their_own_stores():
+    import threading
+
+    intermediates.register_artifact(
+        "test_upper", lambda texts: [t.upper() for t in texts]
+    )
+    opened, release = threading.Event(), threading.Event()
+
+    def long_batch():
+        with intermediates.batch_scope():
+            intermediates.get_many("test_upper", ["long"])
+            opened.set()
+            release.wait(10)
+
+    thread = threading.Thread(target=long_batch)
+    thread.start()
+    assert opened.wait(10)
+    try:
+        with intermediates.batch_scope():
+            assert intermediates.get_many("test_upper", ["a", "b"]) == ["A", "B"]
+            assert intermediates.cache_info()[2] == 3
+        # freed although the other scope is still open
+        assert intermediates.cache_info()[2] == 1
+    finally:
+        release.set()
+        thread.join()
+    assert intermediates.cache_info()[2] == 0
+
+
+def test_parallel_udfs_share_the_callers_store():
+    batches = []
+
+    def length(text):
+        batches.append(intermediates._current.get())
+        return [len(t) for t in text["prompt"]]
+
+    schema = UdfSchema(
+        udf_specs=[
+            UdfSpec(column_names=["prompt"], udfs={f"prompt.length_{i}": length})
+            for i in range(4)
+        ]
+    )
+    df = pd.DataFrame({"prompt": ["hi", "hello"]})
+    enhanced = langkit.extract(df, schema=schema, max_workers=4)
+    assert list(enhanced["prompt.length_3"]) == [2, 5]
+    assert len(batches) == 4
+    assert batches[0] is not None
+    assert all(batch is batches[0] for batch in batches)
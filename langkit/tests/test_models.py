@@ -0,0 +1,42 @@
+from langkit import models
+
+
+class _Model:
+    pass
+
+
+def test_models_are_shared_and_refcounted():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return _Model()
+
+    key = models.acquire("test/model", "test", "cpu", loader)
+    other = models.acquire("test/model", "test", "cpu", loader)
+    assert key == other
+    assert loads == []
+
+    first = models.load_key(key)
+    assert models.load("test/model", "test", "cpu", loader) is first
+    assert len(loads) == 1
+    [entry] = [e for e in models.report() if e["model_id"] == "test/model"]
+    assert entry["refcount"] == 2
+    assert entry["loaded"]
+
+    assert models.evict(key) == 0
+    models.release(key)
+    models.release(other)
+    assert models.evict(key) == 1
+    assert not [e for e in models.report() if e["model_id"] == "test/model"]
+
+
+def test_sentence_transformer_id():
+    assert (
+        models.sentence_transformer_id("all-MiniLM-L6-v2")
+        == "sentence-transformers/all-MiniLM-L6-v2"
+    )
+    assert (
+        models.sentence_transformer_id("sentence-transformers/all-MiniLM-L6-v2")
+        == "sentence-transformers/all-MiniLM-L6-v2"
+    )
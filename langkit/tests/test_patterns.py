@@ -1,6 +1,8 @@
+import json
 from logging import getLogger
 import os
 import tempfile
+import time
 
 import pandas as pd
 import pytest
@@ -156,3 +158,185 @@ def test_individual_patterns_isolated(target_pattern_tests):
                         result.view().get_column("prompt").to_summary_dict()
                     )
                 assert target_pattern in frequent_item.value
+
+
+@pytest.mark.parametrize("engine", ["re", "re2"])
+def test_regex_engine(ptt_df, engine):
+    from langkit import regexes
+    from langkit.pattern_loader import expression_engine
+
+    if engine == "re2":
+        re2 = pytest.importorskip("re2")
+    regexes.init(config=LangKitConfig(regex_engine=engine))
+    for group in regexes.pattern_loader.get_regex_groups():
+        for expression in group["expressions"]:
+            if engine == "re":
+                assert expression_engine(expression) == "re"
+                continue
+            try:
+                re2.compile(expression.pattern)
+                supported = True
+            except Exception:  # noqa
+                supported = False
+            # expressions re2 can't compile fall back to re
+            assert expression_engine(expression) == ("re2" if supported else "re")
+    result = why.log(ptt_df, schema=udf_schema())
+    fi_input_list = result.view().to_pandas()["frequent_items/frequent_strings"][
+        "prompt.has_patterns"
+    ]
+    assert set([x.value for x in fi_input_list]) == {
+        "credit card number",
+        "email address",
+        "SSN",
+        "phone number",
+        "mailing address",
+    }
+
+
+def test_unknown_regex_engine():
+    from langkit.pattern_loader import compile_expression
+
+    with pytest.raises(ValueError):
+        compile_expression("a+", engine="pcre")
+
+
+def test_profile_patterns(ptt_df):
+    from langkit.pattern_loader import PatternLoader
+
+    loader = PatternLoader(LangKitConfig())
+    texts = ptt_df["prompt"].to_list()
+    profiles = loader.profile(texts, time_budget=60.0)
+
+    assert len(profiles) == sum(
+        len(g["expressions"]) for g in loader.get_regex_groups()
+    )
+    assert profiles == sorted(profiles, key=lambda p: p.max_time, reverse=True)
+    for profile in profiles:
+        assert profile.engine == "re"
+        assert profile.total_time >= profile.max_time
+        assert profile.over_budget == []
+        assert set(profile.to_summary_dict().keys()) == {
+            "group",
+            "expression",
+            "engine",
+            "total_time",
+            "max_time",
+            "over_budget",
+        }
+
+
+def test_regex_time_budget():
+    from langkit import count_regexes, regexes
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, "user.json")
+        with open(json_path, "w") as file:
+            file.write(
+                json.dumps(
+                    [
+                        {"expressions": ["foo"], "name": "first_group"},
+                        {"expressions": ["bar"], "name": "second_group"},
+                    ]
+                )
+            )
+        regexes.init(config=LangKitConfig(pattern_file_path=json_path))
+        assert regexes.has_patterns("bar") == "second_group"
+
+        # with no time left after the first expression, the second one is skipped
+        config = LangKitConfig(pattern_file_path=json_path, regex_time_budget=0.0)
+        regexes.init(config=config)
+        assert regexes.has_patterns("bar") is None
+        count_regexes.init(config=config)
+        counts = count_regexes.wrapper("prompt")({"prompt": ["foo bar"]})
+        assert counts == {"first_group_count": [1], "second_group_count": [0]}
+    regexes.init(config=LangKitConfig())
+    count_regexes.init(config=LangKitConfig())
+
+
+def _write_groups(json_path, name, expression, mtime=None):
+    with open(json_path, "w") as file:
+        file.write(json.dumps([{"expressions": [expression], "name": name}]))
+    if mtime is not None:
+        os.utime(json_path, ns=(mtime, mtime))
+
+
+def test_reload_patterns_without_reregistering():
+    from langkit import regexes
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, "user.json")
+        _write_groups(json_path, "first_group", "foo", mtime=10**18)
+        regexes.init(pattern_file_path=json_path, config=LangKitConfig())
+        specs = udf_schema().multicolumn_udfs
+        assert regexes.has_patterns("foo bar") == "first_group"
+
+        assert not regexes.pattern_loader.reload()
+        _write_groups(json_path, "second_group", "bar", mtime=10**18 + 1)
+        assert regexes.pattern_loader.reload()
+        assert regexes.has_patterns("foo bar") == "second_group"
+        assert udf_schema().multicolumn_udfs == specs
+
+        with open(json_path, "w") as file:
+            file.write("[{not json")
+        assert not regexes.pattern_loader.reload(force=True)
+        assert regexes.has_patterns("foo bar") == "second_group"
+    regexes.init(config=LangKitConfig())
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        json.dumps([{"expressions": ["(unclosed"], "name": "broken"}]),
+        json.dumps([{"name": "no_expressions"}]),
+        json.dumps({"not": "a list"}),
+    ],
+)
+def test_reload_keeps_patterns_on_malformed_file(content):
+    from langkit.pattern_loader import PatternLoader
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, "user.json")
+        _write_groups(json_path, "first_group", "foo", mtime=10**18)
+        loader = PatternLoader(LangKitConfig(pattern_file_path=json_path))
+        groups = loader.get_regex_groups()
+        with open(json_path, "w") as file:
+            file.write(content)
+        assert not loader.reload(force=True)
+        assert loader.get_regex_groups() is groups
+
+
+def test_reloadable_loader_is_abstract():
+    from langkit.pattern_loader import _ReloadableLoader
+
+    with pytest.raises(TypeError):
+        _ReloadableLoader()
+
+
+def test_watch_patterns():
+    from langkit.pattern_loader import PatternLoader
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, "user.json")
+        _write_groups(json_path, "first_group", "foo", mtime=10**18)
+        loader = PatternLoader(LangKitConfig(pattern_file_path=json_path))
+        loader.watch(interval=0.01)
+        try:
+            _write_groups(json_path, "second_group", "bar", mtime=10**18 + 1)
+            deadline = time.time() + 5
+            while loader.get_regex_groups()[0]["name"] != "second_group":
+                assert time.time() < deadline
+                time.sleep(0.01)
+        finally:
+            loader.stop_watching()
+
+
+def test_compile_expression_flags():
+    import re
+
+    from langkit.pattern_loader import compile_expression
+
+    flags = re.IGNORECASE | re.MULTILINE | re.DOTALL
+    for engine in ["re", "re2"]:
+        expression = compile_expression("^[A-Z]\\d.b", engine, flags)
+        assert expression.search("x\na1\nb")
+        assert not compile_expression("[A-Z]\\d", engine).search("a1")
@@ -1,3 +1,5 @@
+from typing import List
+
 import pandas as pd
 import pytest
 from whylogs.experimental.core.udf_schema import udf_schema
@@ -49,3 +51,209 @@ def test_pandas_presidio_pii(prompts):
     assert result.shape == (6, 6)
     assert result["prompt.pii_presidio.entities_count"].to_list() == [2, 3, 5, 3, 3, 0]
     print(result)
+
+
+@pytest.mark.load
+def test_batched_presidio_pii_is_row_aligned(prompts):
+    from langkit import pii
+
+    pii.init(batch_size=2)
+    batched = pii.analyze_pii_batch(prompts)
+    assert batched == [pii.analyze_pii(prompt) for prompt in prompts]
+    pii.init()
+
+
+@pytest.mark.load
+def test_prefilter_skips_rows_without_candidates(prompts):
+    from langkit import LangKitConfig, pii
+
+    pii.init()
+    expected = pii.analyze_pii_batch(prompts + ["no personal data here"])
+
+    pii.init(config=LangKitConfig(pii_prefilter=True))
+    analyzed: List[str] = []
+    batch_analyzer = pii._get_batch_analyzer()
+    analyze_iterator = batch_analyzer.analyze_iterator
+
+    def spy(texts, **kwargs):
+        analyzed.extend(texts)
+        return analyze_iterator(texts=texts, **kwargs)
+
+    batch_analyzer.analyze_iterator = spy
+    try:
+        assert pii.analyze_pii_batch(prompts + ["no personal data here"]) == expected
+    finally:
+        batch_analyzer.analyze_iterator = analyze_iterator
+        pii.init()
+    assert "no personal data here" not in analyzed
+    assert "Hi, My name is John." not in analyzed
+
+
+@pytest.mark.load
+def test_prefilter_matches_like_presidio_regardless_of_case():
+    from langkit import LangKitConfig, pii
+
+    texts = [
+        "license a1234",
+        "my driver license is A1234",
+        "iban gb82west12345698765432",
+        "Iban Gb82WeSt12345698765432",
+        "medical license ab1234567",
+    ]
+    pii.init()
+    expected = pii.analyze_pii_batch(texts)
+    pii.init(config=LangKitConfig(pii_prefilter=True))
+    try:
+        assert pii.analyze_pii_batch(texts) == expected
+    finally:
+        pii.init()
+    assert expected[0][1] == 1
+
+
+@pytest.mark.load
+def test_prefilter_always_analyzes_entities_without_expressions():
+    from langkit import LangKitConfig, pii
+
+    pii.init(config=LangKitConfig(pii_prefilter=True))
+    assert not pii.needs_analysis("Hi, My name is John.", ["US_SSN"])
+    assert pii.needs_analysis("Hi, My name is John.", ["US_SSN", "PERSON"])
+    assert pii.needs_analysis("Hi, My name is John.", None)
+    pii.init()
+
+
+@pytest.mark.load
+def test_analyzer_is_built_lazily_for_configured_entities():
+    import json
+    import os
+    import tempfile
+
+    from langkit import pii
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        entities_path = os.path.join(temp_dir, "entities.json")
+        with open(entities_path, "w") as file:
+            file.write(json.dumps({"entities": ["PHONE_NUMBER", "US_PASSPORT"]}))
+        pii.init(entities_file_path=entities_path)
+        analyzer = pii._get_analyzer()
+    supported = set()
+    for recognizer in analyzer.registry.recognizers:
+        supported.update(recognizer.supported_entities)
+    assert supported == {"PHONE_NUMBER", "US_PASSPORT"}
+    assert "ner" in pii._excluded_pipes(["PHONE_NUMBER", "US_PASSPORT"])
+    assert "ner" not in pii._excluded_pipes(["PHONE_NUMBER", "PERSON"])
+    assert "ner" not in pii._excluded_pipes(None)
+    pii.init()
+    assert pii._get_analyzer() is not analyzer
+
+
+@pytest.mark.load
+def test_entities_reload_builds_the_analyzer_before_the_swap(tmp_path):
+    import json
+
+    from langkit import pii
+
+    path = tmp_path / "entities.json"
+    path.write_text(json.dumps({"entities": ["PHONE_NUMBER"]}))
+    pii.init(entities_file_path=str(path))
+    try:
+        before = pii._get_analyzer()
+        path.write_text(json.dumps({"entities": ["PHONE_NUMBER", "US_SSN"]}))
+        built = []
+        prepare = pii.entity_loader.prepare
+
+        def spy(entities):
+            built.append(pii.entity_loader.get_entities())
+            return prepare(entities)
+
+        pii.entity_loader.prepare = spy
+        assert pii.entity_loader.reload(force=True)
+        # built on the reloading thread while the old entities were still current
+        assert built == [["PHONE_NUMBER"]]
+        after = pii._get_analyzer()
+        assert after is not before
+        assert after.nlp_engine is before.nlp_engine
+        assert "US_SSN" in after.get_supported_entities(language="en")
+    finally:
+        pii.init()
+
+
+@pytest.mark.load
+def test_warmup_builds_the_analyzer(monkeypatch):
+    import langkit
+    from langkit import pii
+
+    pii.init()
+    monkeypatch.setattr(pii, "_analyzers", {})
+    langkit.warmup()
+    key = pii._analyzer_key(pii.entity_loader.get_entities())
+    assert key in pii._analyzers
+
+
+@pytest.mark.load
+def test_compact_presidio_pii_output(prompts):
+    from langkit import LangKitConfig, extract, pii
+
+    pii.init(config=LangKitConfig(pii_output="counts", pii_output_spans=True))
+    data = pd.DataFrame({"prompt": prompts, "response": prompts})
+    result = extract(data, schema=udf_schema())
+    pii.init()
+
+    assert "prompt.pii_presidio.result" not in result.columns
+    assert result["prompt.pii_presidio.entities_count"].to_list() == [2, 3, 5, 3, 3, 0]
+    assert result["prompt.pii_presidio.CREDIT_CARD_count"].to_list()[0] == 1
+    assert result["prompt.pii_presidio.CRYPTO_count"].to_list()[0] == 1
+    assert result["prompt.pii_presidio.US_SSN_count"].to_list()[-1] == 0
+    spans = result["prompt.pii_presidio.spans"].to_list()
+    assert [len(row) for row in spans] == [2, 3, 5, 3, 3, 0]
+    assert {span["type"] for span in spans[0]} == {"CREDIT_CARD", "CRYPTO"}
+    assert all(isinstance(span["start"], int) for span in spans[0])
+
+
+@pytest.mark.load
+def test_compact_presidio_pii_output_row(prompts):
+    from langkit import LangKitConfig, extract, pii
+
+    pii.init(config=LangKitConfig(pii_output="counts"))
+    result = extract({"prompt": prompts[0], "response": prompts[-1]})
+    pii.init()
+
+    assert result["prompt.pii_presidio.entities_count"] == 2
+    assert result["prompt.pii_presidio.CRYPTO_count"] == 1
+    assert result["response.pii_presidio.entities_count"] == 0
+    assert "prompt.pii_presidio.spans" not in result
+
+
+def _result(entity_type, start, end):
+    from presidio_analyzer import RecognizerResult
+
+    return RecognizerResult(entity_type, start, end, 0.9)
+
+
+def test_compact_columns_are_fixed_by_entities(monkeypatch):
+    from langkit import pii
+
+    monkeypatch.setattr(pii, "_output_spans", True)
+    analyzed = [[_result("US_SSN", 0, 11)], []]
+    columns = pii._compact_columns(analyzed, ["US_SSN", "PHONE_NUMBER"], True)
+    assert columns["US_SSN_count"] == [1, 0]
+    assert columns["PHONE_NUMBER_count"] == [0, 0]
+    empty = pii._compact_columns([[], []], ["US_SSN", "PHONE_NUMBER"], True)
+    assert set(empty) == set(columns)
+    assert isinstance(columns["spans"], pd.Series)
+
+    # without arrow-backed arrays in pandas, the spans are plain lists
+    monkeypatch.delattr(pd.arrays, "ArrowExtensionArray")
+    columns = pii._compact_columns(analyzed, ["US_SSN"], True)
+    assert columns["spans"][0] == [
+        {"type": "US_SSN", "start": 0, "end": 11, "score": pytest.approx(0.9)}
+    ]
+    assert pd.DataFrame(columns)["spans"].to_list()[1] == []
+
+
+@pytest.mark.load
+def test_compact_columns_without_entities():
+    from langkit import pii
+
+    supported = pii._get_analyzer().get_supported_entities(language="en")
+    columns = pii._compact_columns([[]], None, False)
+    assert set(columns) == {"entities_count"} | {f"{e}_count" for e in supported}
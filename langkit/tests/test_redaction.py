@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+
+def test_merge_spans():
+    from langkit.redaction import merge_spans
+
+    spans = [(10, 20, "B"), (0, 5, "A"), (3, 8, "C"), (15, 25, "D"), (30, 31, "E")]
+    assert merge_spans(spans) == [(0, 8, "A"), (10, 25, "B"), (30, 31, "E")]
+    assert merge_spans([(0, 5, "A"), (5, 9, "B")]) == [(0, 5, "A"), (5, 9, "B")]
+    assert merge_spans([(2, 4, "short"), (2, 9, "long")]) == [(2, 9, "long")]
+    assert merge_spans([]) == []
+
+
+def test_redact_patterns_only():
+    from langkit import redaction
+
+    redaction.init(use_presidio=False)
+    df = pd.DataFrame(
+        {
+            "prompt": ["my ssn is 856-45-6789", "no patterns here."],
+            "response": ["write to anemail@address.com", ""],
+        }
+    )
+    result = redaction.redact(df)
+
+    assert result["prompt.redacted"].to_list() == [
+        "my ssn is <SSN>",
+        "no patterns here.",
+    ]
+    assert result["response.redacted"].to_list() == ["write to <email address>", ""]
+    assert result["prompt.redacted_spans"].to_list()[0] == [
+        {"type": "SSN", "start": 10, "end": 21}
+    ]
+    assert "prompt.redacted" not in df.columns
+
+
+def test_redact_row_and_stream():
+    from langkit import redaction
+
+    redaction.init(use_presidio=False, replacement="[{type}]")
+    row = redaction.redact({"prompt": "call me at (206) 555-1212"}, columns=["prompt"])
+    assert row["prompt.redacted"] == "call me at [phone number]"
+
+    rows = [{"prompt": f"ssn - 702-02-99{i:02d}", "response": "ok"} for i in range(5)]
+    redacted = list(redaction.redact_stream(iter(rows), batch_size=2))
+    assert [r["prompt.redacted"] for r in redacted] == ["ssn - [SSN]"] * 5
+    assert [r["response.redacted"] for r in redacted] == ["ok"] * 5
+    redaction.init()
+
+
+def test_redact_invalid_input():
+    from langkit import redaction
+
+    with pytest.raises(ValueError):
+        redaction.redact(["not", "supported"])  # type: ignore
+
+
+@pytest.mark.load
+def test_redact_with_presidio():
+    from langkit import redaction
+
+    redaction.init()
+    row = redaction.redact(
+        {
+            "prompt": "My phone number: (212) 555-1234 and my crypto wallet id is "
+            "16Yeky6GMjeNkAiNcBY7ZhrLoMSgg1BoyZ."
+        }
+    )
+    assert "555-1234" not in row["prompt.redacted"]
+    assert "16Yeky6GMjeNkAiNcBY7ZhrLoMSgg1BoyZ" not in row["prompt.redacted"]
+    types = {span["type"] for span in row["prompt.redacted_spans"]}
+    assert "CRYPTO" in types
+
+
+def test_redact_reuses_has_patterns_matches(monkeypatch):
+    from langkit import extract, intermediates, pattern_loader, redaction, regexes
+
+    regexes.init()
+    redaction.init(use_presidio=False)
+    calls = []
+    find_spans = pattern_loader.find_spans
+
+    def counted(regex_groups, text, time_budget=None):
+        calls.append(text)
+        return find_spans(regex_groups, text, time_budget)
+
+    monkeypatch.setattr(pattern_loader, "find_spans", counted)
+    df = pd.DataFrame({"prompt": ["my ssn is 856-45-6789", "no patterns here."]})
+    with intermediates.batch_scope():
+        enhanced = extract(df)
+        result = redaction.redact(df, columns=["prompt"])
+
+    assert enhanced["prompt.has_patterns"].to_list() == ["SSN", None]
+    assert result["prompt.redacted"].to_list() == [
+        "my ssn is <SSN>",
+        "no patterns here.",
+    ]
+    assert sorted(calls) == sorted(df["prompt"])
+    redaction.init()
@@ -0,0 +1,133 @@
+import json
+
+import pandas as pd
+import pytest
+from whylogs.experimental.core.udf_schema import udf_schema
+
+from langkit import extract, models, result_cache
+from langkit.instrumentation import (
+    register_dataset_udf,
+    register_multioutput_udf,
+    stats,
+    timed_init,
+)
+
+_SCHEMA = "result_cache_test"
+_calls = []
+_suffix = ""
+
+
+@timed_init
+def init(suffix: str = ""):
+    global _suffix
+    _suffix = suffix
+
+
+@register_dataset_udf(["prompt"], "prompt.tagged", schema_name=_SCHEMA)
+def _tagged(text):
+    _calls.extend(text["prompt"])
+    return [str(t) + _suffix for t in text["prompt"]]
+
+
+@register_multioutput_udf(["prompt"], "prompt.split", schema_name=_SCHEMA)
+def _split(text):
+    return {
+        "head": [str(t)[:1] for t in text["prompt"]],
+        "tail": [str(t)[1:] for t in text["prompt"]],
+    }
+
+
+@pytest.fixture
+def schema():
+    init()
+    _calls.clear()
+    result_cache.enable()
+    yield udf_schema(schema_name=_SCHEMA)
+    result_cache.disable()
+
+
+def test_only_unseen_rows_are_computed(schema):
+    first = extract(pd.DataFrame({"prompt": ["a", "b"]}), schema=schema)
+    second = extract(pd.DataFrame({"prompt": ["b", "c", "a"]}), schema=schema)
+    assert _calls == ["a", "b", "c"]
+    assert list(first["prompt.tagged"]) == ["a", "b"]
+    assert list(second["prompt.tagged"]) == ["b", "c", "a"]
+    assert list(second["prompt.split.head"]) == ["b", "c", "a"]
+    assert extract({"prompt": "c"}, schema=schema)["prompt.tagged"] == "c"
+    assert _calls == ["a", "b", "c"]
+    assert stats()["caches"]["results"]["hits"] > 0
+
+
+def test_init_with_new_arguments_invalidates(schema):
+    extract({"prompt": "a"}, schema=schema)
+    init(suffix="!")
+    assert extract({"prompt": "a"}, schema=schema)["prompt.tagged"] == "a!"
+    init()
+    assert extract({"prompt": "a"}, schema=schema)["prompt.tagged"] == "a"
+    assert _calls == ["a", "a"]
+
+
+def test_ttl_and_size_bounds(schema, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    result_cache.enable(ttl_seconds=10)
+    extract({"prompt": "a"}, schema=schema)
+    extract({"prompt": "a"}, schema=schema)
+    assert _calls == ["a"]
+    now[0] += 11
+    extract({"prompt": "a"}, schema=schema)
+    assert _calls == ["a", "a"]
+    # every UDF of the schema stores an entry per row: leave room for a single row
+    entries_per_row = result_cache.cache_info()[2]
+    result_cache.enable(max_entries=entries_per_row)
+    for prompt in ["a", "b", "a"]:
+        extract({"prompt": prompt}, schema=schema)
+    assert _calls == ["a", "a", "a", "b", "a"]
+
+
+def test_disk_tier_is_shared(schema, tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    result_cache.enable(disk_path=path)
+    extract({"prompt": "a"}, schema=schema)
+    # a fresh in-memory cache, as in another process
+    result_cache.enable(disk_path=path)
+    assert extract({"prompt": "a"}, schema=schema)["prompt.tagged"] == "a"
+    assert _calls == ["a"]
+
+
+def test_excluded_and_non_text_rows_are_computed(schema):
+    result_cache.enable(exclude=["prompt.tagged"])
+    extract({"prompt": "a"}, schema=schema)
+    extract({"prompt": "a"}, schema=schema)
+    assert _calls == ["a", "a"]
+    result_cache.enable()
+    assert extract({"prompt": 5}, schema=schema)["prompt.tagged"] == "5"
+    extract({"prompt": 5}, schema=schema)
+    assert _calls == ["a", "a", 5, 5]
+
+
+def test_model_override_invalidates(schema):
+    extract({"prompt": "a"}, schema=schema)
+    models.override("result_cache_test_model", "numpy", lambda key: None)
+    models.override("result_cache_test_model", "numpy", None)
+    extract({"prompt": "a"}, schema=schema)
+    assert _calls == ["a", "a"]
+
+
+def test_pattern_reload_invalidates(tmp_path):
+    from langkit import regexes
+
+    path = tmp_path / "patterns.json"
+    path.write_text(json.dumps([{"name": "digits", "expressions": [r"\d+"]}]))
+    regexes.init(pattern_file_path=str(path))
+    schema = udf_schema()
+    result_cache.enable()
+    try:
+        row = {"prompt": "abc 123"}
+        assert extract(row, schema=schema)["prompt.has_patterns"] == "digits"
+        path.write_text(json.dumps([{"name": "letters", "expressions": ["[a-z]+"]}]))
+        assert regexes.pattern_loader.reload(force=True)
+        assert extract(row, schema=schema)["prompt.has_patterns"] == "letters"
+    finally:
+        result_cache.disable()
+        regexes.init()
@@ -0,0 +1,173 @@
+import json
+
+import pandas as pd
+import pytest
+from whylogs.experimental.core.udf_schema import udf_schema
+
+from langkit import LangKitConfig, extract, sampling
+from langkit.instrumentation import register_dataset_udf, register_multioutput_udf
+
+_SCHEMA = "sampling_test"
+_computed = []
+
+
+@register_dataset_udf(["prompt"], "prompt.length", schema_name=_SCHEMA)
+def _length(text):
+    _computed.extend(text["prompt"])
+    return [len(t) for t in text["prompt"]]
+
+
+@register_dataset_udf(
+    ["prompt", "response"], "response.length_ratio", schema_name=_SCHEMA
+)
+def _length_ratio(text):
+    return [len(r) / len(p) for p, r in zip(text["prompt"], text["response"])]
+
+
+@register_multioutput_udf(["response"], "response.counts", schema_name=_SCHEMA)
+def _counts(text):
+    return {
+        "words": [len(t.split()) for t in text["response"]],
+        "chars": [len(t) for t in text["response"]],
+    }
+
+
+def _listed(text):
+    return {"upper": [t.upper() for t in text["prompt"]]}
+
+
+_listed.outputs = lambda: ["upper"]  # type: ignore
+register_multioutput_udf(["prompt"], "prompt.listed", schema_name=_SCHEMA)(_listed)
+
+
+@pytest.fixture
+def rates():
+    def use(**metric_sample_rates):
+        sampling.init(LangKitConfig(metric_sample_rates=metric_sample_rates))
+
+    yield use
+    sampling.init()
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "prompt": [f"prompt number {i}" for i in range(200)],
+            "response": [f"response {i}" for i in range(200)],
+        }
+    )
+
+
+def _sampled(values):
+    return set(values[values.notna()].index)
+
+
+def test_sampling_is_deterministic_and_consistent(rates, df):
+    rates(**{"prompt.length": 0.5, "response.length_ratio": 0.5})
+    _computed.clear()
+    result = extract(df, schema=udf_schema(schema_name=_SCHEMA))
+    sampled = _sampled(result["prompt.length"])
+    assert 60 < len(sampled) < 140
+    assert len(_computed) == len(sampled)
+    assert sampled == {
+        i for i, key in enumerate(sampling.row_keys(df)) if sampling.fraction(key) < 0.5
+    }
+    assert _sampled(result["response.length_ratio"]) == sampled
+    for i in sampled:
+        assert result["prompt.length"][i] == len(df["prompt"][i])
+    again = extract(df, schema=udf_schema(schema_name=_SCHEMA))
+    assert _sampled(again["prompt.length"]) == sampled
+
+    rates(**{"prompt.length": 0.2})
+    smaller = _sampled(
+        extract(df, schema=udf_schema(schema_name=_SCHEMA))["prompt.length"]
+    )
+    assert smaller < sampled
+
+
+def test_sampling_multioutput_and_extremes(rates, df):
+    rates(**{"response.counts": 0.5, "prompt.length": 0})
+    result = extract(df, schema=udf_schema(schema_name=_SCHEMA))
+    assert result["prompt.length"].isna().all()
+    assert _sampled(result["response.counts.words"]) == {
+        i for i, key in enumerate(sampling.row_keys(df)) if sampling.fraction(key) < 0.5
+    }
+    assert _sampled(result["response.counts.chars"]) == _sampled(
+        result["response.counts.words"]
+    )
+    assert result["response.length_ratio"].notna().all()
+
+    # with no row sampled, the outputs are those of the last result
+    rates(**{"response.counts": 0})
+    result = extract(df, schema=udf_schema(schema_name=_SCHEMA))
+    assert result["response.counts.words"].isna().all()
+    assert result["response.counts.chars"].isna().all()
+
+
+@pytest.mark.parametrize("max_workers", [None, 4])
+def test_prompt_and_response_metrics_sample_the_same_rows(rates, df, max_workers):
+    rates(**{"prompt.length": 0.5, "response.counts": 0.5})
+    result = extract(
+        df, schema=udf_schema(schema_name=_SCHEMA), max_workers=max_workers
+    )
+    sampled = _sampled(result["prompt.length"])
+    assert 0 < len(sampled) < len(df)
+    assert _sampled(result["response.counts.words"]) == sampled
+    for i in range(len(df)):
+        row = extract(df.iloc[i].to_dict(), schema=udf_schema(schema_name=_SCHEMA))
+        assert (row["prompt.length"] is None) == (i not in sampled)
+        assert (row["response.counts.words"] is None) == (i not in sampled)
+
+
+def test_parallel_schema_samples_the_same_rows(rates, df):
+    from langkit.parallel import ParallelUdfSchema
+
+    rates(**{"prompt.length": 0.5, "response.counts": 0.5})
+    schema = ParallelUdfSchema(udf_schema(schema_name=_SCHEMA), max_workers=4)
+    result, _ = schema.apply_udfs(pandas=df)
+    sampled = _sampled(result["prompt.length"])
+    assert 0 < len(sampled) < len(df)
+    assert _sampled(result["response.counts.words"]) == sampled
+
+
+def test_unsampled_multioutput_udf_keeps_its_listed_outputs(rates, df):
+    rates(**{"prompt.listed": 0})
+    result = extract(df, schema=udf_schema(schema_name=_SCHEMA))
+    assert result["prompt.listed.upper"].isna().all()
+    row = extract(df.iloc[0].to_dict(), schema=udf_schema(schema_name=_SCHEMA))
+    assert "prompt.listed.upper" in row and row["prompt.listed.upper"] is None
+
+
+def test_scorer_and_guardrail_ignore_sample_rates(rates):
+    from langkit.guardrails import Guardrail, Policy
+    from langkit.scorer import RowScorer
+
+    rates(**{"prompt.length": 0, "prompt.listed": 0})
+    schema = udf_schema(schema_name=_SCHEMA)
+    row = {"prompt": "a long prompt", "response": "ok"}
+    assert extract(row, schema=schema)["prompt.length"] is None
+    scored = RowScorer(schema)(row)
+    assert scored["prompt.length"] == 13
+    assert scored["prompt.listed.upper"] == "A LONG PROMPT"
+    verdict = Guardrail([Policy("prompt.length", above=5)], schema)(row)
+    assert verdict.blocked
+
+
+def test_sampling_rates_in_metadata(rates):
+    from langkit import light_metrics
+    from langkit.metadata import _LANGKIT_SAMPLE_RATES_KEY
+
+    schema = light_metrics.init(LangKitConfig(metric_sample_rates={"textstat": 0.1}))
+    assert json.loads(schema.metadata[_LANGKIT_SAMPLE_RATES_KEY]) == {"textstat": 0.1}
+    result = extract(
+        pd.DataFrame({"prompt": [f"a prompt {i}" for i in range(50)]}), schema=schema
+    )
+    assert result["prompt.flesch_reading_ease"].isna().any()
+    assert result["prompt.flesch_reading_ease"].notna().any()
+    assert light_metrics.init().metadata.get(_LANGKIT_SAMPLE_RATES_KEY) is None
+
+
+def test_sampling_rejects_invalid_rates(rates):
+    with pytest.raises(ValueError):
+        rates(**{"topics": 1.5})
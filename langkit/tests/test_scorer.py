@@ -0,0 +1,50 @@
+import pytest
+from whylogs.core.datatypes import Fractional
+from whylogs.experimental.core.udf_schema import (
+    register_dataset_udf,
+    register_type_udf,
+    udf_schema,
+)
+
+from langkit import extract
+from langkit.scorer import RowScorer
+
+_SCHEMA = "scorer_test"
+
+
+@register_dataset_udf(["prompt"], "prompt.length", schema_name=_SCHEMA)
+def _length(text):
+    return [len(t) for t in text["prompt"]]
+
+
+@register_dataset_udf(["prompt"], "prompt.broken", schema_name=_SCHEMA)
+def _broken(text):
+    raise ValueError("broken")
+
+
+@register_type_udf(Fractional, "doubled", schema_name=_SCHEMA)
+def _doubled(values):
+    return [2 * value for value in values]
+
+
+@pytest.fixture
+def schema():
+    return udf_schema(schema_name=_SCHEMA)
+
+
+def test_scorer_matches_extract(schema):
+    row = {"prompt": "Hello, world!", "response": "Hi", "score": 1.5}
+    scored = RowScorer(schema)(row)
+    assert scored == extract(dict(row), schema=schema)
+    assert scored["prompt.length"] == 13
+    assert scored["prompt.broken"] is None
+    assert scored["score.doubled"] == 3.0
+
+
+def test_scorer_reuses_plans_per_row_shape(schema):
+    scorer = RowScorer(schema)
+    first = scorer.steps({"prompt": "a", "score": 1.0})
+    assert scorer.steps({"prompt": "b", "score": 2.0}) is first
+    assert scorer.steps({"prompt": "c"}) is not first
+    assert scorer({"prompt": "abc"})["prompt.length"] == 3
+    assert "score.doubled" not in scorer({"prompt": "abc"})
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+import whylogs as why
+from whylogs.experimental.core.udf_schema import udf_schema
+
+from langkit.sharded import profile_sharded
+
+
+def test_profile_sharded_matches_single_process():
+    from langkit import textstat
+
+    textstat.init()
+    schema = udf_schema()
+    df = pd.DataFrame({"prompt": [f"I love you {i} times." for i in range(10)]})
+    view, enhanced = profile_sharded(
+        df,
+        modules=["textstat"],
+        num_workers=2,
+        num_shards=3,
+        return_enhanced=True,
+        start_method="fork",
+    )
+    expected = why.log(df, schema=schema).view()
+    column = "prompt.lexicon_count"
+    assert (
+        view.get_column(column).get_metric("counts").n.value
+        == expected.get_column(column).get_metric("counts").n.value
+    )
+    assert view.get_column(column).get_metric(
+        "distribution"
+    ).mean.value == pytest.approx(
+        expected.get_column(column).get_metric("distribution").mean.value
+    )
+    assert list(enhanced["prompt"]) == list(df["prompt"])
+
+
+def test_profile_sharded_with_config_and_module_without_config():
+    from langkit import LangKitConfig
+
+    df = pd.DataFrame({"prompt": ["I love you.", "I hate you."]})
+    view, _ = profile_sharded(
+        df,
+        modules=["textstat", "vader_sentiment"],
+        config=LangKitConfig(),
+        num_workers=1,
+        start_method="fork",
+    )
+    assert view.get_column("prompt.lexicon_count") is not None
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from langkit import models, snapshot
+
+
+def test_snapshot_restores_reference_matrices(tmp_path):
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    key = models.acquire("test_matrix", "numpy", "cpu", lambda: matrix)
+    models.load_key(key)
+    manifest = snapshot.save(str(tmp_path), modules=[])
+    assert {"model_id": "test_matrix", "backend": "numpy"}.items() <= next(
+        entry for entry in manifest["models"] if entry["model_id"] == "test_matrix"
+    ).items()
+
+    models.release(key)
+    models.evict(key)
+    try:
+        assert snapshot.restore(str(tmp_path)) == ["test_matrix"]
+
+        def unavailable():
+            raise AssertionError("should load from the snapshot")
+
+        restored = models.load("test_matrix", "numpy", "cpu", unavailable)
+        assert isinstance(restored, np.memmap)
+        np.testing.assert_array_equal(restored, matrix)
+    finally:
+        models.override("test_matrix", "numpy", None)
+        models.evict(key)
+
+
+def test_restore_needs_a_manifest(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        snapshot.restore(str(tmp_path))
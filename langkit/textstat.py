@@ -1,7 +1,7 @@
 from logging import getLogger
 from typing import Callable, Dict, List, Optional, Tuple, Union
 from whylogs.core.stubs import pd
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 from langkit import LangKitConfig, prompt_column, response_column
 
 
@@ -42,11 +42,10 @@ _udfs_to_register: List[Union[Tuple[str, str], Tuple[str, str, str]]] = [
 def wrapper(
     stat_name: str, column: str
 ) -> Callable[[Union[pd.DataFrame, Dict[str, List]]], Union[pd.Series, List]]:
-    import textstat
-
-    stat = textstat.textstat.__getattribute__(stat_name)
-
     def wrappee(text: Union[pd.DataFrame, Dict[str, List]]) -> Union[pd.Series, List]:
+        import textstat
+
+        stat = textstat.textstat.__getattribute__(stat_name)
         return [stat(input) for input in text[column]]
 
     return wrappee
@@ -55,16 +54,16 @@ def wrapper(
 def aggregate_wrapper(
     column: str,
 ) -> Callable[[Union[pd.DataFrame, Dict[str, List]]], Union[pd.Series, List]]:
-    import textstat
-
-    stat = textstat.textstat.text_standard
-
     def wrappee(text: Union[pd.DataFrame, Dict[str, List]]) -> Union[pd.Series, List]:
+        import textstat
+
+        stat = textstat.textstat.text_standard
         return [stat(input, float_output=True) for input in text[column]]
 
     return wrappee
 
 
+@timed_init
 def init(config: Optional[LangKitConfig] = None):
     pass
 
@@ -1,16 +1,18 @@
 import json
 from copy import deepcopy
 from logging import getLogger
-from typing import Callable, Optional, Dict, List
+from typing import TYPE_CHECKING, Callable, Optional, Dict, List
 
-from sentence_transformers import util
-from torch import Tensor
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 
+from langkit import intermediates
 from langkit.transformer import Encoder
 
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
 
+if TYPE_CHECKING:
+    from torch import Tensor
+
 diagnostic_logger = getLogger(__name__)
 
 _transformer_model = None
@@ -23,21 +25,23 @@ _embeddings_map: Dict[str, List] = {}
 
 def create_similarity_function(group: str, column: str):
     def similarity_by_group(text):
-        result = []
-        for input in text[column]:
-            score = group_similarity(input, group)
-            result.append(score)
-        return result
+        if _transformer_model is None:
+            raise ValueError("Must initialize a transformer before calling encode!")
+        embeddings = _transformer_model.encode_each(list(text[column]))
+        return [_embedding_group_similarity(e, group) for e in embeddings]
 
     return similarity_by_group
 
 
 def group_similarity(text: str, group):
-    similarities: List[float] = []
     if _transformer_model is None:
         raise ValueError("Must initialize a transformer before calling encode!")
 
-    text_embedding = _transformer_model.encode(text)
+    return _embedding_group_similarity(_transformer_model.encode(text), group)
+
+
+def _embedding_group_similarity(text_embedding, group):
+    similarities: List[float] = []
     _cache_embeddings_map(group)
     for embedding in _embeddings_map.get(group, []):
         similarity = get_embeddings_similarity(text_embedding, embedding)
@@ -70,6 +74,7 @@ def _register_theme_udfs():
             if group == "refusal" and column == _prompt:
                 continue
             udf_name = f"{column}.{group}_similarity"
+            intermediates.declare(udf_name, _transformer_model.artifact)
             if udf_name not in _registered:
                 _registered.add(udf_name)
                 register_dataset_udf([column], udf_name=udf_name)(
@@ -93,6 +98,7 @@ def load_themes(json_path: str, encoding="utf-8"):
     return None
 
 
+@timed_init
 def init(
     transformer_name: Optional[str] = None,
     custom_encoder: Optional[Callable] = None,
@@ -105,6 +111,8 @@ def init(
     global _theme_groups
     if not transformer_name and not custom_encoder:
         transformer_name = config.transformer_name
+    if _transformer_model is not None:
+        _transformer_model.release()
     _transformer_model = Encoder(transformer_name, custom_encoder)
     if theme_file_path is not None and theme_json is not None:
         raise ValueError("Cannot specify both theme_file_path and theme_json")
@@ -119,7 +127,18 @@ def init(
     _register_theme_udfs()
 
 
-def get_subject_similarity(text: str, comparison_embedding: Tensor) -> float:
+def warmup() -> None:
+    """Loads the transformer model and encodes the theme examples ahead of the first call."""
+    if _transformer_model is None:
+        raise ValueError("Must initialize a transformer before calling encode!")
+    _transformer_model.warmup()
+    for group in _theme_groups or {}:
+        _cache_embeddings_map(group)
+
+
+def get_subject_similarity(text: str, comparison_embedding: "Tensor") -> float:
+    from sentence_transformers import util
+
     if _transformer_model is None:
         raise ValueError("Must initialize a transformer before calling encode!")
     embedding = _transformer_model.encode(text)
@@ -128,8 +147,10 @@ def get_subject_similarity(text: str, comparison_embedding: Tensor) -> float:
 
 
 def get_embeddings_similarity(
-    text_embedding: Tensor, comparison_embedding: Tensor
+    text_embedding: "Tensor", comparison_embedding: "Tensor"
 ) -> float:
+    from sentence_transformers import util
+
     if _transformer_model is None:
         raise ValueError("Must initialize a transformer before calling encode!")
     similarity = util.pytorch_cos_sim(text_embedding, comparison_embedding)
@@ -1,27 +1,43 @@
 from copy import deepcopy
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 from typing import Callable, List, Optional
-from transformers import (
-    pipeline,
-)
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
+from langkit import models
+from langkit.models import ModelKey
+from langkit.utils import _require, _use_cuda
 
-import os
-import torch
-
-_USE_CUDA = torch.cuda.is_available() and not bool(
-    os.environ.get("LANGKIT_NO_CUDA", False)
-)
-_device = 0 if _USE_CUDA else -1
+_require(__name__, "torch", "transformers")
 
 
 _topics: List[str] = lang_config.topics
 
-_model_path: str = lang_config.topic_model_path
-_classifier = pipeline(lang_config.topic_classifier, model=_model_path, device=_device)
+# loaded from the registry on first use, or by warmup()
+_classifier = None
+_classifier_key: Optional[ModelKey] = None
+
+
+def _load_classifier(topic_classifier: str, model_path: str):
+    def load():
+        from transformers import pipeline
+
+        return pipeline(
+            topic_classifier, model=model_path, device=0 if _use_cuda() else -1
+        )
+
+    return load
+
+
+def warmup() -> None:
+    """Loads the topic classifier now rather than on the first scored row."""
+    global _classifier
+    if _classifier_key is None:
+        raise ValueError("topics: init() must be called before warmup()")
+    _classifier = models.load_key(_classifier_key)
 
 
 def closest_topic(text):
+    if _classifier is None:
+        warmup()
     return _classifier(text, _topics, multi_label=False)["labels"][0]
 
 
@@ -29,6 +45,7 @@ def _wrapper(column: str) -> Callable:
     return lambda text: [closest_topic(t) for t in text[column]]
 
 
+@timed_init
 def init(
     topics: Optional[List[str]] = None,
     model_path: Optional[str] = None,
@@ -36,11 +53,18 @@ def init(
     config: Optional[LangKitConfig] = None,
 ):
     config = config or deepcopy(lang_config)
-    global _topics, _classifier
+    global _topics, _classifier, _classifier_key
     _topics = topics or config.topics
     topic_classifier = topic_classifier or lang_config.topic_classifier
     model_path = model_path or config.topic_model_path
-    _classifier = pipeline(topic_classifier, model=model_path, device=_device)
+    models.release(_classifier_key)
+    _classifier_key = models.acquire(
+        model_path,
+        f"transformers.pipeline:{topic_classifier}",
+        models.DEFAULT_DEVICE,
+        _load_classifier(topic_classifier, model_path),
+    )
+    _classifier = None
     for column in [prompt_column, response_column]:
         register_dataset_udf([column], udf_name=f"{column}.closest_topic")(
             _wrapper(column)
@@ -1,44 +1,52 @@
 from copy import deepcopy
-from typing import Optional
-from functools import lru_cache
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from typing import TYPE_CHECKING, Callable, Optional
+from langkit.instrumentation import register_dataset_udf, timed_init
+from langkit import models
 from langkit import LangKitConfig, lang_config, prompt_column, response_column
-import os
-import torch
-from transformers import (
-    AutoModelForSequenceClassification,
-    AutoTokenizer,
-    TextClassificationPipeline,
-)
-
-_USE_CUDA = torch.cuda.is_available() and not bool(
-    os.environ.get("LANGKIT_NO_CUDA", False)
-)
-_device = 0 if _USE_CUDA else -1
+from langkit.utils import _require, _use_cuda
+
+if TYPE_CHECKING:
+    from transformers import TextClassificationPipeline
+
+_require(__name__, "torch", "transformers")
 
 _prompt = prompt_column
 _response = response_column
 
 
-@lru_cache(maxsize=None)
-def _get_tokenizer(model_path: str):
-    return AutoTokenizer.from_pretrained(model_path)
+_PIPELINE_BACKEND = "transformers.pipeline:text-classification"
+
+
+def _load_pipeline(model_path: str) -> Callable[[], "TextClassificationPipeline"]:
+    def load():
+        from transformers import (
+            AutoModelForSequenceClassification,
+            AutoTokenizer,
+            TextClassificationPipeline,
+        )
 
+        return TextClassificationPipeline(
+            model=AutoModelForSequenceClassification.from_pretrained(model_path),
+            tokenizer=AutoTokenizer.from_pretrained(model_path),
+            device=0 if _use_cuda() else -1,
+        )
 
-@lru_cache(maxsize=None)
-def _get_model(model_path: str):
-    return AutoModelForSequenceClassification.from_pretrained(model_path)
+    return load
 
 
-@lru_cache(maxsize=None)
-def _get_pipeline(model_path: str):
-    return TextClassificationPipeline(
-        model=_get_model(model_path),
-        tokenizer=_get_tokenizer(model_path),
-        device=_device,
+def _get_pipeline(model_path: str) -> "TextClassificationPipeline":
+    return models.load(
+        model_path,
+        _PIPELINE_BACKEND,
+        models.DEFAULT_DEVICE,
+        _load_pipeline(model_path),
     )
 
 
+def _get_tokenizer(model_path: str):
+    return _get_pipeline(model_path).tokenizer
+
+
 _toxicity_model: Optional["ToxicityModel"] = None
 
 
@@ -46,12 +54,21 @@ class ToxicityModel:
     def predict(self, text: str) -> float:
         raise NotImplementedError("Subclasses must implement the predict method")
 
+    def warmup(self) -> None:
+        pass
+
 
 class DetoxifyModel(ToxicityModel):
     def __init__(self, model_name: str):
         from detoxify import Detoxify
 
-        self.detox_model = Detoxify(model_name)
+        self.model_key = models.acquire(
+            model_name, "detoxify", "cpu", lambda: Detoxify(model_name)
+        )
+        self.detox_model = models.load_key(self.model_key)
+
+    def release(self) -> None:
+        models.release(self.model_key)
 
     def predict(self, text: str):
         return self.detox_model.predict(text)["toxicity"]
@@ -60,6 +77,18 @@ class DetoxifyModel(ToxicityModel):
 class ToxicCommentModel(ToxicityModel):
     def __init__(self, model_path: str):
         self.model_path = model_path
+        self.model_key = models.acquire(
+            model_path,
+            _PIPELINE_BACKEND,
+            models.DEFAULT_DEVICE,
+            _load_pipeline(model_path),
+        )
+
+    def release(self) -> None:
+        models.release(self.model_key)
+
+    def warmup(self) -> None:
+        _get_pipeline(self.model_path)
 
     def predict(self, text: str) -> float:
         toxicity_pipeline = _get_pipeline(self.model_path)
@@ -89,10 +118,13 @@ def response_toxicity(text):
     return [toxicity(t) for t in text[_response]]
 
 
+@timed_init
 def init(model_path: Optional[str] = None, config: Optional[LangKitConfig] = None):
     config = config or deepcopy(lang_config)
     model_path = model_path or config.toxicity_model_path
     global _toxicity_model
+    if isinstance(_toxicity_model, (DetoxifyModel, ToxicCommentModel)):
+        _toxicity_model.release()
     if model_path == "detoxify/unbiased":
         _toxicity_model = DetoxifyModel("unbiased")
     elif model_path == "detoxify/original":
@@ -103,4 +135,10 @@ def init(model_path: Optional[str] = None, config: Optional[LangKitConfig] = Non
         _toxicity_model = ToxicCommentModel(model_path)
 
 
+def warmup() -> None:
+    """Loads the toxicity model now rather than on the first scored row."""
+    assert _toxicity_model is not None
+    _toxicity_model.warmup()
+
+
 init()
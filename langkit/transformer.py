@@ -1,27 +1,52 @@
-from sentence_transformers import SentenceTransformer
-from typing import Optional, Callable, Union, List, Any
-from torch import Tensor
+import sys
+from typing import TYPE_CHECKING, Optional, Callable, Union, List, Any
 import numpy as np
-from functools import lru_cache
-import os
-import torch
+from langkit import intermediates
+from langkit import models
+from langkit.models import ModelKey
+from langkit.utils import _require, _use_cuda
 
-_USE_CUDA = torch.cuda.is_available() and not bool(
-    os.environ.get("LANGKIT_NO_CUDA", False)
-)
-_device = "cuda" if _USE_CUDA else "cpu"
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+    from torch import Tensor
 
+_require(__name__, "torch", "sentence_transformers")
 
-@lru_cache(maxsize=None)
-def _get_sentence_transformer(model_name: str, veto_cuda=False) -> SentenceTransformer:
-    device = _device if not veto_cuda else "cpu"
-    return SentenceTransformer(model_name, device=device)
 
+def _device(veto_cuda: bool = False) -> str:
+    return "cuda" if _use_cuda() and not veto_cuda else "cpu"
 
-try:
-    import tensorflow as tf
-except ImportError:
-    tf = None
+
+def _load_sentence_transformer(
+    model_name: str, veto_cuda: bool
+) -> Callable[[], "SentenceTransformer"]:
+    def load():
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name, device=_device(veto_cuda))
+
+    return load
+
+
+def _sentence_transformer_key(model_name: str, veto_cuda=False) -> ModelKey:
+    # the device is resolved when the model loads, so that acquiring does not import torch
+    return models.acquire(
+        models.sentence_transformer_id(model_name),
+        "sentence_transformers",
+        "cpu" if veto_cuda else models.DEFAULT_DEVICE,
+        _load_sentence_transformer(model_name, veto_cuda),
+    )
+
+
+def _get_sentence_transformer(
+    model_name: str, veto_cuda=False
+) -> "SentenceTransformer":
+    return models.load(
+        models.sentence_transformer_id(model_name),
+        "sentence_transformers",
+        "cpu" if veto_cuda else models.DEFAULT_DEVICE,
+        _load_sentence_transformer(model_name, veto_cuda),
+    )
 
 
 class CustomEncoder:
@@ -56,11 +81,39 @@ class Encoder:
         if custom_encoder:
             self.transformer_name = None
             self.custom_encoder: Optional[CustomEncoder] = CustomEncoder(custom_encoder)
+        self._model_key: Optional[ModelKey] = None
         if transformer_name:
             self.transformer_name = transformer_name
             self.custom_encoder = None
+            self._model_key = _sentence_transformer_key(transformer_name, veto_cuda)
+
+    def release(self) -> None:
+        """Tells the model registry that this encoder no longer uses its model."""
+        models.release(self._model_key)
+        self._model_key = None
+
+    @property
+    def artifact(self) -> str:
+        """The intermediates kind under which this encoder's embeddings are shared."""
+        if self.custom_encoder:
+            return f"embedding:custom:{id(self.custom_encoder.encode)}"
+        return f"embedding:{self.transformer_name}"
+
+    def encode_each(self, sentences: List[str]) -> List[Any]:
+        """
+        Returns one embedding per sentence, reusing the embeddings already computed by
+        other metrics in the current batch.
+        """
+        return intermediates.get_many(
+            self.artifact, sentences, lambda missing: list(self.encode(missing))
+        )
+
+    def warmup(self) -> None:
+        """Loads the transformer model now rather than on the first encode call."""
+        if self.transformer_name:
+            _get_sentence_transformer(self.transformer_name, self.veto_cuda)
 
-    def encode(self, sentences: Union[List, str]) -> Union[Tensor, np.ndarray, List]:
+    def encode(self, sentences: Union[List, str]) -> Union["Tensor", np.ndarray, List]:
         """
         Args:
             sentences: A list of sentences to encode. If a string is given, it is converted to a list with one element.
@@ -79,6 +132,8 @@ class Encoder:
             embeddings = transformer_model.encode(sentences, convert_to_tensor=True)
         else:
             raise ValueError("Unknown encoder model type")
-        if tf and isinstance(embeddings, tf.Tensor):
+        # a tensorflow tensor can only come from an encoder that already imported tensorflow
+        tf = sys.modules.get("tensorflow")
+        if tf is not None and isinstance(embeddings, tf.Tensor):
             embeddings = embeddings.numpy()
         return embeddings
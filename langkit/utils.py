@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 from typing import Optional
 from langkit import lang_config
 import string
@@ -49,3 +50,30 @@ def _unregister_metric_udf(old_name: str, namespace: Optional[str] = ""):
             new_multicolumn_udfs.append(udf)
 
     _multicolumn_udfs[namespace] = new_multicolumn_udfs
+
+
+def _require(module: str, *packages: str) -> None:
+    """
+    Raises ImportError if any of the packages a metric module needs is missing, without
+    importing them, so modules can defer heavy imports such as torch to first use.
+    """
+    missing = [package for package in packages if find_spec(package) is None]
+    if missing:
+        raise ImportError(
+            f"`{module}` requires {', '.join(missing)}, please install it with `pip install langkit[all]`."
+        )
+
+
+def _offline() -> bool:
+    """Set by LANGKIT_OFFLINE=1 (or artifacts.use): artifacts must already be local."""
+    return bool(os.environ.get("LANGKIT_OFFLINE", False))
+
+
+@functools.lru_cache(maxsize=None)
+def _use_cuda() -> bool:
+    """Whether models go on the GPU; imports torch, so only call it when loading a model."""
+    if os.environ.get("LANGKIT_NO_CUDA", False):
+        return False
+    import torch
+
+    return torch.cuda.is_available()
@@ -1,7 +1,7 @@
 from logging import getLogger
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-from whylogs.experimental.core.udf_schema import register_dataset_udf
+from langkit.instrumentation import register_dataset_udf, timed_init
 from langkit import prompt_column, response_column
 
 
@@ -31,6 +31,7 @@ def response_sentiment(text):
     return [vader_sentiment(t) for t in text[_response]]
 
 
+@timed_init
 def init() -> SentimentIntensityAnalyzer:
     global _vader_sentiment_analyzer
     _vader_sentiment_analyzer = SentimentIntensityAnalyzer()